@@ -27,29 +27,32 @@ def create_app(config_class=None):
     # 设置日志级别
     app.logger.setLevel(logging.INFO)
     
-    # 创建日志处理器
-    file_handler = RotatingFileHandler(
-        log_file,
-        maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.INFO)
-    
-    # 设置日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    file_handler.setFormatter(formatter)
-    
-    # 添加日志处理器
-    app.logger.addHandler(file_handler)
-    
-    # 同时输出到控制台
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    app.logger.addHandler(console_handler)
+    # app.logger 是进程内共享的 logging.getLogger('app')，
+    # 同一进程多次创建应用（脚本、测试）时不重复添加处理器，否则每条日志会输出多次
+    if not any(isinstance(handler, RotatingFileHandler) for handler in app.logger.handlers):
+        # 创建日志处理器
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=10 * 1024 * 1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        file_handler.setLevel(logging.INFO)
+        
+        # 设置日志格式
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        file_handler.setFormatter(formatter)
+        
+        # 添加日志处理器
+        app.logger.addHandler(file_handler)
+        
+        # 同时输出到控制台
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(formatter)
+        app.logger.addHandler(console_handler)
     
     # 记录应用启动日志
     app.logger.info('图书管理系统应用初始化')
@@ -82,6 +85,10 @@ def create_app(config_class=None):
     from app.middleware.error_handler import register_error_handlers
     register_error_handlers(app)
     
+    # 注册令牌吊销检查
+    from app.middleware.auth import register_jwt_callbacks
+    register_jwt_callbacks(jwt)
+    
     # 注册蓝图
     from app.routes.auth import auth_bp
     from app.routes.books import books_bp
@@ -91,6 +98,7 @@ def create_app(config_class=None):
     from app.routes.reviews import reviews_bp
     from app.routes.reservations import reservations_bp
     from app.routes.notifications import notifications_bp
+    from app.routes.jobs import jobs_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(books_bp, url_prefix='/api')
@@ -100,5 +108,6 @@ def create_app(config_class=None):
     app.register_blueprint(reviews_bp, url_prefix='/api')
     app.register_blueprint(reservations_bp, url_prefix='/api')
     app.register_blueprint(notifications_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
     
     return app
\ No newline at end of file
@@ -1,17 +1,17 @@
 from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from ..models import User
+from ..services.principals import get_principal
+from ..services.tokens import is_token_revoked
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
             verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
+            principal = get_principal(get_jwt_identity())
             
-            if not user or user.role != 'admin':
+            if not principal or not principal.is_admin:
                 return jsonify({'error': '需要管理员权限'}), 403
             
             return f(*args, **kwargs)
@@ -24,13 +24,22 @@ def own_resource_required(f):
     def decorated_function(user_id, *args, **kwargs):
         try:
             verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
+            principal = get_principal(get_jwt_identity())
             
-            if not current_user or (current_user.role != 'admin' and current_user_id != user_id):
+            if not principal or (not principal.is_admin and principal.user_id != user_id):
                 return jsonify({'error': '权限不足'}), 403
             
             return f(user_id, *args, **kwargs)
         except Exception as e:
             return jsonify({'error': str(e)}), 401
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def register_jwt_callbacks(jwt):
+    """注册令牌吊销检查"""
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return is_token_revoked(jwt_payload)
+    
+    @jwt.revoked_token_loader
+    def revoked_token_response(jwt_header, jwt_payload):
+        return jsonify({'error': '登录状态已失效，请重新登录'}), 401
@@ -1,12 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
 import jwt
 from datetime import datetime, timedelta
-from app import db, bcrypt
+from app import db
+from app.utils.passwords import hash_password, verify_password, needs_rehash
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # 管理员用户列表按角色/状态过滤并按 id 游标分页
+        db.Index('idx_users_role_active', 'role', 'is_active', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -21,10 +27,13 @@ class User(db.Model):
     reviews = db.relationship('Review', backref='user', lazy='dynamic')
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return verify_password(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -36,6 +45,16 @@ class User(db.Model):
             'is_active': self.is_active
         }
 
+class UserLoginKey(db.Model):
+    """规范化（小写）的用户名和邮箱，由触发器维护，见 services/login_keys.py"""
+    __tablename__ = 'user_login_keys'
+    __table_args__ = (
+        db.Index('idx_user_login_keys_user', 'user_id'),
+    )
+    
+    login_key = db.Column(db.String(120), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
 class Category(db.Model):
     __tablename__ = 'categories'
     
@@ -67,6 +86,9 @@ class Book(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
     total_copies = db.Column(db.Integer, default=1)
     available_copies = db.Column(db.Integer, default=1)
+    # 评分汇总，由 services/ratings.py 随评论增删改维护
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -74,6 +96,18 @@ class Book(db.Model):
     borrow_records = db.relationship('BorrowRecord', backref='book', lazy='dynamic')
     reviews = db.relationship('Review', backref='book', lazy='dynamic')
     
+    @hybrid_property
+    def rating_avg(self):
+        """平均评分，没有评分时为 None"""
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+    
+    @rating_avg.expression
+    def rating_avg(cls):
+        # 与 idx_books_rating 的表达式一致才能走索引；除数为 0 时 SQLite 返回 NULL
+        return db.cast(cls.rating_sum, db.Float) / cls.rating_count
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -85,12 +119,21 @@ class Book(db.Model):
             'category_id': self.category_id,
             'total_copies': self.total_copies,
             'available_copies': self.available_copies,
+            'rating_count': self.rating_count,
+            'rating_avg': round(self.rating_avg, 2) if self.rating_count else None,
             'created_at': self.created_at.isoformat()
         }
 
+# 按平均评分排序、过滤的表达式索引
+db.Index('idx_books_rating', Book.rating_avg, Book.id)
+
 # 在BorrowRecord类中添加renewed字段
 class BorrowRecord(db.Model):
     __tablename__ = 'borrow_records'
+    __table_args__ = (
+        # 与 001 迁移一致；SQLite 索引包含 rowid，逾期检查按状态过滤后按 id 分段
+        db.Index('idx_borrow_records_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -115,8 +158,110 @@ class BorrowRecord(db.Model):
             'renewed': self.renewed
         }
 
+class BorrowDailyStat(db.Model):
+    """每日每本图书的借阅次数汇总（由 tasks/stats_rollup.py 增量维护）"""
+    __tablename__ = 'borrow_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'book_id', name='uq_borrow_daily_stats_day_book'),
+        db.Index('idx_borrow_daily_stats_book', 'book_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
+    borrow_count = db.Column(db.Integer, nullable=False, default=0)
+
+class BookBorrowTotal(db.Model):
+    """每本图书的累计借阅次数（与 borrow_daily_stats 一同由 tasks/stats_rollup.py 增量维护）"""
+    __tablename__ = 'book_borrow_totals'
+    __table_args__ = (
+        # 热门图书按累计次数取前 N 本
+        db.Index('idx_book_borrow_totals_count', 'borrow_count', 'book_id'),
+    )
+    
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id'), primary_key=True)
+    borrow_count = db.Column(db.Integer, nullable=False, default=0)
+
+class RollupWatermark(db.Model):
+    """增量任务的水位线，记录已处理到的最大记录ID"""
+    __tablename__ = 'rollup_watermarks'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TableVersion(db.Model):
+    """数据表版本号，由触发器在写入时递增（见 services/table_versions.py）"""
+    __tablename__ = 'table_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
+
+class CacheTagVersion(db.Model):
+    """目录响应缓存的标签版本号，由 books 表的触发器在写入时更新（见 services/catalog_cache.py）"""
+    __tablename__ = 'cache_tag_versions'
+    __table_args__ = (
+        # 取全局最大版本号
+        db.Index('idx_cache_tag_versions_version', 'version'),
+    )
+    
+    tag = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+
+class UserTokenVersion(db.Model):
+    """用户令牌版本：只为需要强制重新登录过的用户保存一行，版本号低于此值的令牌视为已吊销"""
+    __tablename__ = 'user_token_versions'
+    
+    user_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Job(db.Model):
+    """后台任务（由 tasks/job_worker.py 执行）"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('idx_jobs_status_created', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    progress_message = db.Column(db.String(255))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    # 领取和每次上报进度时更新，长时间未更新的 running 任务视为 worker 已中断
+    heartbeat_at = db.Column(db.DateTime)
+    # 每次领取时生成，执行中的 worker 只在仍持有该值时更新进度和结果
+    claim_token = db.Column(db.String(32))
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'progress': self.progress,
+            'progress_message': self.progress_message,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class Review(db.Model):
     __tablename__ = 'reviews'
+    __table_args__ = (
+        # 按图书列出评论、重算评分汇总
+        db.Index('idx_reviews_book', 'book_id', 'rating'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -137,12 +282,20 @@ class Review(db.Model):
 
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        # 每本书按预约时间排队（services/holds.py）
+        db.Index('idx_reservations_queue', 'book_id', 'status', 'reservation_date'),
+        # 借阅资格检查统计用户的保留数、查询"我的预约"
+        db.Index('idx_reservations_user_status', 'user_id', 'status'),
+        # 过期预约清理按状态扫描已过期的记录（services/reservation_expiry.py）
+        db.Index('idx_reservations_status_expires', 'status', 'expires_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
     reservation_date = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='pending')  # pending, active, canceled, fulfilled
+    status = db.Column(db.String(20), default='pending')  # pending, active（副本已保留）, canceled, fulfilled, expired
     expires_at = db.Column(db.DateTime, nullable=False)
     
     # Relationships
@@ -161,6 +314,10 @@ class Reservation(db.Model):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # 提醒任务按借阅记录和类型查找最近是否已发送
+        db.Index('idx_notifications_borrow_type', 'borrow_record_id', 'notification_type', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -169,6 +326,9 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     notification_type = db.Column(db.String(50), nullable=False)  # borrow_reminder, return_reminder, reservation_available, etc.
+    # 通知关联的借阅记录和图书（可为空）
+    borrow_record_id = db.Column(db.Integer, db.ForeignKey('borrow_records.id'))
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id'))
     
     # Relationships
     user = db.relationship('User', backref='notifications')
@@ -181,5 +341,14 @@ class Notification(db.Model):
             'content': self.content,
             'is_read': self.is_read,
             'created_at': self.created_at.isoformat(),
-            'notification_type': self.notification_type
-        }
\ No newline at end of file
+            'notification_type': self.notification_type,
+            'borrow_record_id': self.borrow_record_id,
+            'book_id': self.book_id
+        }
+
+class UserNotificationCount(db.Model):
+    """用户未读通知数，由 notifications 表上的触发器维护（见 services/notification_counts.py）"""
+    __tablename__ = 'user_notification_counts'
+    
+    user_id = db.Column(db.Integer, primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db, User
 from ..middleware.auth import admin_required
+from ..services.tokens import create_user_token
+from ..utils.passwords import PasswordHasherBusy
+from ..services.login_keys import find_user_by_login, login_conflict_error
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -14,12 +17,10 @@ def register():
         if not data.get('username') or not data.get('email') or not data.get('password'):
             return jsonify({'error': '用户名、邮箱和密码是必填项'}), 400
         
-        # 检查用户名和邮箱是否已存在
-        if User.query.filter_by(username=data['username']).first():
-            return jsonify({'error': '用户名已存在'}), 400
-        
-        if User.query.filter_by(email=data['email']).first():
-            return jsonify({'error': '邮箱已存在'}), 400
+        # 检查用户名和邮箱是否已存在（不区分大小写，一条查询）
+        conflict = login_conflict_error(data['username'], data['email'])
+        if conflict:
+            return jsonify({'error': conflict}), 400
         
         # 创建新用户
         user = User(
@@ -32,8 +33,8 @@ def register():
         db.session.add(user)
         db.session.commit()
         
-        # 生成访问令牌，Flask-JWT-Extended 4.x要求identity必须是字符串类型
-        access_token = create_access_token(identity=str(user.id))
+        # 生成访问令牌（携带角色和状态声明）
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': '用户注册成功',
@@ -41,6 +42,9 @@ def register():
             'token': access_token
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -53,10 +57,8 @@ def login():
         if not data.get('login') or not data.get('password'):
             return jsonify({'error': '登录名和密码是必填项'}), 400
         
-        # 通过用户名或邮箱查找用户
-        user = User.query.filter(
-            (User.username == data['login']) | (User.email == data['login'])
-        ).first()
+        # 通过用户名或邮箱查找用户（规范化登录名的一次主键查找）
+        user = find_user_by_login(data['login'])
         
         if not user or not user.check_password(data['password']):
             return jsonify({'error': '无效的登录名或密码'}), 401
@@ -64,8 +66,16 @@ def login():
         if not user.is_active:
             return jsonify({'error': '账户已被禁用'}), 401
         
-        # 生成访问令牌，Flask-JWT-Extended 4.x要求identity必须是字符串类型
-        access_token = create_access_token(identity=str(user.id))
+        # bcrypt cost 配置变化后，用新 cost 重新哈希；名额不足时留到下次登录
+        if user.password_needs_rehash():
+            try:
+                user.set_password(data['password'])
+                db.session.commit()
+            except PasswordHasherBusy:
+                db.session.rollback()
+        
+        # 生成访问令牌（携带角色和状态声明）
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': '登录成功',
@@ -73,5 +83,7 @@ def login():
             'token': access_token
         }), 200
         
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
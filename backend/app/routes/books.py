@@ -2,38 +2,55 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db, Book, Category, User
 from ..middleware.auth import admin_required
+from ..services.search import get_search_backend
+from ..utils.pagination import paginate, InvalidCursorError
+from ..utils.http_cache import conditional_get
+from ..services.catalog_cache import (
+    get_response_cache, cache_key, cached_response, cache_snapshot, store_response,
+    book_list_tags, book_tag, invalidate_book
+)
+from ..services.book_import import (
+    iter_rows, import_books, ImportFileError, DEFAULT_BATCH_SIZE, DEFAULT_MAX_ERRORS
+)
 import os
 import uuid
 from datetime import datetime, date
 from werkzeug.utils import secure_filename
 from pathlib import Path
 
-# 临时注释掉pandas，等安装完成后再取消注释
-# import pandas as pd
-
 books_bp = Blueprint('books', __name__)
 
 @books_bp.route('/books', methods=['GET'])
+@conditional_get('books')
 def get_books():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        # 服务端响应缓存，写操作按图书和分类失效（services/catalog_cache.py）
+        key = cache_key('books', request.args)
+        cached = cached_response(key)
+        if cached is not None:
+            return cached
+        snapshot = cache_snapshot()
+        
         search = request.args.get('search', '')
         category_id = request.args.get('category_id', type=int)
         publisher = request.args.get('publisher', '')
         min_publish_year = request.args.get('min_publish_year', type=int)
         max_publish_year = request.args.get('max_publish_year', type=int)
         available_only = request.args.get('available_only', type=bool, default=False)
+        min_rating = request.args.get('min_rating', type=float)
+        sort = request.args.get('sort', '')
+        
+        # 按评分排序使用表达式索引，游标只支持按 id 分页
+        by_rating = sort == 'rating'
+        if by_rating and 'cursor' in request.args:
+            return jsonify({'error': '按评分排序时请使用页码分页'}), 400
         
         # 构建查询
         query = Book.query
         
         if search:
-            query = query.filter(
-                (Book.title.contains(search)) | 
-                (Book.author.contains(search)) |
-                (Book.isbn.contains(search))
-            )
+            # 使用全文检索后端（FTS5），结果按相关度排序
+            query = get_search_backend().apply(query, search)
         
         if category_id:
             query = query.filter_by(category_id=category_id)
@@ -54,21 +71,32 @@ def get_books():
         if available_only:
             query = query.filter(Book.available_copies > 0)
         
-        # 分页
-        books = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        if min_rating:
+            query = query.filter(Book.rating_avg >= min_rating)
         
-        return jsonify({
+        if by_rating:
+            # 没有评分的图书（平均分为 NULL）排在最后
+            query = query.order_by(None).order_by(Book.rating_avg.desc(), Book.id.desc())
+        
+        # 分页（游标模式下按 id 排序）
+        books = paginate(query, default_per_page=20)
+        
+        response = jsonify({
             'books': [book.to_dict() for book in books.items],
-            'total': books.total,
-            'page': books.page,
-            'per_page': books.per_page,
-            'pages': books.pages
-        }), 200
+            **books.meta()
+        })
+        store_response(
+            key, response,
+            book_list_tags(
+                [book.id for book in books.items], category_id, available_only,
+                by_rating=by_rating or bool(min_rating)
+            ),
+            snapshot
+        )
+        return response, 200
         
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -106,6 +134,7 @@ def create_book():
         )
         
         db.session.add(book)
+        invalidate_book(None, book.category_id)
         db.session.commit()
         
         return jsonify({
@@ -117,10 +146,19 @@ def create_book():
         return jsonify({'error': str(e)}), 500
 
 @books_bp.route('/books/<int:book_id>', methods=['GET'])
+@conditional_get('books')
 def get_book(book_id):
     try:
+        key = cache_key(f'books/{book_id}', request.args)
+        cached = cached_response(key)
+        if cached is not None:
+            return cached
+        snapshot = cache_snapshot()
+        
         book = Book.query.get_or_404(book_id)
-        return jsonify({'book': book.to_dict()}), 200
+        response = jsonify({'book': book.to_dict()})
+        store_response(key, response, {book_tag(book_id)}, snapshot)
+        return response, 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -131,6 +169,7 @@ def update_book(book_id):
     try:
         book = Book.query.get_or_404(book_id)
         data = request.get_json()
+        old_category_id = book.category_id
         
         # 更新字段
         if 'title' in data:
@@ -152,6 +191,7 @@ def update_book(book_id):
             book.total_copies = data['total_copies']
             book.available_copies += diff
         
+        invalidate_book(book.id, old_category_id, book.category_id)
         db.session.commit()
         
         return jsonify({
@@ -177,6 +217,7 @@ def delete_book(book_id):
         if book.reviews.count() > 0:
             return jsonify({'error': '图书存在评论记录，无法删除'}), 400
         
+        invalidate_book(book.id, book.category_id)
         db.session.delete(book)
         db.session.commit()
         
@@ -191,10 +232,36 @@ def delete_book(book_id):
 def batch_import_books():
     """批量导入图书（管理员权限）"""
     try:
-        # 暂时禁用批量导入功能，因为pandas库尚未安装
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return jsonify({'error': '请上传CSV或Excel文件'}), 400
+        
+        filename = secure_filename(file.filename) or file.filename
+        rows = iter_rows(filename, file.stream)
+        report = import_books(
+            rows,
+            batch_size=current_app.config.get('BOOK_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+            max_errors=current_app.config.get('BOOK_IMPORT_MAX_ERRORS', DEFAULT_MAX_ERRORS)
+        )
+        
         return jsonify({
-            'error': '批量导入功能暂时不可用，请稍后重试'
-        }), 503
+            'message': f'批量导入完成，成功导入 {report.imported} 本图书',
+            **report.to_dict()
+        }), 200
+        
+    except ImportFileError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
+@books_bp.route('/books/cache/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_cache_stats():
+    """目录响应缓存的命中率等统计（管理员权限）"""
+    try:
+        return jsonify(get_response_cache().stats()), 200
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -3,6 +3,14 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from ..models import db, User, Book, BorrowRecord
 from ..middleware.auth import admin_required
+from ..utils.pagination import paginate, InvalidCursorError
+from ..utils.serializers import borrow_with_book, borrow_with_user_and_book
+from ..services.stats import compute_borrow_stats
+from ..services.inventory import take_copy
+from ..services.holds import claim_hold, return_copies
+from ..services.eligibility import get_borrow_eligibility
+from ..services.returns import bulk_return, mark_returned
+from ..services.principals import get_principal
 
 borrows_bp = Blueprint('borrows', __name__)
 
@@ -18,31 +26,22 @@ def borrow_book():
             return jsonify({'error': '请选择要借阅的图书'}), 400
 
         book_id = data['book_id']
-        book = Book.query.get_or_404(book_id)
 
-        # 检查图书是否可借
-        if book.available_copies <= 0:
+        # 检查借阅资格（账户状态、最大借阅数量、逾期未还）
+        eligibility = get_borrow_eligibility(current_user_id)
+        error = eligibility.borrow_error()
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+
+        # 借走为该用户保留的预约副本；否则原子扣减库存，并发借阅最后一本时只有一个请求能成功
+        held = eligibility.hold_count > 0 and claim_hold(current_user_id, book_id)
+        if not held and not take_copy(book_id):
+            db.session.rollback()
+            # 只在失败时区分图书不存在和无库存
+            if not db.session.get(Book, book_id):
+                return jsonify({'error': '图书不存在'}), 404
             return jsonify({'error': '该图书暂无库存'}), 400
 
-        # 检查用户是否已达到最大借阅数量
-        user = User.query.get(current_user_id)
-        current_borrows = BorrowRecord.query.filter_by(
-            user_id=current_user_id, 
-            status='borrowed'
-        ).count()
-
-        max_borrows = 5  # 最大借阅数量
-        if current_borrows >= max_borrows:
-            return jsonify({'error': f'已达到最大借阅数量({max_borrows}本)'}), 400
-
-        # 检查用户是否有逾期未还的图书
-        overdue_borrows = BorrowRecord.query.filter_by(
-            user_id=current_user_id, 
-            status='overdue'
-        ).count()
-        if overdue_borrows > 0:
-            return jsonify({'error': '您有逾期未还的图书，请先归还'}), 400
-
         # 创建借阅记录
         borrow_record = BorrowRecord(
             user_id=current_user_id,
@@ -52,15 +51,15 @@ def borrow_book():
             status='borrowed'
         )
 
-        # 更新图书库存
-        book.available_copies -= 1
-
         db.session.add(borrow_record)
+        db.session.flush()
+        # 提交前序列化，避免提交后属性过期重新查询
+        borrow_data = borrow_record.to_dict()
         db.session.commit()
 
         return jsonify({
             'message': '借阅成功',
-            'borrow_record': borrow_record.to_dict()
+            'borrow_record': borrow_data
         }), 201
 
     except Exception as e:
@@ -77,28 +76,18 @@ def return_book(record_id):
 
         # 检查权限：只能归还自己的图书或管理员操作
         if borrow_record.user_id != current_user_id:
-            current_user = User.query.get(current_user_id)
-            if current_user.role != 'admin':
+            if not get_principal(current_user_id).is_admin:
                 return jsonify({'error': '权限不足'}), 403
 
         # 检查图书是否已归还
         if borrow_record.status == 'returned':
             return jsonify({'error': '该图书已归还'}), 400
 
-        book = Book.query.get(borrow_record.book_id)
-
-        # 更新借阅记录，无论当前状态是borrowed还是overdue，都更新为returned
-        borrow_record.return_date = datetime.utcnow()
-        borrow_record.status = 'returned'
-
-        # 计算罚金（如果有逾期）
-        if borrow_record.due_date < datetime.utcnow():
-            days_overdue = (datetime.utcnow() - borrow_record.due_date).days
-            fine_rate = 0.5  # 每天0.5元
-            borrow_record.fine_amount = days_overdue * fine_rate
+        # 更新借阅记录并计算罚金（如果有逾期）
+        mark_returned(borrow_record, datetime.utcnow())
 
-        # 更新图书库存
-        book.available_copies += 1
+        # 副本优先保留给该书最早的预约，没有预约时计入库存
+        return_copies({borrow_record.book_id: 1})
 
         db.session.commit()
 
@@ -117,8 +106,6 @@ def get_my_borrows():
     """获取我的借阅记录"""
     try:
         current_user_id = int(get_jwt_identity())
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         
         # 处理 status 参数，支持单值和数组值
         # 同时处理 status 和 status[] 格式的参数
@@ -129,28 +116,20 @@ def get_my_borrows():
         if status_values:
             query = query.filter(BorrowRecord.status.in_(status_values))
 
-        # 按借阅时间倒序排列
-        borrows = query.order_by(BorrowRecord.borrow_date.desc()).paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+        # 按借阅时间倒序排列，并预加载图书信息
+        borrows = paginate(
+            borrow_with_book.prepare(query.order_by(BorrowRecord.borrow_date.desc())),
+            sort_column=BorrowRecord.borrow_date,
+            descending=True
         )
 
-        # 包含图书信息
-        borrows_data = []
-        for borrow in borrows.items:
-            borrow_data = borrow.to_dict()
-            borrow_data['book'] = borrow.book.to_dict()
-            borrows_data.append(borrow_data)
-
         return jsonify({
-            'borrows': borrows_data,
-            'total': borrows.total,
-            'page': borrows.page,
-            'per_page': borrows.per_page,
-            'pages': borrows.pages
+            'borrows': borrow_with_book.dump_many(borrows.items),
+            **borrows.meta()
         }), 200
 
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -160,8 +139,6 @@ def get_my_borrows():
 def get_all_borrows():
     """获取所有借阅记录（管理员权限）"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         # 同时处理 status 和 status[] 格式的参数
         status_values = request.args.getlist('status') + request.args.getlist('status[]')
         search = request.args.get('search', '')
@@ -178,27 +155,20 @@ def get_all_borrows():
                 (Book.author.contains(search))
             )
 
-        borrows = query.order_by(BorrowRecord.borrow_date.desc()).paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+        # 预加载用户和图书信息
+        borrows = paginate(
+            borrow_with_user_and_book.prepare(query.order_by(BorrowRecord.borrow_date.desc())),
+            sort_column=BorrowRecord.borrow_date,
+            descending=True
         )
 
-        # 包含用户和图书信息
-        borrows_data = []
-        for borrow in borrows.items:
-            borrow_data = borrow.to_dict()
-            borrow_data['user'] = borrow.user.to_dict()
-            borrow_data['book'] = borrow.book.to_dict()
-            borrows_data.append(borrow_data)
-
         return jsonify({
-            'borrows': borrows_data,
-            'total': borrows.total,
-            'page': borrows.page,
-            'per_page': borrows.per_page
+            'borrows': borrow_with_user_and_book.dump_many(borrows.items),
+            **borrows.meta()
         }), 200
 
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -222,6 +192,11 @@ def renew_book(record_id):
         if borrow_record.renewed:
             return jsonify({'error': '该图书已续借过一次，无法再次续借'}), 400
 
+        # 检查续借资格（账户状态、逾期未还）
+        error = get_borrow_eligibility(current_user_id).renew_error()
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+
         # 续借30天
         borrow_record.due_date += timedelta(days=30)
         borrow_record.renewed = True
@@ -249,39 +224,9 @@ def batch_return_books():
         if not record_ids or not isinstance(record_ids, list):
             return jsonify({'error': '请选择要归还的借阅记录'}), 400
 
-        # 开始事务
-        returned_count = 0
-        errors = []
-
-        for record_id in record_ids:
-            try:
-                borrow_record = BorrowRecord.query.get(record_id)
-                if not borrow_record:
-                    errors.append(f'借阅记录 {record_id} 不存在')
-                    continue
-
-                if borrow_record.status == 'returned':
-                    errors.append(f'借阅记录 {record_id} 已归还')
-                    continue
-
-                # 更新借阅记录
-                borrow_record.return_date = datetime.utcnow()
-                borrow_record.status = 'returned'
-
-                # 计算罚金（如果有逾期）
-                if borrow_record.due_date < datetime.utcnow():
-                    days_overdue = (datetime.utcnow() - borrow_record.due_date).days
-                    fine_rate = 0.5  # 每天0.5元
-                    borrow_record.fine_amount = days_overdue * fine_rate
-
-                # 更新图书库存
-                book = Book.query.get(borrow_record.book_id)
-                book.available_copies += 1
-
-                returned_count += 1
-            except Exception as e:
-                errors.append(f'处理借阅记录 {record_id} 时出错: {str(e)}')
-                continue
+        # 集合方式处理：一次载入全部记录，按图书汇总更新库存
+        returned, errors = bulk_return(record_ids)
+        returned_count = len(returned)
 
         # 提交事务
         db.session.commit()
@@ -305,134 +250,7 @@ def get_borrow_stats():
         # 获取查询参数
         date_range = request.args.get('range', '7d')  # 7d, 30d, 90d
         
-        # 计算日期范围
-        now = datetime.utcnow()
-        if date_range == '7d':
-            start_date = now - timedelta(days=7)
-        elif date_range == '30d':
-            start_date = now - timedelta(days=30)
-        elif date_range == '90d':
-            start_date = now - timedelta(days=90)
-        else:
-            start_date = now - timedelta(days=7)  # 默认7天
-        
-        # 1. 概览数据
-        total_books = Book.query.count()
-        total_users = User.query.count()
-        current_borrows = BorrowRecord.query.filter_by(status='borrowed').count()
-        overdue_count = BorrowRecord.query.filter_by(status='overdue').count()
-        
-        # 2. 借阅趋势数据
-        borrow_trend = []
-        
-        # 根据日期范围生成日期序列
-        if date_range == '7d':
-            # 最近7天，按天统计
-            for i in range(7):
-                date = now - timedelta(days=i)
-                date_str = date.strftime('%Y-%m-%d')
-                
-                # 统计当天借阅数量
-                count = BorrowRecord.query.filter(
-                    BorrowRecord.borrow_date >= date.replace(hour=0, minute=0, second=0, microsecond=0),
-                    BorrowRecord.borrow_date < (date + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                ).count()
-                
-                borrow_trend.append({'date': date_str, 'count': count})
-            
-            # 反转列表，按日期升序
-            borrow_trend = borrow_trend[::-1]
-        else:
-            # 最近30天或90天，按周统计
-            weeks = []
-            if date_range == '30d':
-                weeks = 4
-            else:
-                weeks = 12
-            
-            for i in range(weeks):
-                start_of_week = now - timedelta(weeks=i, days=now.weekday())
-                end_of_week = start_of_week + timedelta(days=6)
-                
-                week_str = f"{start_of_week.strftime('%m-%d')}~{end_of_week.strftime('%m-%d')}"
-                
-                # 统计本周借阅数量
-                count = BorrowRecord.query.filter(
-                    BorrowRecord.borrow_date >= start_of_week,
-                    BorrowRecord.borrow_date < end_of_week + timedelta(days=1)
-                ).count()
-                
-                borrow_trend.append({'date': week_str, 'count': count})
-            
-            # 反转列表，按日期升序
-            borrow_trend = borrow_trend[::-1]
-        
-        # 3. 借阅状态分布
-        status_distribution = []
-        statuses = [
-            ('borrowed', '已借阅'),
-            ('returned', '已归还'),
-            ('overdue', '已逾期')
-        ]
-        
-        for status, name in statuses:
-            count = BorrowRecord.query.filter_by(status=status).count()
-            status_distribution.append({
-                'name': name,
-                'value': count
-            })
-        
-        # 4. 热门图书（借阅次数最多的前10本）
-        top_books = []
-        
-        # 使用SQLAlchemy查询借阅次数最多的图书
-        book_borrow_counts = db.session.query(
-            BorrowRecord.book_id,
-            db.func.count(BorrowRecord.id).label('borrow_count')
-        ).group_by(BorrowRecord.book_id).order_by(db.text('borrow_count DESC')).limit(10).all()
-        
-        for book_id, borrow_count in book_borrow_counts:
-            book = Book.query.get(book_id)
-            if book:
-                top_books.append({
-                    'id': book.id,
-                    'title': book.title,
-                    'author': book.author,
-                    'borrow_count': borrow_count
-                })
-        
-        # 5. 用户借阅排名（借阅次数最多的前10个用户）
-        top_users = []
-        
-        # 使用SQLAlchemy查询借阅次数最多的用户
-        user_borrow_counts = db.session.query(
-            BorrowRecord.user_id,
-            db.func.count(BorrowRecord.id).label('borrow_count')
-        ).group_by(BorrowRecord.user_id).order_by(db.text('borrow_count DESC')).limit(10).all()
-        
-        for user_id, borrow_count in user_borrow_counts:
-            user = User.query.get(user_id)
-            if user:
-                top_users.append({
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'borrow_count': borrow_count
-                })
-        
-        # 返回所有统计数据
-        return jsonify({
-            'overview': {
-                'totalBooks': total_books,
-                'totalUsers': total_users,
-                'currentBorrows': current_borrows,
-                'overdueCount': overdue_count
-            },
-            'borrowTrend': borrow_trend,
-            'statusDistribution': status_distribution,
-            'topBooks': top_books,
-            'topUsers': top_users
-        }), 200
+        return jsonify(compute_borrow_stats(date_range)), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -2,31 +2,25 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from ..models import db, Category, Book
 from ..middleware.auth import admin_required
+from ..utils.pagination import paginate, InvalidCursorError
+from ..utils.http_cache import conditional_get
 
 categories_bp = Blueprint('categories', __name__)
 
 @categories_bp.route('/categories', methods=['GET'])
+@conditional_get('categories')
 def get_categories():
     """获取分类列表"""
     try:
-        # 获取分页参数
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         # 分页查询
-        categories = Category.query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        categories = paginate(Category.query)
         
         return jsonify({
             'categories': [category.to_dict() for category in categories.items],
-            'total': categories.total,
-            'page': categories.page,
-            'per_page': categories.per_page,
-            'pages': categories.pages
+            **categories.meta()
         }), 200
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,98 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..models import db, Job
+from ..middleware.auth import admin_required
+from ..services.jobs import enqueue_job, UnknownJobTypeError
+from werkzeug.utils import secure_filename
+from pathlib import Path
+import uuid
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_job():
+    """提交后台任务（管理员权限）"""
+    try:
+        data = request.get_json() or {}
+        job_type = data.get('type')
+        payload = data.get('payload') or {}
+        
+        if not job_type:
+            return jsonify({'error': '请指定任务类型'}), 400
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'payload必须是对象'}), 400
+        # 图书导入需要上传文件，只能通过 /jobs/book-import 提交
+        if job_type == 'book_import':
+            return jsonify({'error': '图书导入请使用 /api/jobs/book-import 上传文件'}), 400
+        if job_type == 'user_provisioning':
+            return jsonify({'error': '批量创建用户请使用 /api/users/batch'}), 400
+        if job_type == 'batch_return':
+            record_ids = payload.get('record_ids')
+            if not record_ids or not isinstance(record_ids, list):
+                return jsonify({'error': '请选择要归还的借阅记录'}), 400
+        
+        job = enqueue_job(job_type, payload, created_by=int(get_jwt_identity()))
+        
+        return jsonify({
+            'message': '任务已提交',
+            'job': job.to_dict()
+        }), 202
+        
+    except UnknownJobTypeError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/jobs/book-import', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_book_import_job():
+    """上传文件并提交图书导入任务（管理员权限）"""
+    try:
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return jsonify({'error': '请上传CSV或Excel文件'}), 400
+        
+        filename = secure_filename(file.filename) or file.filename
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if extension not in ('csv', 'xlsx'):
+            return jsonify({'error': '仅支持 CSV 或 XLSX 文件'}), 400
+        
+        # 文件保存到上传目录，由 worker 读取，导入结束后删除
+        upload_dir = Path(current_app.config.get('UPLOAD_FOLDER', 'uploads')) / 'imports'
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        path = upload_dir / f'{uuid.uuid4().hex}.{extension}'
+        file.save(str(path))
+        
+        job = enqueue_job('book_import', {
+            'path': str(path.resolve()),
+            'filename': filename
+        }, created_by=int(get_jwt_identity()))
+        
+        return jsonify({
+            'message': '导入任务已提交',
+            'job': job.to_dict()
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_job(job_id):
+    """查询后台任务进度和结果（管理员权限）"""
+    try:
+        job = db.session.get(Job, job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        
+        return jsonify(job.to_dict()), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
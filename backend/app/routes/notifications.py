@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db, Notification
+from ..utils.pagination import paginate, InvalidCursorError
+from ..services.notification_counts import get_unread_count
 from datetime import datetime
 
 notifications_bp = Blueprint('notifications', __name__)
@@ -13,9 +15,6 @@ def get_notifications():
         # 获取当前用户ID
         user_id = int(get_jwt_identity())
         
-        # 获取分页参数
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         is_read = request.args.get('is_read', type=bool)
         
         # 构建查询
@@ -29,21 +28,31 @@ def get_notifications():
         query = query.order_by(Notification.created_at.desc())
         
         # 分页
-        notifications = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+        notifications = paginate(
+            query,
+            sort_column=Notification.created_at,
+            descending=True,
+            default_per_page=20
         )
         
         return jsonify({
             'notifications': [notification.to_dict() for notification in notifications.items],
-            'total': notifications.total,
-            'page': notifications.page,
-            'per_page': notifications.per_page,
-            'pages': notifications.pages,
-            'unread_count': Notification.query.filter_by(user_id=user_id, is_read=False).count()
+            **notifications.meta(),
+            'unread_count': get_unread_count(user_id)
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@notifications_bp.route('/notifications/unread-count', methods=['GET'])
+@jwt_required()
+def get_notification_unread_count():
+    """获取当前用户的未读通知数（通知角标轮询）"""
+    try:
+        user_id = int(get_jwt_identity())
+        return jsonify({'unread_count': get_unread_count(user_id)}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -108,15 +117,17 @@ def mark_all_notifications_as_read():
         # 获取当前用户ID
         user_id = int(get_jwt_identity())
         
-        # 更新所有通知为已读
-        notifications = Notification.query.filter_by(user_id=user_id, is_read=False).all()
-        for notification in notifications:
-            notification.is_read = True
-        
+        # 一条 UPDATE 更新所有未读通知，未读计数由触发器同步
+        result = db.session.execute(
+            db.update(Notification)
+            .where(Notification.user_id == user_id, Notification.is_read == False)
+            .values(is_read=True)
+            .execution_options(synchronize_session=False)
+        )
         db.session.commit()
         
         return jsonify({
-            'message': f'成功标记 {len(notifications)} 条通知为已读'
+            'message': f'成功标记 {result.rowcount} 条通知为已读'
         }), 200
         
     except Exception as e:
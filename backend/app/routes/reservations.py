@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import db, Reservation, Book, User
+from ..models import db, Reservation, Book, BorrowRecord
 from datetime import datetime, timedelta
 from ..middleware.auth import admin_required
+from ..services.eligibility import get_borrow_eligibility
+from ..services.principals import get_principal
+from ..services.holds import claim_hold, release_hold
+from ..utils.pagination import paginate, InvalidCursorError
 
 reservations_bp = Blueprint('reservations', __name__)
 
@@ -20,6 +24,11 @@ def create_reservation():
         # 获取当前用户ID
         user_id = get_jwt_identity()
         
+        # 检查预约资格（账户状态、逾期未还）
+        error = get_borrow_eligibility(int(user_id)).reserve_error()
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        
         # 检查图书是否存在
         book = Book.query.get_or_404(book_id)
         
@@ -27,11 +36,12 @@ def create_reservation():
         if book.available_copies > 0:
             return jsonify({'error': '该图书当前可借阅，无需预约'}), 400
         
-        # 检查用户是否已预约该图书
-        existing_reservation = Reservation.query.filter_by(
-            user_id=user_id, 
-            book_id=book_id, 
-            status='pending'
+        # 检查用户是否已预约该图书（排队中或已为其保留，尚未清理的过期预约不算）
+        existing_reservation = Reservation.query.filter(
+            Reservation.user_id == user_id,
+            Reservation.book_id == book_id,
+            Reservation.status.in_(('pending', 'active')),
+            Reservation.expires_at > datetime.utcnow()
         ).first()
         
         if existing_reservation:
@@ -62,7 +72,7 @@ def cancel_reservation(reservation_id):
     """取消图书预约"""
     try:
         # 获取当前用户ID
-        user_id = get_jwt_identity()
+        user_id = int(get_jwt_identity())
         
         # 查找预约记录
         reservation = Reservation.query.get_or_404(reservation_id)
@@ -70,16 +80,19 @@ def cancel_reservation(reservation_id):
         # 检查权限（只有预约者或管理员可以取消）
         if reservation.user_id != user_id:
             # 检查是否是管理员
-            current_user = User.query.get(user_id)
-            if not current_user or current_user.role != 'admin':
+            principal = get_principal(user_id)
+            if not principal or not principal.is_admin:
                 return jsonify({'error': '您没有权限取消此预约'}), 403
         
         # 检查预约状态
-        if reservation.status != 'pending':
+        if reservation.status not in ('pending', 'active'):
             return jsonify({'error': '只能取消待处理的预约'}), 400
         
-        # 取消预约
+        # 取消预约；已保留的副本顺延给下一位预约者
+        held = reservation.status == 'active'
         reservation.status = 'canceled'
+        if held:
+            release_hold(reservation.book_id)
         db.session.commit()
         
         return jsonify({'message': '预约已取消'}), 200
@@ -95,25 +108,16 @@ def get_my_reservations():
         # 获取当前用户ID
         user_id = get_jwt_identity()
         
-        # 获取分页参数
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         # 查找当前用户的预约记录，分页查询
-        reservations = Reservation.query.filter_by(user_id=user_id).paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        reservations = paginate(Reservation.query.filter_by(user_id=user_id))
         
         return jsonify({
             'reservations': [reservation.to_dict() for reservation in reservations.items],
-            'total': reservations.total,
-            'page': reservations.page,
-            'per_page': reservations.per_page,
-            'pages': reservations.pages
+            **reservations.meta()
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -123,25 +127,16 @@ def get_my_reservations():
 def get_all_reservations():
     """获取所有预约列表（管理员）"""
     try:
-        # 获取分页参数
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         # 查找所有预约记录，分页查询
-        reservations = Reservation.query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        reservations = paginate(Reservation.query)
         
         return jsonify({
             'reservations': [reservation.to_dict() for reservation in reservations.items],
-            'total': reservations.total,
-            'page': reservations.page,
-            'per_page': reservations.per_page,
-            'pages': reservations.pages
+            **reservations.meta()
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -149,24 +144,48 @@ def get_all_reservations():
 @jwt_required()
 @admin_required
 def fulfill_reservation(reservation_id):
-    """完成预约（管理员）"""
+    """完成预约（管理员）：预约者到馆取走为其保留的副本，生成借阅记录"""
     try:
         # 查找预约记录
         reservation = Reservation.query.get_or_404(reservation_id)
         
-        # 检查预约状态
-        if reservation.status != 'pending':
-            return jsonify({'error': '只能完成待处理的预约'}), 400
+        # 检查预约状态：排队中的预约还没有副本，需等归还的副本保留给该读者（active）后才能完成
+        if reservation.status == 'pending':
+            return jsonify({'error': '该预约尚未到书，副本为其保留后才能完成'}), 400
+        if reservation.status != 'active':
+            return jsonify({'error': '只能完成已保留副本的预约'}), 400
         
-        # 检查预约是否已过期
+        # 检查是否已超过取书期限
         if reservation.expires_at < datetime.utcnow():
             return jsonify({'error': '该预约已过期'}), 400
         
-        # 更新预约状态
-        reservation.status = 'fulfilled'
+        # 检查预约者的借阅资格（账户状态、最大借阅数量、逾期未还）
+        error = get_borrow_eligibility(reservation.user_id).borrow_error()
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        
+        # 保留的副本借给预约者，不扣减可借库存；并发完成或取消时只有一个请求成功
+        if not claim_hold(reservation.user_id, reservation.book_id):
+            db.session.rollback()
+            return jsonify({'error': '该预约的保留已失效'}), 400
+        
+        borrow_record = BorrowRecord(
+            user_id=reservation.user_id,
+            book_id=reservation.book_id,
+            borrow_date=datetime.utcnow(),
+            due_date=datetime.utcnow() + timedelta(days=30),  # 借阅期限30天
+            status='borrowed'
+        )
+        db.session.add(borrow_record)
+        db.session.flush()
+        borrow_data = borrow_record.to_dict()
         db.session.commit()
         
-        return jsonify({'message': '预约已完成'}), 200
+        return jsonify({
+            'message': '预约已完成',
+            'borrow_record': borrow_data
+        }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -2,44 +2,33 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import Review, Book, User
 from app import db
+from app.utils.pagination import paginate, InvalidCursorError
+from app.utils.serializers import review_with_username, review_with_book
+from app.utils.http_cache import conditional_get
+from app.services.principals import get_principal
+from app.services.ratings import adjust_book_rating
 from datetime import datetime
 
 reviews_bp = Blueprint('reviews', __name__)
 
 # 获取图书的评论列表
 @reviews_bp.route('/books/<int:book_id>/reviews', methods=['GET'])
+@conditional_get('books', 'reviews', 'users')
 def get_book_reviews(book_id):
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         # 获取图书
         book = Book.query.get_or_404(book_id)
         
-        # 获取评论列表，包含用户信息
-        reviews_query = Review.query.filter_by(book_id=book_id)
-        reviews_pagination = reviews_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        reviews = []
-        for review in reviews_pagination.items:
-            user = User.query.get(review.user_id)
-            reviews.append({
-                'id': review.id,
-                'book_id': review.book_id,
-                'user_id': review.user_id,
-                'username': user.username if user else '未知用户',
-                'rating': review.rating,
-                'comment': review.comment,
-                'created_at': review.created_at.isoformat()
-            })
+        # 获取评论列表，预加载用户信息
+        reviews_query = review_with_username.prepare(Review.query.filter_by(book_id=book_id))
+        reviews_pagination = paginate(reviews_query)
         
         return jsonify({
-            'reviews': reviews,
-            'total': reviews_pagination.total,
-            'page': page,
-            'per_page': per_page,
-            'pages': reviews_pagination.pages
+            'reviews': review_with_username.dump_many(reviews_pagination.items),
+            **reviews_pagination.meta()
         }), 200
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -72,6 +61,7 @@ def add_review(book_id):
         )
         
         db.session.add(review)
+        adjust_book_rating(book_id, 1, rating)
         db.session.commit()
         
         return jsonify({
@@ -110,6 +100,7 @@ def update_review(review_id):
             rating = data['rating']
             if not isinstance(rating, int) or rating < 1 or rating > 5:
                 return jsonify({'error': '评分必须是1-5之间的整数'}), 400
+            adjust_book_rating(review.book_id, 0, rating - review.rating)
             review.rating = rating
         
         if 'comment' in data:
@@ -145,11 +136,11 @@ def delete_review(review_id):
         review = Review.query.get_or_404(review_id)
         
         # 验证用户权限（评论所有者或管理员）
-        user = User.query.get(current_user_id)
-        if review.user_id != current_user_id and user.role != 'admin':
+        if review.user_id != current_user_id and not get_principal(current_user_id).is_admin:
             return jsonify({'error': '无权删除此评论'}), 403
         
         db.session.delete(review)
+        adjust_book_rating(review.book_id, -1, -review.rating)
         db.session.commit()
         
         return jsonify({'message': '评论删除成功'}), 200
@@ -161,36 +152,19 @@ def delete_review(review_id):
 @reviews_bp.route('/users/<int:user_id>/reviews', methods=['GET'])
 def get_user_reviews(user_id):
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         # 验证用户存在
         user = User.query.get_or_404(user_id)
         
-        # 获取用户的评论列表，包含图书信息
-        reviews_query = Review.query.filter_by(user_id=user_id)
-        reviews_pagination = reviews_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        reviews = []
-        for review in reviews_pagination.items:
-            book = Book.query.get(review.book_id)
-            reviews.append({
-                'id': review.id,
-                'book_id': review.book_id,
-                'book_title': book.title if book else '未知图书',
-                'book_author': book.author if book else '未知作者',
-                'rating': review.rating,
-                'comment': review.comment,
-                'created_at': review.created_at.isoformat()
-            })
+        # 获取用户的评论列表，预加载图书信息
+        reviews_query = review_with_book.prepare(Review.query.filter_by(user_id=user_id))
+        reviews_pagination = paginate(reviews_query)
         
         return jsonify({
-            'reviews': reviews,
-            'total': reviews_pagination.total,
-            'page': page,
-            'per_page': per_page,
-            'pages': reviews_pagination.pages
+            'reviews': review_with_book.dump_many(reviews_pagination.items),
+            **reviews_pagination.meta()
         }), 200
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -200,32 +174,15 @@ def get_user_reviews(user_id):
 def get_my_reviews():
     try:
         current_user_id = int(get_jwt_identity())
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
-        # 获取当前用户的评论列表，包含图书信息
-        reviews_query = Review.query.filter_by(user_id=current_user_id)
-        reviews_pagination = reviews_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        reviews = []
-        for review in reviews_pagination.items:
-            book = Book.query.get(review.book_id)
-            reviews.append({
-                'id': review.id,
-                'book_id': review.book_id,
-                'book_title': book.title if book else '未知图书',
-                'book_author': book.author if book else '未知作者',
-                'rating': review.rating,
-                'comment': review.comment,
-                'created_at': review.created_at.isoformat()
-            })
+        # 获取当前用户的评论列表，预加载图书信息
+        reviews_query = review_with_book.prepare(Review.query.filter_by(user_id=current_user_id))
+        reviews_pagination = paginate(reviews_query)
         
         return jsonify({
-            'reviews': reviews,
-            'total': reviews_pagination.total,
-            'page': page,
-            'per_page': per_page,
-            'pages': reviews_pagination.pages
+            'reviews': review_with_book.dump_many(reviews_pagination.items),
+            **reviews_pagination.meta()
         }), 200
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,7 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db, User
 from ..middleware.auth import admin_required, own_resource_required
+from ..utils.pagination import paginate, InvalidCursorError
+from ..services.principals import get_principal, invalidate_principal
+from ..services.tokens import revoke_user_tokens
+from ..utils.passwords import PasswordHasherBusy
+from ..services.user_provisioning import create_users
+from ..services.login_keys import login_conflict_error
+from ..services.search import get_user_search_backend
+from ..services.jobs import enqueue_job
+from pathlib import Path
+import json
+import os
+import uuid
 
 users_bp = Blueprint('users', __name__)
 
@@ -11,8 +23,6 @@ users_bp = Blueprint('users', __name__)
 def get_users():
     """获取用户列表（管理员权限）"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         role = request.args.get('role', '')
         # 处理 status 参数，支持单值和数组值
@@ -23,10 +33,7 @@ def get_users():
         query = User.query
 
         if search:
-            query = query.filter(
-                (User.username.contains(search)) | 
-                (User.email.contains(search))
-            )
+            query = get_user_search_backend().apply(query, search)
 
         if role:
             query = query.filter_by(role=role)
@@ -50,20 +57,15 @@ def get_users():
                 query = query.filter_by(is_active=False)
 
         # 分页查询
-        users = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        users = paginate(query)
 
         return jsonify({
             'users': [user.to_dict() for user in users.items],
-            'total': users.total,
-            'page': users.page,
-            'per_page': users.per_page,
-            'pages': users.pages
+            **users.meta()
         }), 200
 
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -81,13 +83,10 @@ def create_user():
             if not data.get(field):
                 return jsonify({'error': f'{field}是必填项'}), 400
         
-        # 检查用户名是否已存在
-        if User.query.filter_by(username=data['username']).first():
-            return jsonify({'error': '用户名已存在'}), 400
-        
-        # 检查邮箱是否已存在
-        if User.query.filter_by(email=data['email']).first():
-            return jsonify({'error': '邮箱已存在'}), 400
+        # 检查用户名和邮箱是否已存在（不区分大小写）
+        conflict = login_conflict_error(data['username'], data['email'])
+        if conflict:
+            return jsonify({'error': conflict}), 400
         
         # 创建新用户
         user = User(
@@ -108,6 +107,59 @@ def create_user():
             'user': user.to_dict()
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/users/batch', methods=['POST'])
+@jwt_required()
+@admin_required
+def batch_create_users():
+    """批量创建用户（管理员权限）"""
+    try:
+        data = request.get_json() or {}
+        users = data.get('users')
+        
+        if not users or not isinstance(users, list):
+            return jsonify({'error': '请提供要创建的用户列表'}), 400
+        
+        max_size = current_app.config.get('USER_BATCH_MAX_SIZE', 10000)
+        if len(users) > max_size:
+            return jsonify({'error': f'单次最多创建 {max_size} 个用户'}), 400
+        
+        # 大批量在后台任务中哈希，避免长时间占用请求 worker；用户列表（含初始密码）
+        # 写入上传目录下仅本用户可读的文件，由 worker 读取后删除，不保存在 jobs 表中
+        if len(users) > current_app.config.get('USER_BATCH_SYNC_MAX_SIZE', 50):
+            upload_dir = Path(current_app.config.get('UPLOAD_FOLDER', 'uploads')) / 'imports'
+            upload_dir.mkdir(parents=True, exist_ok=True)
+            path = upload_dir / f'{uuid.uuid4().hex}.json'
+            fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as stream:
+                json.dump(users, stream, ensure_ascii=False)
+            
+            job = enqueue_job('user_provisioning', {
+                'path': str(path.resolve()),
+                'count': len(users)
+            }, created_by=int(get_jwt_identity()))
+            
+            return jsonify({
+                'message': '批量创建任务已提交',
+                'job': job.to_dict()
+            }), 202
+        
+        report = create_users(users)
+        
+        return jsonify({
+            'message': f'批量创建完成，成功创建 {report["created"]} 个用户',
+            **report
+        }), 200
+        
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -118,10 +170,10 @@ def get_user(user_id):
     """获取用户详情"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_principal(current_user_id)
 
         # 只能查看自己的信息或管理员查看所有信息
-        if current_user.role != 'admin' and current_user_id != user_id:
+        if not current_user.is_admin and current_user_id != user_id:
             return jsonify({'error': '权限不足'}), 403
 
         user = User.query.get_or_404(user_id)
@@ -136,38 +188,47 @@ def update_user(user_id):
     """更新用户信息"""
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_principal(current_user_id)
 
         # 只能修改自己的信息或管理员修改所有信息
-        if current_user.role != 'admin' and current_user_id != user_id:
+        if not current_user.is_admin and current_user_id != user_id:
             return jsonify({'error': '权限不足'}), 403
 
         user = User.query.get_or_404(user_id)
         data = request.get_json()
 
+        # 检查新的用户名和邮箱是否已被其他用户使用
+        new_username = data['username'] if 'username' in data and data['username'] != user.username else None
+        new_email = data['email'] if 'email' in data and data['email'] != user.email else None
+        conflict = login_conflict_error(new_username, new_email, exclude_user_id=user_id)
+        if conflict:
+            return jsonify({'error': conflict}), 400
+
         # 更新字段
-        if 'username' in data and data['username'] != user.username:
-            # 检查用户名是否已存在
-            existing_user = User.query.filter_by(username=data['username']).first()
-            if existing_user and existing_user.id != user_id:
-                return jsonify({'error': '用户名已存在'}), 400
-            user.username = data['username']
-
-        if 'email' in data and data['email'] != user.email:
-            # 检查邮箱是否已存在
-            existing_user = User.query.filter_by(email=data['email']).first()
-            if existing_user and existing_user.id != user_id:
-                return jsonify({'error': '邮箱已存在'}), 400
-            user.email = data['email']
-
-        if 'role' in data and current_user.role == 'admin':
+        if new_username:
+            user.username = new_username
+
+        if new_email:
+            user.email = new_email
+
+        access_changed = False
+        if 'role' in data and current_user.is_admin and data['role'] != user.role:
             user.role = data['role']
+            access_changed = True
 
-        if 'is_active' in data and current_user.role == 'admin':
+        if 'is_active' in data and current_user.is_admin and data['is_active'] != user.is_active:
             user.is_active = data['is_active']
+            access_changed = True
+
+        # 角色或状态变更后吊销该用户已签发的令牌，强制重新登录
+        if access_changed:
+            revoke_user_tokens(user_id)
 
         db.session.commit()
 
+        if access_changed:
+            invalidate_principal(user_id)
+
         return jsonify({
             'message': '用户信息更新成功',
             'user': user.to_dict()
@@ -196,7 +257,9 @@ def delete_user(user_id):
             return jsonify({'error': '用户有未归还的图书，无法删除'}), 400
 
         db.session.delete(user)
+        revoke_user_tokens(user_id)
         db.session.commit()
+        invalidate_principal(user_id)
 
         return jsonify({'message': '用户删除成功'}), 200
 
@@ -213,17 +276,17 @@ def update_profile():
         user = User.query.get_or_404(current_user_id)
         data = request.get_json()
 
-        if 'username' in data and data['username'] != user.username:
-            existing_user = User.query.filter_by(username=data['username']).first()
-            if existing_user:
-                return jsonify({'error': '用户名已存在'}), 400
-            user.username = data['username']
+        new_username = data['username'] if 'username' in data and data['username'] != user.username else None
+        new_email = data['email'] if 'email' in data and data['email'] != user.email else None
+        conflict = login_conflict_error(new_username, new_email, exclude_user_id=current_user_id)
+        if conflict:
+            return jsonify({'error': conflict}), 400
+
+        if new_username:
+            user.username = new_username
 
-        if 'email' in data and data['email'] != user.email:
-            existing_user = User.query.filter_by(email=data['email']).first()
-            if existing_user:
-                return jsonify({'error': '邮箱已存在'}), 400
-            user.email = data['email']
+        if new_email:
+            user.email = new_email
 
         db.session.commit()
 
@@ -261,6 +324,9 @@ def change_password():
 
         return jsonify({'message': '密码修改成功'}), 200
 
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""图书批量导入
+
+以流式方式逐行读取上传的 CSV / Excel 文件，不把整个文件载入内存：
+- CSV 使用标准库 csv 模块
+- Excel（.xlsx）使用 openpyxl 只读模式（可选依赖，未安装时只支持 CSV）
+
+每 batch_size 行为一批：校验字段，用一条 IN 查询检查该批 ISBN 是否已存在，
+再用 bulk_insert_mappings 批量插入并提交。返回逐行的错误报告。
+"""
+import csv
+import heapq
+import io
+from datetime import datetime, date
+from ..models import db, Book, Category
+from .catalog_cache import invalidate_all_books
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_ERRORS = 1000
+
+REQUIRED_FIELDS = ['isbn', 'title', 'author', 'category_id', 'total_copies']
+
+# 表头别名（支持中文表头）
+HEADER_ALIASES = {
+    'isbn': 'isbn',
+    'title': 'title',
+    '书名': 'title',
+    'author': 'author',
+    '作者': 'author',
+    'publisher': 'publisher',
+    '出版社': 'publisher',
+    'publish_date': 'publish_date',
+    '出版日期': 'publish_date',
+    'category_id': 'category_id',
+    '分类id': 'category_id',
+    'total_copies': 'total_copies',
+    '数量': 'total_copies',
+}
+
+
+class ImportFileError(ValueError):
+    """导入文件无法读取"""
+
+
+def _normalize_header(header):
+    key = str(header).strip().lower() if header is not None else ''
+    return HEADER_ALIASES.get(key)
+
+
+def _iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        headers = next(reader, None)
+        if not headers:
+            raise ImportFileError('导入文件为空')
+        fields = [_normalize_header(header) for header in headers]
+        for values in reader:
+            yield {field: value for field, value in zip(fields, values) if field}
+    except UnicodeDecodeError:
+        raise ImportFileError('CSV文件需使用UTF-8编码')
+    finally:
+        text.detach()
+
+
+def _iter_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('服务器未安装 openpyxl，暂不支持 Excel 文件，请使用 CSV')
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if not headers:
+            raise ImportFileError('导入文件为空')
+        fields = [_normalize_header(header) for header in headers]
+        for values in rows:
+            yield {field: value for field, value in zip(fields, values) if field}
+    finally:
+        workbook.close()
+
+
+def iter_rows(filename, stream):
+    """按文件类型逐行读取，返回字段名已规范化的 dict"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        return _iter_csv(stream)
+    if extension == 'xlsx':
+        return _iter_xlsx(stream)
+    raise ImportFileError('仅支持 CSV 或 XLSX 文件')
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def validate_row(row, category_ids, created_at):
+    """校验并转换一行数据，返回 (mapping, 错误信息)"""
+    data = {field: row.get(field) for field in HEADER_ALIASES.values()}
+
+    for field in REQUIRED_FIELDS:
+        if not _clean(data[field]):
+            return None, f'{field}是必填项'
+
+    try:
+        category_id = int(_clean(data['category_id']))
+    except ValueError:
+        return None, 'category_id必须是整数'
+    if category_id not in category_ids:
+        return None, f'分类 {category_id} 不存在'
+
+    try:
+        total_copies = int(_clean(data['total_copies']))
+    except ValueError:
+        return None, 'total_copies必须是整数'
+    if total_copies < 1:
+        return None, 'total_copies必须大于0'
+
+    publish_date = data['publish_date']
+    if isinstance(publish_date, datetime):
+        publish_date = publish_date.date()
+    elif isinstance(publish_date, date):
+        pass
+    elif _clean(publish_date):
+        # fromisoformat 比 strptime 快得多，长度检查保证只接受 YYYY-MM-DD
+        value = _clean(publish_date)
+        try:
+            if len(value) != 10:
+                raise ValueError(value)
+            publish_date = date.fromisoformat(value)
+        except ValueError:
+            return None, 'publish_date格式应为YYYY-MM-DD'
+    else:
+        publish_date = None
+
+    isbn = _clean(data['isbn'])
+    if len(isbn) > 20:
+        return None, 'ISBN长度不能超过20'
+
+    return {
+        'isbn': isbn,
+        'title': _clean(data['title']),
+        'author': _clean(data['author']),
+        'publisher': _clean(data['publisher']) or None,
+        'publish_date': publish_date,
+        'category_id': category_id,
+        'total_copies': total_copies,
+        'available_copies': total_copies,
+        'created_at': created_at
+    }, None
+
+
+class ImportReport:
+    """导入结果"""
+
+    def __init__(self, max_errors=DEFAULT_MAX_ERRORS):
+        self.imported = 0
+        self.failed = 0
+        # 以 (-行号, -序号, 错误) 保存的堆，堆顶为已保留错误中行号最大（同一行中最晚加入）的一条
+        self._errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, row_number, isbn, message):
+        self.failed += 1
+        if self.max_errors <= 0:
+            return
+        # "ISBN已存在" 在整批提交时才发现，晚于同批后续行的校验错误加入；
+        # 超出上限时按行号保留最前面的 max_errors 条
+        entry = (-row_number, -self.failed, {'row': row_number, 'isbn': isbn, 'error': message})
+        if len(self._errors) < self.max_errors:
+            heapq.heappush(self._errors, entry)
+        else:
+            heapq.heappushpop(self._errors, entry)
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': [error for _, _, error in sorted(self._errors, reverse=True)],
+            'errors_truncated': self.failed > len(self._errors)
+        }
+
+
+def import_books(rows, batch_size=DEFAULT_BATCH_SIZE, max_errors=DEFAULT_MAX_ERRORS, progress=None):
+    """批量导入图书
+
+    rows 为 iter_rows() 返回的迭代器；每批校验后一次性插入并提交。
+    progress 为可选回调，每提交一批后以已读取的行数调用。返回 ImportReport。
+    """
+    report = ImportReport(max_errors)
+    category_ids = {category_id for (category_id,) in db.session.query(Category.id)}
+    seen_isbns = set()
+    created_at = datetime.utcnow()
+
+    def flush(batch):
+        if not batch:
+            return
+        # 一次查询检查本批 ISBN 是否已存在
+        isbns = [mapping['isbn'] for _, mapping in batch]
+        existing = {isbn for (isbn,) in db.session.query(Book.isbn).filter(Book.isbn.in_(isbns))}
+
+        mappings = []
+        for row_number, mapping in batch:
+            if mapping['isbn'] in existing:
+                report.add_error(row_number, mapping['isbn'], 'ISBN已存在')
+            else:
+                mappings.append(mapping)
+
+        if mappings:
+            db.session.bulk_insert_mappings(Book, mappings)
+            invalidate_all_books()
+            db.session.commit()
+            report.imported += len(mappings)
+
+    batch = []
+    row_number = 1
+    # 数据从第2行开始（第1行为表头）
+    for row_number, row in enumerate(rows, start=2):
+        if not any(_clean(value) for value in row.values()):
+            continue
+
+        mapping, error = validate_row(row, category_ids, created_at)
+        if error:
+            report.add_error(row_number, _clean(row.get('isbn')), error)
+            continue
+
+        if mapping['isbn'] in seen_isbns:
+            report.add_error(row_number, mapping['isbn'], '文件中ISBN重复')
+            continue
+        seen_isbns.add(mapping['isbn'])
+
+        batch.append((row_number, mapping))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+            if progress:
+                progress(row_number - 1)
+
+    flush(batch)
+    if progress:
+        progress(row_number - 1)
+
+    return report
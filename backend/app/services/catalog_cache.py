@@ -0,0 +1,393 @@
+"""目录响应缓存
+
+图书列表（get_books）和图书详情（get_book）的服务端缓存，保存序列化后的 JSON 响应体：
+首页等相同查询命中时不再执行列表查询、计数和序列化。
+
+- 键：接口名 + 排序后的查询参数，参数顺序不同的请求共用同一条缓存
+  （空值保留：cursor= 表示游标分页的第一页）
+- 标签：每条缓存带有若干标签，写操作按标签精确失效
+    book:<id>                 详情页，以及包含该书的列表页
+    books:category:<id>       按分类过滤的列表页
+    books:category:*          未按分类过滤的列表页（首页、检索结果等）
+    books:available           只看可借图书的列表页
+    books:rating              按评分排序或过滤的列表页
+- 失效：create/update/delete_book 失效该书及其（新旧）分类的列表页；借还书只改变库存，
+  只失效该书所在的页面和"只看可借"的页面；评分变化同理。失效请求先记在会话上，事务提交后才执行，
+  回滚则丢弃，避免并发请求在提交前把旧数据重新写回缓存；查询期间发生过失效的响应也不写入缓存
+
+其他 gunicorn worker 和后台任务进程中的写操作不会通知本进程的缓存，因此标签同时在数据库中有版本号：
+books 表上的触发器按写入的列更新对应标签（与上面的失效规则相同，如借还书只更新 book:<id> 和
+books:available），新版本号为全部标签中的最大值 + 1。缓存条目记录查询前的最大版本号，
+命中前用一条主键 IN 查询确认条目的标签都没有更新过，所以借还书只使被借还的图书所在的页面不再命中，
+其他页面不受影响。命中的响应使用 conditional_get 本次计算的 ETag（标签未变说明响应体与当前数据一致）。
+标签版本号依赖触发器，非 SQLite 数据库（没有 ETag）上不使用响应缓存。
+
+后端由配置 RESPONSE_CACHE_BACKEND 选择：
+- local：进程内 LRU + TTL，按条数和响应体总字节数限制容量（默认）
+- null：不缓存
+可通过 register_cache_backend() 注册共享后端（如 Redis），接口与 LocalCacheBackend 相同。
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from ..models import db, CacheTagVersion
+
+DEFAULT_TTL = 30  # 秒
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+ALL_CATEGORIES_TAG = 'books:category:*'
+AVAILABLE_TAG = 'books:available'
+RATING_TAG = 'books:rating'
+# 失效全部缓存（如批量导入）
+ALL_TAG = '*'
+
+_PENDING_KEY = 'catalog_cache_pending_tags'
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'tags', 'version'])
+# 查询数据前记录：本进程缓存的失效代数、数据库中的最大标签版本号
+CacheSnapshot = namedtuple('CacheSnapshot', ['generation', 'version'])
+
+
+def book_tag(book_id):
+    return f'book:{book_id}'
+
+
+def category_tag(category_id):
+    return f'books:category:{category_id}'
+
+
+def cache_key(endpoint, args):
+    """由接口名和查询参数生成缓存键，args 为 request.args"""
+    items = sorted((key, value) for key, values in args.lists() for value in values)
+    return f'{endpoint}?{urlencode(items)}'
+
+
+def book_list_tags(book_ids, category_id=None, available_only=False, by_rating=False):
+    """列表页的标签"""
+    tags = {book_tag(book_id) for book_id in book_ids}
+    tags.add(category_tag(category_id) if category_id else ALL_CATEGORIES_TAG)
+    if available_only:
+        tags.add(AVAILABLE_TAG)
+    if by_rating:
+        tags.add(RATING_TAG)
+    return tags
+
+
+class LocalCacheBackend:
+    """线程安全的进程内 LRU + TTL 缓存，key -> CachedResponse"""
+
+    name = 'local'
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (CachedResponse, tags, expires_at)
+        self._items = OrderedDict()
+        # tag -> {key}
+        self._tags = {}
+        self._bytes = 0
+        # 每次失效递增，见 set() 的 generation 参数
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _remove(self, key):
+        entry, tags, _ = self._items.pop(key)
+        self._bytes -= len(entry.body)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key, validate=None):
+        """返回 CachedResponse；已过期或 validate(entry) 为 False 的条目删除并视为未命中
+
+        validate 可能查询数据库，在锁外调用。
+        """
+        with self._lock:
+            item = self._items.get(key)
+        valid = item is not None and item[2] >= time.monotonic() and (validate is None or validate(item[0]))
+        with self._lock:
+            if not valid:
+                # 期间已被替换的条目保留
+                if item is not None and self._items.get(key) is item:
+                    self._remove(key)
+                self._stats['misses'] += 1
+                return None
+            if key in self._items:
+                self._items.move_to_end(key)
+            self._stats['hits'] += 1
+            return item[0]
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def set(self, key, body, tags=(), version=0, generation=None):
+        """写入缓存，body 为响应体（bytes），version 为查询数据前的最大标签版本号
+
+        generation 为查询数据前读取的 self.generation，期间有过失效时放弃写入，
+        以免把失效前查到的旧数据写回缓存。
+        """
+        # 单条超过容量上限的响应不缓存
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._items:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._items[key] = (CachedResponse(body, tags, version), tags, time.monotonic() + self.ttl)
+            self._bytes += len(body)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._stats['sets'] += 1
+
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._items)))
+                self._stats['evictions'] += 1
+
+    def invalidate_tags(self, tags):
+        """删除带有任一标签的缓存，返回删除的条数"""
+        with self._lock:
+            self._generation += 1
+            if ALL_TAG in tags:
+                keys = list(self._items)
+            else:
+                keys = set()
+                for tag in tags:
+                    keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'backend': self.name,
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+                'entries': len(self._items),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            }
+
+
+class NullCacheBackend:
+    """不缓存，用于关闭响应缓存"""
+
+    name = 'null'
+    generation = 0
+
+    def __init__(self, **kwargs):
+        self._misses = 0
+
+    def get(self, key, validate=None):
+        self._misses += 1
+        return None
+
+    def set(self, key, body, tags=(), version=0, generation=None):
+        pass
+
+    def invalidate_tags(self, tags):
+        return 0
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': self.name, 'hits': 0, 'misses': self._misses}
+
+
+_backend_factories = {
+    LocalCacheBackend.name: LocalCacheBackend,
+    NullCacheBackend.name: NullCacheBackend,
+}
+
+
+def register_cache_backend(name, factory):
+    """注册缓存后端，factory 接受 ttl / max_entries / max_bytes 关键字参数，
+    返回的对象需实现 get(key, validate) / set / invalidate_tags / clear / stats 和 generation 属性"""
+    _backend_factories[name] = factory
+
+
+def get_response_cache():
+    """当前应用实例的响应缓存"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        name = current_app.config.get('RESPONSE_CACHE_BACKEND') or LocalCacheBackend.name
+        cache = _backend_factories[name](
+            ttl=current_app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL),
+            max_entries=current_app.config.get('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            max_bytes=current_app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        )
+        current_app.extensions['response_cache'] = cache
+    return cache
+
+
+def _latest_tag_version(tags=None):
+    """标签的最大版本号；tags 为 None 时返回全部标签中的最大值"""
+    query = db.session.query(db.func.max(CacheTagVersion.version))
+    if tags is not None:
+        query = query.filter(CacheTagVersion.tag.in_(tags))
+    return query.scalar() or 0
+
+
+def _is_current(entry):
+    return _latest_tag_version(entry.tags) <= entry.version
+
+
+def cached_response(key):
+    """命中且条目的标签在数据库中都没有更新过时返回响应，否则返回 None"""
+    # 没有 ETag 说明标签版本号不可用（非 SQLite）
+    if not g.get('catalog_etag'):
+        return None
+    entry = get_response_cache().get(key, validate=_is_current)
+    if entry is None:
+        return None
+    return current_app.response_class(entry.body, mimetype='application/json')
+
+
+def cache_snapshot():
+    """查询数据前调用，返回传给 store_response() 的 CacheSnapshot；不使用缓存时返回 None"""
+    if not g.get('catalog_etag'):
+        return None
+    return CacheSnapshot(get_response_cache().generation, _latest_tag_version())
+
+
+def store_response(key, response, tags, snapshot):
+    """缓存 JSON 响应，snapshot 为查询数据前 cache_snapshot() 的返回值"""
+    if snapshot is None:
+        return
+    get_response_cache().set(
+        key, response.get_data(), tags,
+        version=snapshot.version, generation=snapshot.generation
+    )
+
+
+def _queue(tags):
+    db.session.info.setdefault(_PENDING_KEY, set()).update(tags)
+
+
+def invalidate_book(book_id, *category_ids):
+    """图书新增、修改或删除：失效该书以及可能因此增减条目的列表页
+
+    category_ids 为图书修改前后所属的分类。
+    """
+    tags = {ALL_CATEGORIES_TAG}
+    if book_id is not None:
+        tags.add(book_tag(book_id))
+    tags.update(category_tag(category_id) for category_id in category_ids if category_id)
+    _queue(tags)
+
+
+def invalidate_book_availability(book_ids):
+    """借还书只改变库存：失效这些书所在的页面和"只看可借"的列表页"""
+    tags = {book_tag(book_id) for book_id in book_ids}
+    if tags:
+        tags.add(AVAILABLE_TAG)
+        _queue(tags)
+
+
+def invalidate_book_rating(book_id):
+    """评分变化：失效该书所在的页面和按评分排序或过滤的列表页"""
+    _queue({book_tag(book_id), RATING_TAG})
+
+
+def invalidate_all_books():
+    _queue({ALL_TAG})
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    tags = session.info.pop(_PENDING_KEY, None)
+    if tags and has_app_context():
+        get_response_cache().invalidate_tags(tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _book_tag_sql(row):
+    return f"'{book_tag('')}' || {row}.id"
+
+
+def _category_tag_sql(row):
+    return f"'{category_tag('')}' || {row}.category_id"
+
+
+# 触发器名 -> (写操作, 更新的标签)，与 invalidate_* 的失效规则一致
+_TAG_TRIGGERS = {
+    'books_cache_tags_insert': ('INSERT', [
+        _category_tag_sql('new'), f"'{ALL_CATEGORIES_TAG}'"
+    ]),
+    'books_cache_tags_delete': ('DELETE', [
+        _book_tag_sql('old'), _category_tag_sql('old'), f"'{ALL_CATEGORIES_TAG}'"
+    ]),
+    'books_cache_tags_update': ('UPDATE OF isbn, title, author, publisher, publish_date, category_id, total_copies', [
+        _book_tag_sql('new'), _category_tag_sql('old'), _category_tag_sql('new'), f"'{ALL_CATEGORIES_TAG}'"
+    ]),
+    # 借还书只改变库存
+    'books_cache_tags_available': ('UPDATE OF available_copies', [
+        _book_tag_sql('new'), f"'{AVAILABLE_TAG}'"
+    ]),
+    'books_cache_tags_rating': ('UPDATE OF rating_count, rating_sum', [
+        _book_tag_sql('new'), f"'{RATING_TAG}'"
+    ]),
+}
+
+# 新版本号为全部标签中的最大值 + 1；分类为空的图书没有分类标签
+_BUMP_TAGS = """INSERT INTO cache_tag_versions (tag, version)
+        SELECT tag, (SELECT coalesce(max(version), 0) + 1 FROM cache_tag_versions)
+        FROM ({tags}) WHERE tag IS NOT NULL
+        ON CONFLICT(tag) DO UPDATE SET version = excluded.version;"""
+
+
+def create_tag_triggers(connection):
+    for name, (operation, tags) in _TAG_TRIGGERS.items():
+        union = ' UNION '.join(f'SELECT {tag} AS tag' for tag in tags)
+        connection.execute(text(
+            f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {operation} ON books BEGIN
+                {_BUMP_TAGS.format(tags=union)}
+            END"""
+        ))
+
+
+def drop_tag_triggers(connection):
+    for name in _TAG_TRIGGERS:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+
+
+# 触发器引用 books 和 cache_tag_versions 两张表，需在全部表创建之后创建
+@event.listens_for(db.metadata, 'after_create')
+def _create_tag_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_tag_triggers(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_tag_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_tag_triggers(connection)
@@ -0,0 +1,93 @@
+"""借阅资格
+
+用一条分组查询同时得到用户是否存在、是否启用、在借数量、逾期数量和为其保留的预约数：
+
+    SELECT users.is_active,
+           SUM(CASE WHEN status = 'borrowed' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status = 'overdue' THEN 1 ELSE 0 END),
+           (SELECT COUNT(*) FROM reservations WHERE user_id = users.id AND status = 'active')
+    FROM users LEFT JOIN borrow_records ON ... AND status IN ('borrowed', 'overdue')
+    WHERE users.id = :user_id
+    GROUP BY users.id
+
+借阅、续借、预约共用同一个检查结果。
+"""
+from ..models import db, User, BorrowRecord, Reservation
+
+MAX_BORROWS = 5  # 最大借阅数量
+
+
+class BorrowEligibility:
+    """用户当前的借阅状态"""
+
+    def __init__(self, user_id, exists, is_active, active_count, overdue_count, hold_count=0):
+        self.user_id = user_id
+        self.exists = exists
+        self.is_active = is_active
+        self.active_count = active_count
+        self.overdue_count = overdue_count
+        # 已为该用户保留副本的预约数（services/holds.py）
+        self.hold_count = hold_count
+
+    def _account_error(self):
+        if not self.exists:
+            return '用户不存在', 404
+        if not self.is_active:
+            return '账户已被禁用', 403
+        return None
+
+    def _overdue_error(self):
+        if self.overdue_count > 0:
+            return '您有逾期未还的图书，请先归还', 400
+        return None
+
+    def borrow_error(self):
+        """不能借阅时返回 (错误信息, 状态码)，否则返回 None"""
+        error = self._account_error()
+        if error:
+            return error
+        if self.active_count >= MAX_BORROWS:
+            return f'已达到最大借阅数量({MAX_BORROWS}本)', 400
+        return self._overdue_error()
+
+    def renew_error(self):
+        """不能续借时返回 (错误信息, 状态码)，否则返回 None"""
+        return self._account_error() or self._overdue_error()
+
+    def reserve_error(self):
+        """不能预约时返回 (错误信息, 状态码)，否则返回 None"""
+        return self._account_error() or self._overdue_error()
+
+
+def get_borrow_eligibility(user_id):
+    """查询用户的借阅资格（一条查询）"""
+    active_count = db.func.sum(db.case((BorrowRecord.status == 'borrowed', 1), else_=0))
+    overdue_count = db.func.sum(db.case((BorrowRecord.status == 'overdue', 1), else_=0))
+    hold_count = db.select(db.func.count(Reservation.id)).where(
+        Reservation.user_id == User.id,
+        Reservation.status == 'active'
+    ).scalar_subquery()
+
+    row = db.session.query(
+        User.is_active,
+        active_count,
+        overdue_count,
+        hold_count
+    ).outerjoin(
+        BorrowRecord,
+        (BorrowRecord.user_id == User.id) & BorrowRecord.status.in_(['borrowed', 'overdue'])
+    ).filter(User.id == user_id).group_by(User.id).first()
+
+    if row is None:
+        return BorrowEligibility(user_id, False, False, 0, 0)
+
+    is_active, active, overdue, holds = row
+    # is_active 为空视为启用（与 User.is_active 默认值一致）
+    return BorrowEligibility(
+        user_id,
+        True,
+        is_active is not False,
+        active or 0,
+        overdue or 0,
+        holds or 0
+    )
@@ -0,0 +1,120 @@
+"""预约保留队列
+
+每本书的待处理预约（status='pending'）按预约时间组成先进先出的队列，
+由索引 idx_reservations_queue (book_id, status, reservation_date) 支持。
+
+归还的副本先分配给队列中最早的有效预约，不计入可借库存：
+- 一条条件 UPDATE 把队首预约改为 active（为该用户保留），有效期改为取书截止时间，RETURNING 取回预约者；
+  子查询与更新在同一条语句中完成，并发归还不会把同一副本分给两人
+- 一条 INSERT ... SELECT 生成 reservation_available 通知（书名取自 books）
+队列为空时副本才回到可借库存。每归还一本书只需常数条查询。
+
+保留者借阅该书时直接使用保留的副本（claim_hold），不再扣减库存；
+保留被取消或过期时副本顺延给下一位预约者（release_hold）。
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from ..models import db, Book, Reservation, Notification
+from .inventory import release_copies_bulk
+
+DEFAULT_HOLD_DAYS = 3  # 取书期限（天）
+
+
+def _pickup_deadline(now):
+    return now + timedelta(days=current_app.config.get('RESERVATION_HOLD_DAYS', DEFAULT_HOLD_DAYS))
+
+
+def assign_next_hold(book_id, now=None):
+    """把一本副本保留给该书队首的有效预约并通知预约者，返回预约 ID；队列为空时返回 None"""
+    now = now or datetime.utcnow()
+    deadline = _pickup_deadline(now)
+
+    next_in_queue = db.select(Reservation.id).where(
+        Reservation.book_id == book_id,
+        Reservation.status == 'pending',
+        Reservation.expires_at > now
+    ).order_by(Reservation.reservation_date, Reservation.id).limit(1).scalar_subquery()
+
+    hold = db.session.execute(
+        db.update(Reservation)
+        .where(Reservation.id == next_in_queue)
+        .values(status='active', expires_at=deadline)
+        .returning(Reservation.id, Reservation.user_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if hold is None:
+        return None
+
+    content = (
+        db.literal('您预约的图书《') + Book.title +
+        db.literal(f'》已为您保留，请在 {deadline.strftime("%Y-%m-%d %H:%M")} 前办理借阅，逾期将顺延给下一位预约者。')
+    )
+    db.session.execute(
+        db.insert(Notification).from_select(
+            ['user_id', 'book_id', 'title', 'content', 'notification_type', 'is_read', 'created_at'],
+            db.select(
+                db.literal(hold.user_id),
+                Book.id,
+                db.literal('预约图书到馆提醒'),
+                content,
+                db.literal('reservation_available'),
+                db.literal(False),
+                db.literal(now)
+            ).where(Book.id == book_id)
+        )
+    )
+    return hold.id
+
+
+def return_copies(book_deltas, now=None):
+    """归还副本，book_deltas 为 {book_id: 数量}
+
+    有预约队列的图书依次分配给队首预约，其余计入可借库存。返回保留的副本数，调用方负责提交。
+    """
+    if not book_deltas:
+        return 0
+    now = now or datetime.utcnow()
+
+    # 一次查询找出有待处理预约的图书，没有预约的图书直接归还库存
+    queued = {book_id for (book_id,) in db.session.query(Reservation.book_id).filter(
+        Reservation.book_id.in_(list(book_deltas)),
+        Reservation.status == 'pending'
+    ).distinct()}
+
+    remaining = {}
+    held = 0
+    for book_id, count in book_deltas.items():
+        if book_id in queued:
+            while count and assign_next_hold(book_id, now):
+                count -= 1
+                held += 1
+        if count:
+            remaining[book_id] = count
+
+    release_copies_bulk(remaining)
+    return held
+
+
+def claim_hold(user_id, book_id, now=None):
+    """用户借阅为其保留的副本：把 active 预约标记为已完成，返回是否存在保留
+
+    已超过取书期限的保留即使过期清理任务尚未处理也不能再使用，副本由清理任务顺延给下一位预约者。
+    """
+    now = now or datetime.utcnow()
+    result = db.session.execute(
+        db.update(Reservation)
+        .where(
+            Reservation.book_id == book_id,
+            Reservation.status == 'active',
+            Reservation.user_id == user_id,
+            Reservation.expires_at > now
+        )
+        .values(status='fulfilled')
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+def release_hold(book_id, now=None):
+    """保留被取消或过期：副本顺延给下一位预约者，队列为空时计入可借库存"""
+    return_copies({book_id: 1}, now)
@@ -0,0 +1,56 @@
+"""图书库存
+
+库存增减都在数据库端以单条条件 UPDATE 完成，不在 Python 中读-改-写，
+多个 gunicorn worker 并发借阅同一本书时也不会超借或出现负库存，且无需全局锁。
+库存变化后失效该书的目录响应缓存（提交后生效）。
+"""
+from ..models import db, Book
+from .catalog_cache import invalidate_book_availability
+
+
+def take_copy(book_id):
+    """扣减一本可借库存，库存不足时返回 False
+
+    UPDATE books SET available_copies = available_copies - 1
+    WHERE id = :book_id AND available_copies > 0
+    """
+    result = db.session.execute(
+        db.update(Book)
+        .where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    invalidate_book_availability([book_id])
+    return True
+
+
+def release_copies(book_id, count=1):
+    """归还库存"""
+    db.session.execute(
+        db.update(Book)
+        .where(Book.id == book_id)
+        .values(available_copies=Book.available_copies + count)
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_book_availability([book_id])
+
+
+def release_copies_bulk(book_deltas):
+    """按图书批量归还库存，book_deltas 为 {book_id: 归还数量}
+
+    UPDATE books SET available_copies = available_copies + CASE id WHEN ... END
+    WHERE id IN (...)
+    """
+    if not book_deltas:
+        return
+
+    delta = db.case(book_deltas, value=Book.id, else_=0)
+    db.session.execute(
+        db.update(Book)
+        .where(Book.id.in_(list(book_deltas)))
+        .values(available_copies=Book.available_copies + delta)
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_book_availability(book_deltas)
@@ -0,0 +1,281 @@
+"""后台任务队列
+
+耗时的管理操作（批量导入、批量创建用户、批量归还、统计汇总、逾期检查）不在请求中同步执行：
+接口只在 jobs 表中插入一条 queued 记录并立即返回，由独立的 worker 进程
+（tasks/job_worker.py）轮询领取并执行，客户端通过 GET /api/jobs/<id> 查询进度和结果。
+
+领取任务用条件 UPDATE（WHERE status = 'queued'）完成，多个 worker 同时运行时
+同一任务只会被一个 worker 领取，领取时生成的 claim_token 标识这次领取。
+
+执行中的任务在领取和每次上报进度时更新 heartbeat_at，所有处理函数都按批上报进度。
+worker 崩溃或被杀死后任务会一直停在 running，因此领取任务前先把超过 JOB_STALE_TIMEOUT 秒没有心跳的
+running 任务标记为失败（不自动重新排队：导入等任务可能已部分提交，重复执行的后果由管理员判断）。
+上报进度和记录结果都是带 status = 'running' 和 claim_token 条件的 UPDATE：任务已被标记为失败时，
+仍在执行的处理函数在下次上报进度时收到 JobLostError 并停止，结果也不会覆盖失败状态。
+"""
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from ..models import db, Job
+
+# 进度更新的最小间隔（秒），避免每批都写一次数据库
+PROGRESS_INTERVAL = 1.0
+DEFAULT_STALE_TIMEOUT = 600  # 秒
+
+
+class UnknownJobTypeError(ValueError):
+    """不支持的任务类型"""
+
+
+class JobLostError(Exception):
+    """任务已不属于当前 worker（超时后被标记为失败）"""
+
+
+class JobContext:
+    """传给任务处理函数，用于在执行过程中上报进度"""
+
+    def __init__(self, job):
+        self.job = job
+        self._last_report = None
+
+    def report_progress(self, progress, message=None, force=False):
+        """更新任务进度（0-100）并提交；间隔过短的更新会被忽略"""
+        now = datetime.utcnow()
+        if not force and self._last_report and \
+                (now - self._last_report).total_seconds() < PROGRESS_INTERVAL:
+            return
+
+        values = {'progress': max(0, min(int(progress), 100)), 'heartbeat_at': now}
+        if message is not None:
+            values['progress_message'] = message
+        updated = _update_claimed_job(self.job, values)
+        db.session.commit()
+        if not updated:
+            raise JobLostError(f'任务 {self.job.id} 已超时被标记为失败')
+        self._last_report = now
+
+
+def _update_claimed_job(job, values):
+    """仅在任务仍由本次领取执行时更新，返回是否更新成功"""
+    result = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job.id, Job.status == 'running', Job.claim_token == job.claim_token)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _run_book_import(ctx, payload):
+    from .book_import import iter_rows, import_books, DEFAULT_BATCH_SIZE, DEFAULT_MAX_ERRORS
+
+    path = payload['path']
+    try:
+        size = os.path.getsize(path) or 1
+        with open(path, 'rb') as stream:
+            def progress(rows_read):
+                # 按已读取的字节数估算进度，导入完成前最多显示99%
+                percent = min(stream.tell() * 100 // size, 99)
+                ctx.report_progress(percent, f'已处理 {rows_read} 行')
+
+            report = import_books(
+                iter_rows(payload['filename'], stream),
+                batch_size=current_app.config.get('BOOK_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                max_errors=current_app.config.get('BOOK_IMPORT_MAX_ERRORS', DEFAULT_MAX_ERRORS),
+                progress=progress
+            )
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    return report.to_dict()
+
+
+def _run_user_provisioning(ctx, payload):
+    from .user_provisioning import create_users
+
+    path = payload['path']
+    try:
+        with open(path, encoding='utf-8') as stream:
+            rows = json.load(stream)
+    finally:
+        # 文件中含明文密码，读取后立即删除
+        if os.path.exists(path):
+            os.remove(path)
+
+    def progress(hashed, total):
+        ctx.report_progress(min(hashed * 100 // total, 99), f'已处理 {hashed}/{total} 个用户')
+
+    return create_users(rows, progress=progress, background=True)
+
+
+def _run_batch_return(ctx, payload):
+    from .returns import bulk_return, IN_CHUNK_SIZE
+
+    record_ids = payload.get('record_ids', [])
+    now = datetime.utcnow()
+    returned_count = 0
+    errors = []
+    # 分块归还并提交，每块之后上报进度；后面块中的重复ID已在数据库中归还，同样报告为已归还
+    for i in range(0, len(record_ids), IN_CHUNK_SIZE):
+        returned, chunk_errors = bulk_return(record_ids[i:i + IN_CHUNK_SIZE], now)
+        db.session.commit()
+        returned_count += len(returned)
+        errors.extend(chunk_errors)
+        processed = min(i + IN_CHUNK_SIZE, len(record_ids))
+        ctx.report_progress(min(processed * 100 // len(record_ids), 99),
+                            f'已处理 {processed}/{len(record_ids)} 条借阅记录')
+
+    return {
+        'returned_count': returned_count,
+        'errors': errors
+    }
+
+
+def _run_stats_rollup(ctx, payload):
+    from .stats import rollup_borrow_stats
+
+    def progress(done, total):
+        ctx.report_progress(min(done * 100 // total, 99), '正在汇总借阅统计')
+
+    return {'processed': rollup_borrow_stats(progress=progress)}
+
+
+def _run_overdue_check(ctx, payload):
+    from .overdue import sweep_overdue_books, count_overdue_books, DEFAULT_BATCH_SIZE
+
+    now = datetime.utcnow()
+    total = count_overdue_books(now) or 1
+
+    def progress(processed):
+        ctx.report_progress(min(processed * 100 // total, 99), f'已处理 {processed} 条逾期记录')
+
+    count = sweep_overdue_books(
+        now,
+        batch_size=current_app.config.get('OVERDUE_SWEEP_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        progress=progress
+    )
+    return {'overdue_count': count}
+
+
+def _run_reservation_expiry(ctx, payload):
+    from .reservation_expiry import expire_reservations, count_expired_reservations, DEFAULT_BATCH_SIZE
+
+    now = datetime.utcnow()
+    total = count_expired_reservations(now) or 1
+
+    def progress(processed):
+        ctx.report_progress(min(processed * 100 // total, 99), f'已清理 {processed} 条过期预约')
+
+    return expire_reservations(
+        now,
+        batch_size=current_app.config.get('RESERVATION_EXPIRY_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        progress=progress
+    )
+
+
+# 任务类型 -> 处理函数 handler(ctx, payload)，返回值保存为任务结果
+JOB_HANDLERS = {
+    'book_import': _run_book_import,
+    'user_provisioning': _run_user_provisioning,
+    'batch_return': _run_batch_return,
+    'stats_rollup': _run_stats_rollup,
+    'overdue_check': _run_overdue_check,
+    'reservation_expiry': _run_reservation_expiry,
+}
+
+
+def register_job_handler(job_type, handler):
+    """注册自定义任务类型"""
+    JOB_HANDLERS[job_type] = handler
+
+
+def enqueue_job(job_type, payload=None, created_by=None):
+    """创建一个排队中的任务并提交，返回 Job"""
+    if job_type not in JOB_HANDLERS:
+        raise UnknownJobTypeError(f'不支持的任务类型: {job_type}')
+
+    job = Job(
+        job_type=job_type,
+        status='queued',
+        payload=payload or {},
+        progress=0,
+        created_by=created_by
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def fail_stale_jobs(now=None):
+    """把超过 JOB_STALE_TIMEOUT 秒没有心跳的 running 任务标记为失败，返回标记的任务数"""
+    now = now or datetime.utcnow()
+    timeout = current_app.config.get('JOB_STALE_TIMEOUT', DEFAULT_STALE_TIMEOUT)
+    result = db.session.execute(
+        db.update(Job)
+        .where(
+            Job.status == 'running',
+            db.func.coalesce(Job.heartbeat_at, Job.started_at) < now - timedelta(seconds=timeout)
+        )
+        .values(status='failed', error=f'worker 已中断（超过 {timeout} 秒没有心跳）', finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        current_app.logger.warning(f'{result.rowcount} 个任务的 worker 已中断，标记为失败')
+    return result.rowcount
+
+
+def claim_next_job():
+    """领取最早排队的任务，没有可执行的任务时返回 None"""
+    fail_stale_jobs()
+    while True:
+        job_id = db.session.query(Job.id).filter(
+            Job.status == 'queued'
+        ).order_by(Job.created_at, Job.id).limit(1).scalar()
+        if job_id is None:
+            return None
+
+        result = db.session.execute(
+            db.update(Job)
+            .where(Job.id == job_id, Job.status == 'queued')
+            .values(status='running', started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow(),
+                    claim_token=uuid.uuid4().hex)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        # 被其他 worker 抢先领取时继续找下一个
+        if result.rowcount == 1:
+            return db.session.get(Job, job_id)
+
+
+def run_job(job):
+    """执行任务并记录结果；处理函数抛出的异常记录为失败，不向外传播
+
+    任务执行期间已超时被标记为失败时，不覆盖失败状态。
+    """
+    handler = JOB_HANDLERS.get(job.job_type)
+    ctx = JobContext(job)
+
+    try:
+        if handler is None:
+            raise UnknownJobTypeError(f'不支持的任务类型: {job.job_type}')
+        result = handler(ctx, job.payload or {})
+        db.session.commit()
+        values = {'status': 'succeeded', 'result': result, 'progress': 100}
+    except JobLostError:
+        db.session.rollback()
+        current_app.logger.warning(f'任务 {job.id} 已超时被标记为失败，停止执行')
+        return job
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception(f'任务 {job.id} 执行失败')
+        values = {'status': 'failed', 'error': str(e)}
+
+    values['finished_at'] = datetime.utcnow()
+    if not _update_claimed_job(job, values):
+        current_app.logger.warning(f'任务 {job.id} 已超时被标记为失败，不记录执行结果')
+    db.session.commit()
+    return job
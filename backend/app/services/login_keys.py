@@ -0,0 +1,160 @@
+"""规范化登录名
+
+user_login_keys 表为每个用户保存两行：小写的用户名和小写的邮箱（两者相同时只保存一行），
+login_key 为主键。于是：
+- 登录时按用户名或邮箱查找用户只需一次主键查找，不再是跨两列的 OR 查询
+- 注册、创建和修改用户时的唯一性检查用一条 IN 查询完成，且不区分大小写
+- 用户名与其他用户的邮箱也不会冲突，登录名始终只对应一个用户
+
+该表由 users 表上的触发器维护（与 books_fts 相同），ORM 操作和 bulk_insert_mappings 都会自动同步。
+小写转换只处理 ASCII 字母，与 SQLite 的 lower() 一致。
+
+不支持触发器的数据库上该表为空：登录回退为原先的 username = ? OR email = ? 查询，
+唯一性检查回退为按 lower(username) / lower(email) 查询 users 表。
+"""
+import string
+from sqlalchemy import event, func, or_, text
+from ..models import db, User, UserLoginKey
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+LOGIN_KEY_SCHEMA = [
+    """CREATE TRIGGER IF NOT EXISTS users_login_keys_ai AFTER INSERT ON users BEGIN
+        INSERT INTO user_login_keys (login_key, user_id) VALUES (lower(new.username), new.id);
+        INSERT INTO user_login_keys (login_key, user_id)
+        SELECT lower(new.email), new.id WHERE lower(new.email) != lower(new.username);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_login_keys_au AFTER UPDATE OF username, email ON users BEGIN
+        DELETE FROM user_login_keys WHERE user_id = old.id;
+        INSERT INTO user_login_keys (login_key, user_id) VALUES (lower(new.username), new.id);
+        INSERT INTO user_login_keys (login_key, user_id)
+        SELECT lower(new.email), new.id WHERE lower(new.email) != lower(new.username);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_login_keys_ad AFTER DELETE ON users BEGIN
+        DELETE FROM user_login_keys WHERE user_id = old.id;
+    END""",
+]
+
+LOGIN_KEY_DROP = [
+    'DROP TRIGGER IF EXISTS users_login_keys_ai',
+    'DROP TRIGGER IF EXISTS users_login_keys_au',
+    'DROP TRIGGER IF EXISTS users_login_keys_ad',
+]
+
+# 为已有用户生成登录名，需先确认没有冲突（find_login_key_conflicts）
+LOGIN_KEY_BACKFILL = """INSERT INTO user_login_keys (login_key, user_id)
+    SELECT lower(username), id FROM users
+    UNION
+    SELECT lower(email), id FROM users"""
+
+# 被多个用户占用的登录名：大小写不同的重复用户名或邮箱，或某用户的用户名等于另一用户的邮箱
+LOGIN_KEY_CONFLICTS = """WITH login_keys AS (
+        SELECT lower(username) AS login_key, id AS user_id FROM users
+        UNION
+        SELECT lower(email), id FROM users
+    )
+    SELECT login_key, user_id FROM login_keys
+    WHERE login_key IN (SELECT login_key FROM login_keys GROUP BY login_key HAVING COUNT(*) > 1)
+    ORDER BY login_key, user_id"""
+
+
+class LoginKeyConflictError(Exception):
+    """已有用户的登录名冲突，无法生成 user_login_keys"""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        lines = [f'  {login_key}: 用户 {", ".join(map(str, user_ids))}' for login_key, user_ids in conflicts.items()]
+        super().__init__(
+            '以下登录名（不区分大小写）被多个用户占用，请先修改这些用户的用户名或邮箱：\n' + '\n'.join(lines)
+        )
+
+
+def normalize_login(value):
+    """登录名规范化（ASCII 字母转小写）"""
+    return value.translate(_ASCII_LOWER)
+
+
+def _has_login_keys():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def find_user_by_login(login):
+    """按用户名或邮箱查找用户（不区分大小写）"""
+    if not _has_login_keys():
+        return User.query.filter((User.username == login) | (User.email == login)).first()
+
+    return User.query.join(
+        UserLoginKey, UserLoginKey.user_id == User.id
+    ).filter(UserLoginKey.login_key == normalize_login(login)).first()
+
+
+def find_taken_login_keys(keys, exclude_user_id=None):
+    """返回 keys（已规范化）中已被其他用户占用的登录名"""
+    keys = set(keys)
+    if not keys:
+        return set()
+
+    if not _has_login_keys():
+        query = db.session.query(User.username, User.email).filter(
+            or_(func.lower(User.username).in_(keys), func.lower(User.email).in_(keys))
+        )
+        if exclude_user_id is not None:
+            query = query.filter(User.id != exclude_user_id)
+        taken = set()
+        for username, email in query:
+            taken.update(keys & {normalize_login(username), normalize_login(email)})
+        return taken
+
+    query = db.session.query(UserLoginKey.login_key).filter(UserLoginKey.login_key.in_(keys))
+    if exclude_user_id is not None:
+        query = query.filter(UserLoginKey.user_id != exclude_user_id)
+    return {login_key for (login_key,) in query}
+
+
+def login_conflict_error(username=None, email=None, exclude_user_id=None):
+    """检查用户名和邮箱是否已被占用（一条查询），返回错误信息或 None"""
+    keys = {}
+    if email:
+        keys[normalize_login(email)] = '邮箱已存在'
+    if username:
+        keys[normalize_login(username)] = '用户名已存在'
+
+    taken = find_taken_login_keys(keys, exclude_user_id)
+    # 用户名优先报告，与原先先查用户名再查邮箱的顺序一致
+    for value, message in ((username, '用户名已存在'), (email, '邮箱已存在')):
+        if value and normalize_login(value) in taken:
+            return message
+    return None
+
+
+def find_login_key_conflicts(connection):
+    """返回 {登录名: [用户ID, ...]}，只包含被多个用户占用的登录名"""
+    conflicts = {}
+    for login_key, user_id in connection.execute(text(LOGIN_KEY_CONFLICTS)):
+        conflicts.setdefault(login_key, []).append(user_id)
+    return conflicts
+
+
+def create_login_keys(connection, backfill=False):
+    """创建触发器；backfill 为 True 时为已有用户生成登录名，调用前需确认 find_login_key_conflicts() 为空"""
+    for statement in LOGIN_KEY_SCHEMA:
+        connection.execute(text(statement))
+    if backfill:
+        connection.execute(text(LOGIN_KEY_BACKFILL))
+
+
+def drop_login_keys(connection):
+    for statement in LOGIN_KEY_DROP:
+        connection.execute(text(statement))
+
+
+@event.listens_for(UserLoginKey.__table__, 'after_create')
+def _create_login_key_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_login_keys(connection)
+
+
+@event.listens_for(UserLoginKey.__table__, 'before_drop')
+def _drop_login_key_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_login_keys(connection)
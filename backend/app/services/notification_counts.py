@@ -0,0 +1,77 @@
+"""未读通知计数
+
+前端轮询通知角标时只需要未读数。user_notification_counts 为每个用户保存一个计数，
+由 notifications 表上的触发器在插入、标记已读/未读和删除时增减（与 table_versions 相同），
+因此逾期检查等批量生成通知的任务、接口中的单条或全部标记已读都自动同步，
+读取未读数只需一次主键查找，不再 COUNT(*)。
+
+不支持触发器的数据库上回退为 COUNT 查询。
+"""
+from sqlalchemy import event, text
+from ..models import db, Notification, UserNotificationCount
+
+_INCREMENT = """INSERT INTO user_notification_counts (user_id, unread_count)
+        SELECT new.user_id, 1 WHERE new.is_read = 0
+        ON CONFLICT(user_id) DO UPDATE SET unread_count = unread_count + 1;"""
+
+_DECREMENT = """UPDATE user_notification_counts SET unread_count = unread_count - 1
+        WHERE user_id = old.user_id AND old.is_read = 0;"""
+
+NOTIFICATION_COUNT_SCHEMA = [
+    f"""CREATE TRIGGER IF NOT EXISTS notifications_unread_ai AFTER INSERT ON notifications BEGIN
+        {_INCREMENT}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notifications_unread_au AFTER UPDATE OF is_read, user_id ON notifications BEGIN
+        {_DECREMENT}
+        {_INCREMENT}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notifications_unread_ad AFTER DELETE ON notifications BEGIN
+        {_DECREMENT}
+    END""",
+]
+
+NOTIFICATION_COUNT_DROP = [
+    'DROP TRIGGER IF EXISTS notifications_unread_ai',
+    'DROP TRIGGER IF EXISTS notifications_unread_au',
+    'DROP TRIGGER IF EXISTS notifications_unread_ad',
+]
+
+# 按已有通知生成计数
+NOTIFICATION_COUNT_BACKFILL = """INSERT INTO user_notification_counts (user_id, unread_count)
+    SELECT user_id, COUNT(*) FROM notifications WHERE is_read = 0 GROUP BY user_id"""
+
+
+def get_unread_count(user_id):
+    """用户的未读通知数"""
+    if db.engine.dialect.name != 'sqlite':
+        return Notification.query.filter_by(user_id=user_id, is_read=False).count()
+
+    count = db.session.query(UserNotificationCount.unread_count).filter(
+        UserNotificationCount.user_id == user_id
+    ).scalar()
+    return count or 0
+
+
+def create_notification_counts(connection, backfill=False):
+    for statement in NOTIFICATION_COUNT_SCHEMA:
+        connection.execute(text(statement))
+    if backfill:
+        connection.execute(text(NOTIFICATION_COUNT_BACKFILL))
+
+
+def drop_notification_counts(connection):
+    for statement in NOTIFICATION_COUNT_DROP:
+        connection.execute(text(statement))
+
+
+# 触发器引用两张表，需在全部表创建之后创建
+@event.listens_for(db.metadata, 'after_create')
+def _create_notification_count_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_notification_counts(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_notification_count_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_notification_counts(connection)
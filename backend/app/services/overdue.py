@@ -0,0 +1,93 @@
+"""逾期检查
+
+定时任务（tasks/overdue_check.py）和后台任务队列共用的逾期处理逻辑，需在应用上下文中调用。
+
+sweep_overdue_books() 按 id 分段处理，每段：
+- 一条 JOIN 查询取出借阅记录和书名（不再逐条懒加载 record.book）
+- 一条条件 UPDATE ... CASE 更新状态和罚金，RETURNING 返回实际更新的记录
+- bulk_insert_mappings 批量插入通知，与状态更新在同一事务中提交
+
+每段提交后释放 SQLite 写锁，借还书请求可以穿插执行。已处理的记录状态变为 overdue，
+不会再被选中，因此中断后重新执行会从剩余的记录继续，不会重复发送通知。
+"""
+from datetime import datetime
+from ..models import db, Book, BorrowRecord, Notification
+from .returns import calculate_fine
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _overdue_notification(row, days_overdue, fine_amount, created_at):
+    return {
+        'user_id': row.user_id,
+        'borrow_record_id': row.id,
+        'book_id': row.book_id,
+        'title': '图书逾期提醒',
+        'content': f'您借阅的图书《{row.title}》已逾期 {days_overdue} 天，逾期费用为 {fine_amount} 元，请尽快归还。',
+        'notification_type': 'overdue_reminder',
+        'is_read': False,
+        'created_at': created_at
+    }
+
+
+def count_overdue_books(now):
+    """借阅中且已过期的记录数"""
+    return BorrowRecord.query.filter(
+        BorrowRecord.status == 'borrowed',
+        BorrowRecord.due_date < now
+    ).count()
+
+
+def sweep_overdue_books(now=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """把已过期的借阅记录标记为逾期、计算罚金并发送通知，返回处理的记录数
+
+    progress 为可选回调，每提交一段后以已处理的记录数调用。
+    """
+    now = now or datetime.utcnow()
+    processed = 0
+    last_id = 0
+
+    while True:
+        # 借阅中且已过期的记录，按 id 分段（idx_borrow_records_status 包含 rowid）
+        rows = db.session.query(
+            BorrowRecord.id,
+            BorrowRecord.user_id,
+            BorrowRecord.book_id,
+            BorrowRecord.due_date,
+            Book.title
+        ).join(
+            Book, Book.id == BorrowRecord.book_id
+        ).filter(
+            BorrowRecord.status == 'borrowed',
+            BorrowRecord.due_date < now,
+            BorrowRecord.id > last_id
+        ).order_by(BorrowRecord.id).limit(batch_size).all()
+
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        fines = {row.id: calculate_fine(row.due_date, now) for row in rows}
+
+        # 只更新仍在借阅中的记录，查询之后刚归还的记录不会被改回逾期
+        updated = set(db.session.execute(
+            db.update(BorrowRecord)
+            .where(BorrowRecord.id.in_(list(fines)), BorrowRecord.status == 'borrowed')
+            .values(status='overdue', fine_amount=db.case(fines, value=BorrowRecord.id))
+            .returning(BorrowRecord.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+
+        notifications = [
+            _overdue_notification(row, (now - row.due_date).days, fines[row.id], now)
+            for row in rows if row.id in updated
+        ]
+        if notifications:
+            db.session.bulk_insert_mappings(Notification, notifications)
+
+        db.session.commit()
+        processed += len(updated)
+        if progress:
+            progress(processed)
+
+    return processed
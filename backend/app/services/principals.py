@@ -0,0 +1,129 @@
+"""当前用户身份缓存
+
+权限检查只需要用户的 role 和 is_active，不必每次载入整个 User：
+- 当前用户的令牌携带 role / is_active 声明时直接使用声明（吊销见 services/tokens.py）
+- 同一请求内：解析结果保存在 flask.g 上，装饰器和处理函数共用
+- 跨请求：没有声明的旧令牌查询后保存在每个应用实例的 TTL + LRU 缓存中
+
+update_user / delete_user 修改角色或状态后调用 invalidate_principal() 立即失效本进程缓存；
+其他 gunicorn worker 中的缓存最多在 PRINCIPAL_CACHE_TTL 秒后过期。
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g
+from flask_jwt_extended import get_jwt
+from ..models import db, User
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 60  # 秒
+
+
+class Principal:
+    """权限检查所需的用户信息"""
+
+    def __init__(self, user_id, role, is_active):
+        self.user_id = user_id
+        self.role = role
+        self.is_active = is_active
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+
+class PrincipalCache:
+    """线程安全的 TTL + LRU 缓存，user_id -> Principal"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            principal, expires_at = item
+            if expires_at < time.monotonic():
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return principal
+
+    def set(self, user_id, principal):
+        with self._lock:
+            self._items[user_id] = (principal, time.monotonic() + self.ttl)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def _get_cache():
+    cache = current_app.extensions.get('principal_cache')
+    if cache is None:
+        cache = PrincipalCache(
+            maxsize=current_app.config.get('PRINCIPAL_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+            ttl=current_app.config.get('PRINCIPAL_CACHE_TTL', DEFAULT_CACHE_TTL)
+        )
+        current_app.extensions['principal_cache'] = cache
+    return cache
+
+
+def _principal_from_claims(user_id):
+    """当前令牌属于该用户且携带角色声明时，直接由声明构造 Principal"""
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        # 不在已校验 JWT 的请求中（如后台任务）
+        return None
+    if 'role' not in claims or int(claims['sub']) != user_id:
+        return None
+    return Principal(user_id, claims['role'], claims.get('is_active') is not False)
+
+
+def get_principal(user_id):
+    """返回用户的 Principal，用户不存在时返回 None"""
+    user_id = int(user_id)
+
+    principal = g.get('principal')
+    if principal is not None and principal.user_id == user_id:
+        return principal
+
+    principal = _principal_from_claims(user_id)
+    if principal is not None:
+        g.principal = principal
+        return principal
+
+    cache = _get_cache()
+    principal = cache.get(user_id)
+    if principal is None:
+        row = db.session.query(User.role, User.is_active).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        role, is_active = row
+        # is_active 为空视为启用（与 User.is_active 默认值一致）
+        principal = Principal(user_id, role, is_active is not False)
+        cache.set(user_id, principal)
+
+    g.principal = principal
+    return principal
+
+
+def invalidate_principal(user_id):
+    """用户角色或状态变更后使缓存失效"""
+    user_id = int(user_id)
+    _get_cache().invalidate(user_id)
+    principal = g.get('principal')
+    if principal is not None and principal.user_id == user_id:
+        g.pop('principal')
@@ -0,0 +1,67 @@
+"""图书评分汇总
+
+books.rating_count / rating_sum 随评论的增删改在同一事务中维护，
+列表按平均评分排序或过滤时直接使用表达式索引 idx_books_rating，不再对 reviews 做 AVG 聚合。
+
+计数以单条 UPDATE books SET rating_sum = rating_sum + :delta 完成（与 services/inventory.py 相同），
+并发评论同一本书时不会丢失更新。汇总与评论不一致时（直接改库、导入数据等）
+用 recalculate_book_ratings() 或 tasks/rating_repair.py 重算。
+"""
+from ..models import db, Book, Review
+from .catalog_cache import invalidate_book_rating, invalidate_all_books
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def adjust_book_rating(book_id, count_delta, sum_delta):
+    """调整图书的评分汇总，由调用方提交"""
+    if not count_delta and not sum_delta:
+        return
+    db.session.execute(
+        db.update(Book)
+        .where(Book.id == book_id)
+        .values(
+            rating_count=Book.rating_count + count_delta,
+            rating_sum=Book.rating_sum + sum_delta
+        )
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_book_rating(book_id)
+
+
+def recalculate_book_ratings(batch_size=DEFAULT_BATCH_SIZE):
+    """按 id 分段重算全部图书的评分汇总，每段一条 UPDATE 并提交，返回被修正的图书数
+
+    UPDATE books SET rating_count = (SELECT COUNT(*) ...), rating_sum = (SELECT SUM(rating) ...)
+    WHERE id BETWEEN ... AND (rating_count != ... OR rating_sum != ...)
+    """
+    count = db.select(db.func.count(Review.id)).where(
+        Review.book_id == Book.id
+    ).scalar_subquery()
+    total = db.select(db.func.coalesce(db.func.sum(Review.rating), 0)).where(
+        Review.book_id == Book.id
+    ).scalar_subquery()
+
+    max_id = db.session.query(db.func.max(Book.id)).scalar() or 0
+    fixed = 0
+    lower = 0
+    while lower < max_id:
+        upper = lower + batch_size
+        result = db.session.execute(
+            db.update(Book)
+            .where(
+                Book.id > lower,
+                Book.id <= upper,
+                (Book.rating_count != count) | (Book.rating_sum != total)
+            )
+            .values(rating_count=count, rating_sum=total)
+            .execution_options(synchronize_session=False)
+        )
+        fixed += result.rowcount
+        db.session.commit()
+        lower = upper
+
+    if fixed:
+        invalidate_all_books()
+        db.session.commit()
+    return fixed
@@ -0,0 +1,58 @@
+"""到期提醒
+
+remind_due_books() 为即将到期的借阅发送提醒，需在应用上下文中调用。
+提醒通知记录 borrow_record_id，去重用一条查询完成：到期记录 JOIN 图书取书名，
+NOT EXISTS 排除最近已提醒过的记录（走 idx_notifications_borrow_type），
+不再对每条记录按书名 LIKE 扫描用户的全部通知。
+"""
+from datetime import datetime, timedelta
+from ..models import db, Book, BorrowRecord, Notification
+
+REMINDER_DAYS = 3
+# 同一条借阅记录两次提醒的最短间隔
+REMINDER_INTERVAL = timedelta(hours=24)
+
+
+def remind_due_books(now=None):
+    """为 REMINDER_DAYS 天内到期的借阅发送提醒并提交，返回发送的提醒数"""
+    now = now or datetime.utcnow()
+
+    recently_reminded = db.exists().where(
+        Notification.borrow_record_id == BorrowRecord.id,
+        Notification.notification_type == 'return_reminder',
+        Notification.created_at > now - REMINDER_INTERVAL
+    )
+    rows = db.session.query(
+        BorrowRecord.id,
+        BorrowRecord.user_id,
+        BorrowRecord.book_id,
+        BorrowRecord.due_date,
+        Book.title
+    ).join(
+        Book, Book.id == BorrowRecord.book_id
+    ).filter(
+        BorrowRecord.status == 'borrowed',
+        BorrowRecord.due_date <= now + timedelta(days=REMINDER_DAYS),
+        BorrowRecord.due_date > now,
+        ~recently_reminded
+    ).all()
+
+    notifications = []
+    for row in rows:
+        # 计算剩余天数
+        days_remaining = (row.due_date - now).days + 1
+        notifications.append({
+            'user_id': row.user_id,
+            'borrow_record_id': row.id,
+            'book_id': row.book_id,
+            'title': '图书到期提醒',
+            'content': f'您借阅的图书《{row.title}》将在 {days_remaining} 天后到期，请提前安排归还。',
+            'notification_type': 'return_reminder',
+            'is_read': False,
+            'created_at': now
+        })
+
+    if notifications:
+        db.session.bulk_insert_mappings(Notification, notifications)
+    db.session.commit()
+    return len(notifications)
@@ -0,0 +1,82 @@
+"""过期预约清理
+
+定时任务（tasks/reservation_reaper.py）和后台任务队列共用，需在应用上下文中调用。
+
+过期的 pending 预约（未等到副本）和 active 预约（副本已保留但未按时取书）改为 expired：
+- 按 (status, expires_at) 索引分段取出已过期的预约，每段两条条件 UPDATE（pending / active 各一条）
+- active 预约保留的副本通过 services/holds.py 顺延给下一位预约者，队列为空时回到可借库存
+- 每段提交一次；已处理的预约不再满足条件，中断后重新执行会从剩余的记录继续
+"""
+import time
+from collections import Counter
+from datetime import datetime
+from ..models import db, Reservation
+from .holds import return_copies
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _expire(ids, status, now):
+    """把仍处于 status 且已过期的预约标记为 expired，返回被更新预约的 book_id 列表"""
+    if not ids:
+        return []
+    return list(db.session.execute(
+        db.update(Reservation)
+        .where(
+            Reservation.id.in_(ids),
+            Reservation.status == status,
+            Reservation.expires_at <= now
+        )
+        .values(status='expired')
+        .returning(Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+
+def _expired(now):
+    return db.and_(
+        Reservation.status.in_(('pending', 'active')),
+        Reservation.expires_at <= now
+    )
+
+
+def count_expired_reservations(now):
+    """待清理的过期预约数（用于计算后台任务进度）"""
+    return db.session.query(db.func.count(Reservation.id)).filter(_expired(now)).scalar()
+
+
+def expire_reservations(now=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """清理过期预约，返回统计 {'expired_pending', 'expired_holds', 'reassigned', 'released', 'seconds'}
+
+    progress 为可选回调，每提交一段后以已处理的预约数调用。
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    report = {'expired_pending': 0, 'expired_holds': 0, 'reassigned': 0, 'released': 0}
+
+    while True:
+        rows = db.session.query(
+            Reservation.id, Reservation.status
+        ).filter(_expired(now)).limit(batch_size).all()
+
+        if not rows:
+            break
+
+        pending_ids = [row.id for row in rows if row.status == 'pending']
+        active_ids = [row.id for row in rows if row.status == 'active']
+
+        report['expired_pending'] += len(_expire(pending_ids, 'pending', now))
+        held_books = Counter(_expire(active_ids, 'active', now))
+        report['expired_holds'] += sum(held_books.values())
+
+        # 保留的副本顺延给下一位预约者
+        reassigned = return_copies(dict(held_books), now)
+        report['reassigned'] += reassigned
+        report['released'] += sum(held_books.values()) - reassigned
+
+        db.session.commit()
+        if progress:
+            progress(report['expired_pending'] + report['expired_holds'])
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
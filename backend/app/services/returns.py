@@ -0,0 +1,86 @@
+"""图书归还
+
+bulk_return() 以集合方式处理批量归还：
+- 用 IN 查询一次载入全部借阅记录
+- 所有记录的归还时间和罚金基于同一个时间点计算
+- 按图书汇总归还数量，先分配给预约队列（services/holds.py），其余用一条 UPDATE ... CASE 更新库存
+"""
+from datetime import datetime
+from ..models import BorrowRecord
+from .holds import return_copies
+
+FINE_RATE = 0.5  # 每天0.5元
+IN_CHUNK_SIZE = 500
+
+
+def calculate_fine(due_date, now):
+    """计算逾期罚金，未逾期返回 None"""
+    if due_date < now:
+        days_overdue = (now - due_date).days
+        return days_overdue * FINE_RATE
+    return None
+
+
+def mark_returned(borrow_record, now):
+    """把借阅记录标记为已归还并计算罚金（不处理库存）"""
+    # 无论当前状态是borrowed还是overdue，都更新为returned
+    borrow_record.return_date = now
+    borrow_record.status = 'returned'
+
+    fine = calculate_fine(borrow_record.due_date, now)
+    if fine is not None:
+        borrow_record.fine_amount = fine
+
+
+def load_records(record_ids):
+    """按ID批量载入借阅记录，返回 {id: record}"""
+    records = {}
+    for i in range(0, len(record_ids), IN_CHUNK_SIZE):
+        chunk = record_ids[i:i + IN_CHUNK_SIZE]
+        for record in BorrowRecord.query.filter(BorrowRecord.id.in_(chunk)).all():
+            records[record.id] = record
+    return records
+
+
+def bulk_return(record_ids, now=None):
+    """批量归还，返回 (已归还记录列表, 错误信息列表)
+
+    错误信息与逐条处理时一致：不存在、已归还（包括同一批次内的重复ID）。
+    调用方负责提交事务。
+    """
+    now = now or datetime.utcnow()
+
+    valid_ids = []
+    for record_id in record_ids:
+        try:
+            valid_ids.append(int(record_id))
+        except (TypeError, ValueError):
+            continue
+
+    records = load_records(list(set(valid_ids)))
+
+    returned = []
+    errors = []
+    book_deltas = {}
+    for record_id in record_ids:
+        try:
+            borrow_record = records.get(int(record_id))
+        except (TypeError, ValueError):
+            borrow_record = None
+
+        if not borrow_record:
+            errors.append(f'借阅记录 {record_id} 不存在')
+            continue
+
+        if borrow_record.status == 'returned':
+            errors.append(f'借阅记录 {record_id} 已归还')
+            continue
+
+        mark_returned(borrow_record, now)
+        book_deltas[borrow_record.book_id] = book_deltas.get(borrow_record.book_id, 0) + 1
+        returned.append(borrow_record)
+
+    # 更新图书库存
+    return_copies(book_deltas, now)
+
+    return returned, errors
@@ -0,0 +1,201 @@
+"""全文检索
+
+提供可插拔的检索后端，图书检索和管理员用户列表检索共用：
+- Fts5SearchBackend：基于 SQLite FTS5 虚拟表（books_fts、users_fts），trigram 分词，子串匹配
+  - 中文没有空格分词，trigram 按每3个字符建索引，"孤独"、"入门" 等书名中间的词和 ISBN 片段都能命中
+  - 少于3个字符的词 trigram 无法匹配，这些词改用 LIKE 过滤
+  - 图书：与 books 连接，按 bm25 相关度排序
+  - 用户：按用户名、邮箱匹配，输入过程中的 "zha"、"zhang@exa" 等都能命中；
+    只作为过滤条件使用（users.id IN 子查询），结果仍按 id 排序，可与 role / status 过滤和游标分页组合
+- LikeSearchBackend：原有的 LIKE '%关键字%' 方式，用于不支持 FTS5 的数据库
+
+FTS5 索引通过触发器与源表保持同步，因此无论是 ORM 的增删改还是批量插入都会自动更新索引。
+"""
+from flask import current_app
+from sqlalchemy import event, or_, select, text, table, column
+from ..models import db, Book, User
+
+
+# trigram 分词器无法匹配少于3个字符的词
+MIN_MATCH_LENGTH = 3
+
+
+def split_terms(search):
+    """按空白拆分用户输入，返回 (可用 MATCH 检索的词, 少于3个字符的词)"""
+    match_terms, short_terms = [], []
+    for term in search.split():
+        (match_terms if len(term) >= MIN_MATCH_LENGTH else short_terms).append(term)
+    return match_terms, short_terms
+
+
+def build_match_expression(terms):
+    """把检索词转换为 FTS5 MATCH 表达式
+
+    每个词用双引号包裹（屏蔽 FTS5 语法字符），trigram 分词下即为子串匹配，多个词之间为 AND 关系。
+    """
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+class SearchBackend:
+    """检索后端接口"""
+
+    name = None
+
+    def create_index(self, connection):
+        """创建索引结构"""
+
+    def drop_index(self, connection):
+        """删除索引结构"""
+
+    def rebuild(self, connection):
+        """根据源表重建索引"""
+
+    def apply(self, query, search):
+        """在查询上应用检索条件（及相关度排序），返回新的查询"""
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """LIKE 模糊匹配（全表扫描），用于不支持 FTS5 的数据库"""
+
+    name = 'like'
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def apply(self, query, search):
+        return query.filter(or_(*(column.contains(search) for column in self.columns)))
+
+
+class Fts5SearchBackend(SearchBackend):
+    """SQLite FTS5 全文检索
+
+    model 的表作为外部内容表（content=...），索引本身不保存原文，只保存倒排索引。
+    ranked 为 True 时与源表连接并按 bm25 相关度排序，否则只作为 id IN 子查询过滤。
+    """
+
+    name = 'fts5'
+
+    def __init__(self, model, columns, ranked=True):
+        self.model = model
+        self.columns = columns
+        self.ranked = ranked
+        self.source = model.__tablename__
+        self.fts_table = f'{self.source}_fts'
+        # 轻量表对象，仅用于构造查询，不注册到 metadata（避免 create_all 把它当普通表创建）
+        self.index_table = table(self.fts_table, column('rowid'), column('rank'))
+
+    def _values(self, alias):
+        return ', '.join(f'{alias}.{c}' for c in self.columns)
+
+    def schema(self):
+        columns = ', '.join(self.columns)
+        return [
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5(
+                {columns},
+                content='{self.source}',
+                content_rowid='id',
+                tokenize='trigram'
+            )""",
+            f"""CREATE TRIGGER IF NOT EXISTS {self.source}_fts_ai AFTER INSERT ON {self.source} BEGIN
+                INSERT INTO {self.fts_table}(rowid, {columns}) VALUES (new.id, {self._values('new')});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {self.source}_fts_ad AFTER DELETE ON {self.source} BEGIN
+                INSERT INTO {self.fts_table}({self.fts_table}, rowid, {columns})
+                VALUES ('delete', old.id, {self._values('old')});
+            END""",
+            # 只在被索引的列变化时重建索引行，借还书、评分等计数更新不触发
+            f"""CREATE TRIGGER IF NOT EXISTS {self.source}_fts_au AFTER UPDATE OF {columns} ON {self.source} BEGIN
+                INSERT INTO {self.fts_table}({self.fts_table}, rowid, {columns})
+                VALUES ('delete', old.id, {self._values('old')});
+                INSERT INTO {self.fts_table}(rowid, {columns}) VALUES (new.id, {self._values('new')});
+            END""",
+        ]
+
+    def create_index(self, connection):
+        for statement in self.schema():
+            connection.execute(text(statement))
+
+    def drop_index(self, connection):
+        for suffix in ('ai', 'ad', 'au'):
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {self.source}_fts_{suffix}'))
+        connection.execute(text(f'DROP TABLE IF EXISTS {self.fts_table}'))
+
+    def rebuild(self, connection):
+        connection.execute(text(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"))
+
+    def apply(self, query, search):
+        match_terms, short_terms = split_terms(search)
+        for term in short_terms:
+            query = query.filter(or_(*(
+                getattr(self.model, c).contains(term, autoescape=True) for c in self.columns
+            )))
+        if not match_terms:
+            return query
+
+        expression = build_match_expression(match_terms)
+        match = text(f'{self.fts_table} MATCH :{self.fts_table}_query').bindparams(
+            **{f'{self.fts_table}_query': expression}
+        )
+        if not self.ranked:
+            return query.filter(self.model.id.in_(select(self.index_table.c.rowid).where(match)))
+        # rank 为 FTS5 内置的 bm25 相关度，值越小越相关
+        return query.join(self.index_table, self.index_table.c.rowid == self.model.id).filter(
+            match
+        ).order_by(self.index_table.c.rank)
+
+
+book_fts_backend = Fts5SearchBackend(Book, ('title', 'author', 'publisher', 'isbn'))
+user_fts_backend = Fts5SearchBackend(User, ('username', 'email'), ranked=False)
+
+_backends = {
+    'like': LikeSearchBackend((Book.title, Book.author, Book.isbn)),
+    'fts5': book_fts_backend,
+}
+
+_user_backends = {
+    'like': LikeSearchBackend((User.username, User.email)),
+    'fts5': user_fts_backend,
+}
+
+
+def _default_backend_name():
+    return 'fts5' if db.engine.dialect.name == 'sqlite' else 'like'
+
+
+def get_search_backend():
+    """根据配置 SEARCH_BACKEND 选择图书检索后端，未配置时 SQLite 使用 FTS5，其他数据库使用 LIKE"""
+    return _backends[current_app.config.get('SEARCH_BACKEND') or _default_backend_name()]
+
+
+def get_user_search_backend():
+    """用户检索后端，与图书检索共用配置 SEARCH_BACKEND"""
+    name = current_app.config.get('SEARCH_BACKEND')
+    # 只为图书注册的自定义后端不适用于用户检索
+    if name not in _user_backends:
+        name = _default_backend_name()
+    return _user_backends[name]
+
+
+def register_backend(backend):
+    """注册自定义图书检索后端"""
+    _backends[backend.name] = backend
+
+
+def _sync_index_with_table(backend):
+    """全文索引随源表一起创建、删除（仅 SQLite）"""
+    source = backend.model.__table__
+
+    @event.listens_for(source, 'after_create')
+    def _create_fts_index(target, connection, **kw):
+        if connection.dialect.name == 'sqlite':
+            backend.create_index(connection)
+
+    @event.listens_for(source, 'before_drop')
+    def _drop_fts_index(target, connection, **kw):
+        if connection.dialect.name == 'sqlite':
+            backend.drop_index(connection)
+
+
+_sync_index_with_table(book_fts_backend)
+_sync_index_with_table(user_fts_backend)
@@ -0,0 +1,268 @@
+"""借阅统计
+
+把 /api/borrows/stats 所需的数据合并为少量聚合查询：
+- 概览：图书数、用户数各一个标量子查询，合并为一条 SELECT
+- 状态分布：按 status 一次 GROUP BY，同时得到当前借阅数和逾期数
+- 借阅趋势：读取 borrow_daily_stats 汇总表中统计区间内的行，再合并水位线之后尚未汇总的少量新记录
+- 热门图书：按 book_borrow_totals 的累计次数索引取前 N 本，与未汇总新记录涉及的图书合并后重新排序
+- 查询代价只与统计区间、N 和未汇总记录数有关，不随借阅历史增长
+- 活跃用户：聚合计数与用户信息用一条 JOIN 查询
+
+汇总表由 rollup_borrow_stats() 增量维护（见 tasks/stats_rollup.py）。
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from ..models import db, User, Book, BorrowRecord, BorrowDailyStat, BookBorrowTotal, RollupWatermark
+
+STATUS_NAMES = [
+    ('borrowed', '已借阅'),
+    ('returned', '已归还'),
+    ('overdue', '已逾期')
+]
+
+TOP_LIMIT = 10
+
+ROLLUP_NAME = 'borrow_daily_stats'
+ROLLUP_BATCH_SIZE = 5000
+
+
+def _as_date(value):
+    """SQLite 的 date() 返回字符串，其他数据库返回 date"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def trend_buckets(date_range, now):
+    """生成趋势统计的日期区间，按日期升序返回 [(标签, 开始日期, 结束日期（不含）)]"""
+    buckets = []
+    today = now.date()
+    if date_range == '7d':
+        # 最近7天，按天统计
+        for i in range(7):
+            day = today - timedelta(days=i)
+            buckets.append((day.strftime('%Y-%m-%d'), day, day + timedelta(days=1)))
+    else:
+        # 最近30天或90天，按周统计（周一至周日）
+        weeks = 4 if date_range == '30d' else 12
+        for i in range(weeks):
+            start_of_week = today - timedelta(weeks=i, days=today.weekday())
+            end_of_week = start_of_week + timedelta(days=6)
+            label = f"{start_of_week.strftime('%m-%d')}~{end_of_week.strftime('%m-%d')}"
+            buckets.append((label, start_of_week, end_of_week + timedelta(days=1)))
+
+    return buckets[::-1]
+
+
+def get_watermark(name=ROLLUP_NAME):
+    """返回已汇总到的最大借阅记录ID"""
+    watermark = db.session.get(RollupWatermark, name)
+    return watermark.last_id if watermark else 0
+
+
+def get_overview_counts():
+    """图书总数和用户总数（一条查询）"""
+    total_books = db.session.query(db.func.count(Book.id)).scalar_subquery()
+    total_users = db.session.query(db.func.count(User.id)).scalar_subquery()
+    return db.session.query(total_books, total_users).one()
+
+
+def get_status_counts():
+    """各借阅状态的记录数"""
+    rows = db.session.query(
+        BorrowRecord.status,
+        db.func.count(BorrowRecord.id)
+    ).group_by(BorrowRecord.status).all()
+    return dict(rows)
+
+
+def get_borrow_trend(date_range, now, watermark):
+    """借阅趋势：汇总表 + 未汇总的新记录（一条查询）"""
+    buckets = trend_buckets(date_range, now)
+    start_day = buckets[0][1]
+    end_day = buckets[-1][2]
+
+    day = db.func.date(BorrowRecord.borrow_date)
+    rollup = db.session.query(
+        BorrowDailyStat.day.label('day'),
+        BorrowDailyStat.borrow_count.label('borrow_count')
+    ).filter(
+        BorrowDailyStat.day >= start_day,
+        BorrowDailyStat.day < end_day
+    )
+    tail = db.session.query(
+        day,
+        db.literal(1)
+    ).filter(
+        BorrowRecord.id > watermark,
+        BorrowRecord.borrow_date >= datetime.combine(start_day, datetime.min.time()),
+        BorrowRecord.borrow_date < datetime.combine(end_day, datetime.min.time())
+    )
+    combined = rollup.union_all(tail).subquery()
+
+    rows = db.session.query(
+        combined.c.day,
+        db.func.sum(combined.c.borrow_count)
+    ).group_by(combined.c.day).all()
+    daily_counts = {_as_date(row_day): count for row_day, count in rows}
+
+    trend = []
+    for label, start, end in buckets:
+        count = sum(
+            count for row_day, count in daily_counts.items()
+            if start <= row_day < end
+        )
+        trend.append({'date': label, 'count': count})
+    return trend
+
+
+def get_top_books(watermark, limit=TOP_LIMIT):
+    """借阅次数最多的图书：累计次数 + 未汇总的新记录（一条查询）
+
+    最终次数 = 累计次数 + 新记录数，没有新记录的图书次数不变，
+    因此结果一定在「累计次数前 N 本」和「有新记录的图书」的并集中，只需计算这些候选图书。
+    """
+    top_totals = db.session.query(BookBorrowTotal.book_id).order_by(
+        BookBorrowTotal.borrow_count.desc(), BookBorrowTotal.book_id.desc()
+    ).limit(limit).subquery()
+    tail = db.session.query(
+        BorrowRecord.book_id.label('book_id'),
+        db.func.count(BorrowRecord.id).label('borrow_count')
+    ).filter(BorrowRecord.id > watermark).group_by(BorrowRecord.book_id).subquery()
+    candidates = db.union(
+        db.select(top_totals.c.book_id),
+        db.select(tail.c.book_id)
+    ).subquery()
+
+    borrow_count = (
+        db.func.coalesce(BookBorrowTotal.borrow_count, 0) + db.func.coalesce(tail.c.borrow_count, 0)
+    ).label('borrow_count')
+    rows = db.session.query(
+        Book.id, Book.title, Book.author, borrow_count
+    ).select_from(candidates).join(
+        Book, Book.id == candidates.c.book_id
+    ).outerjoin(
+        BookBorrowTotal, BookBorrowTotal.book_id == Book.id
+    ).outerjoin(
+        tail, tail.c.book_id == Book.id
+    ).order_by(borrow_count.desc(), Book.id.desc()).limit(limit).all()
+
+    return [
+        {
+            'id': book_id,
+            'title': title,
+            'author': author,
+            'borrow_count': count
+        }
+        for book_id, title, author, count in rows
+    ]
+
+
+def get_top_users(limit=TOP_LIMIT):
+    """借阅次数最多的用户"""
+    borrow_count = db.func.count(BorrowRecord.id).label('borrow_count')
+    rows = db.session.query(
+        User.id, User.username, User.email, borrow_count
+    ).join(
+        BorrowRecord, BorrowRecord.user_id == User.id
+    ).group_by(User.id).order_by(borrow_count.desc(), User.id.desc()).limit(limit).all()
+
+    return [
+        {
+            'id': user_id,
+            'username': username,
+            'email': email,
+            'borrow_count': count
+        }
+        for user_id, username, email, count in rows
+    ]
+
+
+def compute_borrow_stats(date_range='7d', now=None):
+    """计算借阅统计看板数据，返回结构与 /api/borrows/stats 响应一致"""
+    now = now or datetime.utcnow()
+
+    total_books, total_users = get_overview_counts()
+    status_counts = get_status_counts()
+    watermark = get_watermark()
+
+    return {
+        'overview': {
+            'totalBooks': total_books,
+            'totalUsers': total_users,
+            'currentBorrows': status_counts.get('borrowed', 0),
+            'overdueCount': status_counts.get('overdue', 0)
+        },
+        'borrowTrend': get_borrow_trend(date_range, now, watermark),
+        'statusDistribution': [
+            {'name': name, 'value': status_counts.get(status, 0)}
+            for status, name in STATUS_NAMES
+        ],
+        'topBooks': get_top_books(watermark),
+        'topUsers': get_top_users()
+    }
+
+
+def rollup_borrow_stats(batch_size=ROLLUP_BATCH_SIZE, progress=None):
+    """把水位线之后的新借阅记录汇总到 borrow_daily_stats 和 book_borrow_totals
+
+    按ID区间分批处理，每批在一个事务中同时更新汇总表和水位线，中断后重新执行不会重复计数。
+    progress 为可选回调，每批提交后以 (已处理的ID区间长度, 总区间长度) 调用。
+    返回本次汇总的借阅记录数。
+    """
+    watermark = db.session.get(RollupWatermark, ROLLUP_NAME)
+    if not watermark:
+        watermark = RollupWatermark(name=ROLLUP_NAME, last_id=0)
+        db.session.add(watermark)
+
+    max_id = db.session.query(db.func.max(BorrowRecord.id)).scalar() or 0
+    start_id = watermark.last_id or 0
+    processed = 0
+
+    day = db.func.date(BorrowRecord.borrow_date)
+    while watermark.last_id < max_id:
+        upper = min(watermark.last_id + batch_size, max_id)
+
+        rows = db.session.query(
+            day,
+            BorrowRecord.book_id,
+            db.func.count(BorrowRecord.id)
+        ).filter(
+            BorrowRecord.id > watermark.last_id,
+            BorrowRecord.id <= upper
+        ).group_by(day, BorrowRecord.book_id).all()
+
+        increments = {(_as_date(row_day), book_id): count for row_day, book_id, count in rows}
+        if increments:
+            existing = BorrowDailyStat.query.filter(
+                BorrowDailyStat.day.in_({key[0] for key in increments}),
+                BorrowDailyStat.book_id.in_({key[1] for key in increments})
+            ).all()
+            existing = {(stat.day, stat.book_id): stat for stat in existing}
+
+            book_increments = Counter()
+            for (row_day, book_id), count in increments.items():
+                stat = existing.get((row_day, book_id))
+                if stat:
+                    stat.borrow_count += count
+                else:
+                    db.session.add(BorrowDailyStat(day=row_day, book_id=book_id, borrow_count=count))
+                book_increments[book_id] += count
+                processed += count
+
+            totals = BookBorrowTotal.query.filter(BookBorrowTotal.book_id.in_(book_increments)).all()
+            totals = {total.book_id: total for total in totals}
+            for book_id, count in book_increments.items():
+                total = totals.get(book_id)
+                if total:
+                    total.borrow_count += count
+                else:
+                    db.session.add(BookBorrowTotal(book_id=book_id, borrow_count=count))
+
+        watermark.last_id = upper
+        db.session.commit()
+        if progress:
+            progress(upper - start_id, max_id - start_id)
+
+    db.session.commit()
+    return processed
@@ -0,0 +1,79 @@
+"""数据表版本号
+
+table_versions 为每张被跟踪的表保存一个版本号和最后修改时间，由 SQLite 触发器在每次写入时递增，
+因此无论是 ORM 操作、条件 UPDATE（借还书更新库存）还是批量导入都会生效，
+多个 gunicorn worker 之间也始终一致。
+
+公开的目录接口用版本号生成 ETag（见 utils/http_cache.py）：判断缓存是否有效只需一次主键查询，
+不必执行列表查询和序列化。
+
+不支持触发器的数据库上版本号不会变化，has_table_versions() 返回 False，调用方不应依赖版本号。
+"""
+from sqlalchemy import event, text
+from ..models import db, TableVersion
+
+# 表名 -> 触发递增的写操作
+TRACKED_TABLES = {
+    'books': ('INSERT', 'UPDATE', 'DELETE'),
+    'categories': ('INSERT', 'UPDATE', 'DELETE'),
+    'reviews': ('INSERT', 'UPDATE', 'DELETE'),
+    # 评论列表只展示用户名
+    'users': ('UPDATE OF username', 'DELETE'),
+}
+
+_BUMP = """INSERT INTO table_versions (name, version, updated_at) VALUES ('{table}', 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP;"""
+
+
+def _trigger_name(table, operation):
+    return f"{table}_version_{operation.split()[0].lower()}"
+
+
+def create_version_triggers(connection):
+    for table, operations in TRACKED_TABLES.items():
+        for operation in operations:
+            connection.execute(text(
+                f"""CREATE TRIGGER IF NOT EXISTS {_trigger_name(table, operation)}
+                AFTER {operation} ON {table} BEGIN
+                    {_BUMP.format(table=table)}
+                END"""
+            ))
+
+
+def drop_version_triggers(connection):
+    for table, operations in TRACKED_TABLES.items():
+        for operation in operations:
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {_trigger_name(table, operation)}'))
+
+
+def has_table_versions():
+    """版本号是否由触发器维护（仅 SQLite）"""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def get_table_versions(tables):
+    """返回 ({表名: 版本号}, 最后修改时间)，一条查询"""
+    rows = db.session.query(
+        TableVersion.name, TableVersion.version, TableVersion.updated_at
+    ).filter(TableVersion.name.in_(tables)).all()
+
+    versions = {name: 0 for name in tables}
+    last_modified = None
+    for name, version, updated_at in rows:
+        versions[name] = version
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    return versions, last_modified
+
+
+# 触发器引用多张表，需在全部表创建之后创建
+@event.listens_for(db.metadata, 'after_create')
+def _create_version_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_version_triggers(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_version_triggers(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_version_triggers(connection)
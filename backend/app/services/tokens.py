@@ -0,0 +1,94 @@
+"""JWT 令牌
+
+令牌除 identity（用户ID字符串）外还携带 role、is_active 和 ver 三个声明，
+权限检查直接使用声明，不再查询 users 表。
+
+需要强制重新登录（管理员修改角色、禁用或删除用户）时调用 revoke_user_tokens()
+递增该用户在 user_token_versions 中的版本号，ver 小于该版本的令牌在 JWT 校验时被拒绝。
+user_token_versions 只包含被吊销过的用户，整表缓存在进程内，每 TOKEN_VERSION_CACHE_TTL 秒
+重新加载一次：本进程内的吊销立即生效，其他 gunicorn worker 最多延迟一个 TTL。
+缓存只用于校验令牌；签发令牌时从数据库读取当前版本号，避免用过期的缓存签发出随即失效的令牌。
+"""
+import threading
+import time
+from flask import current_app
+from flask_jwt_extended import create_access_token
+from ..models import db, UserTokenVersion
+
+DEFAULT_CACHE_TTL = 30  # 秒
+
+
+class TokenVersionCache:
+    """user_id -> 令牌版本号，整表定期重新加载"""
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL):
+        self.ttl = ttl
+        self._versions = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    def get(self, user_id):
+        if self._is_stale():
+            rows = db.session.query(UserTokenVersion.user_id, UserTokenVersion.version).all()
+            with self._lock:
+                self._versions = dict(rows)
+                self._loaded_at = time.monotonic()
+        return self._versions.get(user_id, 0)
+
+    def set(self, user_id, version):
+        with self._lock:
+            self._versions[user_id] = version
+
+
+def _get_cache():
+    cache = current_app.extensions.get('token_version_cache')
+    if cache is None:
+        cache = TokenVersionCache(current_app.config.get('TOKEN_VERSION_CACHE_TTL', DEFAULT_CACHE_TTL))
+        current_app.extensions['token_version_cache'] = cache
+    return cache
+
+
+def get_token_version(user_id):
+    """用户当前的令牌版本号，从未吊销过的用户为 0"""
+    return _get_cache().get(int(user_id))
+
+
+def create_user_token(user):
+    """为用户签发携带角色和状态声明的访问令牌"""
+    # 其他 worker 上的吊销可能还未同步到本进程的缓存，签发时以数据库为准（一次主键查找）
+    version = db.session.query(UserTokenVersion.version).filter(
+        UserTokenVersion.user_id == user.id
+    ).scalar() or 0
+    if version:
+        _get_cache().set(user.id, version)
+
+    # Flask-JWT-Extended 4.x要求identity必须是字符串类型
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims={
+            'role': user.role,
+            'is_active': user.is_active is not False,
+            'ver': version
+        }
+    )
+
+
+def revoke_user_tokens(user_id):
+    """吊销用户已签发的全部令牌（调用方负责提交事务）"""
+    user_id = int(user_id)
+    row = db.session.get(UserTokenVersion, user_id)
+    if row:
+        row.version += 1
+    else:
+        row = UserTokenVersion(user_id=user_id, version=1)
+        db.session.add(row)
+    db.session.flush()
+    _get_cache().set(user_id, row.version)
+
+
+def is_token_revoked(jwt_payload):
+    """令牌版本低于用户当前版本时视为已吊销（没有 ver 声明的旧令牌按 0 处理）"""
+    return jwt_payload.get('ver', 0) < get_token_version(jwt_payload['sub'])
@@ -0,0 +1,125 @@
+"""批量创建用户
+
+开学时一次为数千名学生开户，逐个调用 create_user 每人需要两次唯一性查询和一次串行 bcrypt。
+create_users() 以集合方式处理：
+- 先在内存中校验必填字段和批内重复
+- 用户名、邮箱规范化后用一条 IN 查询（分块）在 user_login_keys 中检查是否已存在
+- 后台任务中密码分块分发到 PASSWORD_BATCH_WORKERS 个进程并行哈希（不占用登录名额）；
+  请求中同步创建的小批量逐个经由登录的哈希名额哈希，名额已满时抛出 PasswordHasherBusy
+- bulk_insert_mappings 批量插入，一次提交
+
+返回逐行结果，顺序与输入一致。超过 USER_BATCH_SYNC_MAX_SIZE 的批次由接口提交为后台任务
+（services/jobs.py 中的 user_provisioning）。
+"""
+from datetime import datetime
+from ..models import db, User
+from ..utils.passwords import hash_password, hash_passwords, batch_log_rounds
+from .login_keys import normalize_login, find_taken_login_keys
+
+IN_CHUNK_SIZE = 500
+HASH_CHUNK_SIZE = 200
+REQUIRED_FIELDS = ['username', 'email', 'password']
+ROLES = ('user', 'admin')
+
+
+def _taken_keys(keys):
+    """分块 IN 查询，返回已被占用的登录名"""
+    keys = list(keys)
+    taken = set()
+    for i in range(0, len(keys), IN_CHUNK_SIZE):
+        taken.update(find_taken_login_keys(keys[i:i + IN_CHUNK_SIZE]))
+    return taken
+
+
+def _validate(row):
+    if not isinstance(row, dict):
+        return '数据格式错误'
+    for field in REQUIRED_FIELDS:
+        value = row.get(field)
+        if not value or not isinstance(value, str):
+            return f'{field}是必填项'
+    if row.get('role') is not None and row['role'] not in ROLES:
+        return 'role只能是user或admin'
+    if row.get('is_active') is not None and not isinstance(row['is_active'], bool):
+        return 'is_active必须是布尔值'
+    return None
+
+
+def create_users(rows, progress=None, background=False):
+    """批量创建用户，返回 {'created', 'failed', 'results'}
+
+    results 中每项为 {'index', 'username', 'id'} 或 {'index', 'username', 'error'}。
+    progress 为可选回调，每哈希完一块后以 (已哈希数, 总数) 调用。
+    background 为 True 时（后台任务中）用 hash_passwords() 并行哈希，否则逐个调用 hash_password()。
+    """
+    results = [None] * len(rows)
+    pending = []
+    seen_keys = set()
+
+    for index, row in enumerate(rows):
+        error = _validate(row)
+        username = row.get('username') if isinstance(row, dict) else None
+        if not error:
+            username = row['username'].strip()
+            email = row['email'].strip()
+            username_key = normalize_login(username)
+            email_key = normalize_login(email)
+            if username_key in seen_keys:
+                error = '用户名重复'
+            elif email_key in seen_keys:
+                error = '邮箱重复'
+            else:
+                seen_keys.update((username_key, email_key))
+
+        if error:
+            results[index] = {'index': index, 'username': username, 'error': error}
+        else:
+            pending.append((index, username, email, row))
+
+    # 一次 IN 查询检查唯一性
+    taken = _taken_keys(seen_keys)
+
+    valid = []
+    for index, username, email, row in pending:
+        if normalize_login(username) in taken:
+            results[index] = {'index': index, 'username': username, 'error': '用户名已存在'}
+        elif normalize_login(email) in taken:
+            results[index] = {'index': index, 'username': username, 'error': '邮箱已存在'}
+        else:
+            valid.append((index, username, email, row))
+
+    rounds = batch_log_rounds()
+    password_hashes = []
+    for i in range(0, len(valid), HASH_CHUNK_SIZE):
+        passwords = [row['password'] for _, _, _, row in valid[i:i + HASH_CHUNK_SIZE]]
+        if background:
+            password_hashes.extend(hash_passwords(passwords, rounds))
+        else:
+            password_hashes.extend(hash_password(password, rounds) for password in passwords)
+        if progress:
+            progress(len(password_hashes), len(valid))
+
+    created_at = datetime.utcnow()
+    mappings = [
+        {
+            'username': username,
+            'email': email,
+            'password_hash': password_hash,
+            'role': row.get('role') or 'user',
+            'is_active': row['is_active'] if row.get('is_active') is not None else True,
+            'created_at': created_at
+        }
+        for (_, username, email, row), password_hash in zip(valid, password_hashes)
+    ]
+    if mappings:
+        db.session.bulk_insert_mappings(User, mappings, return_defaults=True)
+        db.session.commit()
+
+    for (index, username, _, _), mapping in zip(valid, mappings):
+        results[index] = {'index': index, 'username': username, 'id': mapping['id']}
+
+    return {
+        'created': len(valid),
+        'failed': len(rows) - len(valid),
+        'results': results
+    }
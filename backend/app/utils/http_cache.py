@@ -0,0 +1,62 @@
+"""HTTP 缓存
+
+公开目录接口的条件 GET：
+
+    @books_bp.route('/books', methods=['GET'])
+    @conditional_get('books')
+    def get_books(): ...
+
+ETag 由请求路径、查询参数和所依赖数据表的版本号（services/table_versions.py）计算得到。
+请求带有匹配的 If-None-Match 时直接返回 304，不执行视图函数；
+200 响应附带 ETag、Last-Modified 和 Cache-Control: public, max-age=N，反向代理可以直接缓存。
+计算出的 ETag 保存在 g.catalog_etag 上，服务端响应缓存（services/catalog_cache.py）只在有 ETag 时使用；
+视图函数返回的响应已带 ETag 时保留原值。
+
+表版本号只由 SQLite 触发器维护，其他数据库上 ETag 永远不变，因此不做条件 GET，直接执行视图函数。
+"""
+import hashlib
+from functools import wraps
+from flask import current_app, g, make_response, request
+from ..services.table_versions import get_table_versions, has_table_versions
+
+DEFAULT_MAX_AGE = 10  # 秒
+
+
+def compute_etag(versions):
+    """由路径、规范化后的查询参数和表版本号计算强 ETag"""
+    args = sorted((key, value) for key, values in request.args.lists() for value in values)
+    parts = [request.path, repr(args)] + [f'{name}:{versions[name]}' for name in sorted(versions)]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _apply_cache_headers(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('CATALOG_CACHE_MAX_AGE', DEFAULT_MAX_AGE)
+    return response
+
+
+def conditional_get(*tables):
+    """为依赖 tables 的只读接口提供 ETag / 304 支持"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not has_table_versions():
+                return f(*args, **kwargs)
+
+            versions, last_modified = get_table_versions(tables)
+            etag = compute_etag(versions)
+
+            if request.if_none_match.contains(etag):
+                return _apply_cache_headers(make_response('', 304), etag, last_modified)
+
+            g.catalog_etag = etag
+            response = make_response(f(*args, **kwargs))
+            # 只缓存成功的响应
+            if response.status_code == 200:
+                _apply_cache_headers(response, response.get_etag()[0] or etag, last_modified)
+            return response
+        return decorated_function
+    return decorator
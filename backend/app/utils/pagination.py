@@ -0,0 +1,161 @@
+"""列表接口通用分页
+
+支持两种模式：
+- 页码模式（默认）：page / per_page，与原 paginate() 行为一致
+- 游标模式：传入 cursor 参数（首页传空值 cursor=），按「排序键 + id」做 keyset 分页，
+  不产生 OFFSET 扫描，响应中返回 next_cursor，没有下一页时为 null
+
+两种模式下都可通过 with_total=false 跳过 COUNT(*) 查询。
+"""
+import base64
+import json
+from datetime import datetime, date
+from flask import request
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无法解析"""
+
+    def __init__(self):
+        super().__init__('无效的分页游标')
+
+
+def parse_bool_arg(name, default=False):
+    """解析布尔类型的查询参数（true/false/1/0/yes/no）"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def encode_cursor(value, record_id):
+    """把排序键和 id 编码为不透明的游标字符串"""
+    if isinstance(value, datetime):
+        payload = {'t': 'datetime', 'v': value.isoformat(), 'id': record_id}
+    elif isinstance(value, date):
+        payload = {'t': 'date', 'v': value.isoformat(), 'id': record_id}
+    else:
+        payload = {'v': value, 'id': record_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，返回 (排序键, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value = payload['v']
+        if payload.get('t') == 'datetime':
+            value = datetime.fromisoformat(value)
+        elif payload.get('t') == 'date':
+            value = date.fromisoformat(value)
+        return value, int(payload['id'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError()
+
+
+class Page:
+    """一页查询结果"""
+
+    def __init__(self, items, per_page, total=None, page=None, pages=None,
+                 next_cursor=None, cursor_mode=False):
+        self.items = items
+        self.per_page = per_page
+        self.total = total
+        self.page = page
+        self.pages = pages
+        self.next_cursor = next_cursor
+        self.cursor_mode = cursor_mode
+
+    def meta(self):
+        """响应中的分页字段"""
+        if self.cursor_mode:
+            meta = {
+                'per_page': self.per_page,
+                'next_cursor': self.next_cursor
+            }
+            if self.total is not None:
+                meta['total'] = self.total
+            return meta
+
+        return {
+            'total': self.total,
+            'page': self.page,
+            'per_page': self.per_page,
+            'pages': self.pages
+        }
+
+
+def paginate(query, sort_column=None, descending=False, default_per_page=10):
+    """按请求参数对查询分页
+
+    sort_column 为游标模式下的排序键（须是查询主实体上的列），None 时只按 id 排序；
+    descending 为排序方向。页码模式沿用查询自身的 order_by。
+    """
+    per_page = request.args.get('per_page', default_per_page, type=int)
+    with_total = parse_bool_arg('with_total', default=True)
+    cursor = request.args.get('cursor')
+
+    if cursor is None:
+        page = request.args.get('page', 1, type=int)
+        pagination = query.paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False,
+            count=with_total
+        )
+        return Page(
+            items=pagination.items,
+            per_page=pagination.per_page,
+            total=pagination.total,
+            page=pagination.page,
+            pages=pagination.pages
+        )
+
+    if per_page < 1:
+        per_page = default_per_page
+
+    entity = query.column_descriptions[0]['entity']
+    id_column = entity.id
+    if sort_column is None:
+        sort_column = id_column
+
+    total = query.order_by(None).count() if with_total else None
+
+    if descending:
+        query = query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(sort_column.asc(), id_column.asc())
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        if sort_column is id_column:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(
+                (sort_column < last_value) |
+                ((sort_column == last_value) & (id_column < last_id))
+            )
+        else:
+            query = query.filter(
+                (sort_column > last_value) |
+                ((sort_column == last_value) & (id_column > last_id))
+            )
+
+    # 多取一条用于判断是否还有下一页
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+
+    return Page(
+        items=items,
+        per_page=per_page,
+        total=total,
+        next_cursor=next_cursor,
+        cursor_mode=True
+    )
@@ -0,0 +1,176 @@
+"""密码哈希
+
+bcrypt 是刻意设计得很慢的运算（cost 12 单次约 0.2~0.3 秒）。在 sync gunicorn worker 的请求线程中
+同步执行时，开学季集中登录会占满所有 worker，图书检索等普通请求只能排队。
+
+- 哈希和校验在有界进程池中执行（PASSWORD_HASH_WORKERS 个进程，为 0 时在当前进程内执行）
+- 本机同时进行的 bcrypt 运算数不超过 PASSWORD_HASH_CONCURRENCY（文件锁实现，对所有 gunicorn worker 生效），
+  等待 PASSWORD_HASH_WAIT 秒仍无空闲名额时抛出 PasswordHasherBusy，由接口返回 503 + Retry-After
+- cost 由 BCRYPT_LOG_ROUNDS 配置，needs_rehash() 用于登录时把旧 cost 的哈希升级为新 cost
+- hash_passwords() 供后台任务批量创建用户使用，用 PASSWORD_BATCH_WORKERS 个进程并行哈希；
+  它运行在独立的 job worker 进程中，不占用登录的 PASSWORD_HASH_CONCURRENCY 名额
+
+生成的哈希与 Flask-Bcrypt 格式相同（$2b$），已有密码无需迁移。
+"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+import bcrypt
+from flask import current_app, has_app_context
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只在进程内限流
+    fcntl = None
+
+DEFAULT_LOG_ROUNDS = 12
+DEFAULT_WORKERS = 2
+DEFAULT_CONCURRENCY = 2
+DEFAULT_WAIT = 0.5  # 秒
+DEFAULT_RETRY_AFTER = 1  # 秒
+
+
+class PasswordHasherBusy(Exception):
+    """密码哈希名额已满"""
+
+    def __init__(self, retry_after=DEFAULT_RETRY_AFTER):
+        super().__init__('服务器繁忙，请稍后重试')
+        self.retry_after = retry_after
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    """每个进程一个进程池；gunicorn fork 出的 worker 各自创建"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+_local_semaphores = {}
+
+
+def _try_acquire_slot(lock_dir, concurrency):
+    """尝试占用一个名额，成功返回需要释放的句柄，否则返回 None"""
+    if fcntl is None:
+        semaphore = _local_semaphores.setdefault(concurrency, threading.BoundedSemaphore(concurrency))
+        return semaphore if semaphore.acquire(blocking=False) else None
+
+    os.makedirs(lock_dir, exist_ok=True)
+    for slot in range(concurrency):
+        fd = os.open(os.path.join(lock_dir, f'slot-{slot}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def _release_slot(handle):
+    if fcntl is None:
+        handle.release()
+    else:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        os.close(handle)
+
+
+@contextmanager
+def hash_slot():
+    """占用一个 bcrypt 名额，最多等待 PASSWORD_HASH_WAIT 秒，超时抛出 PasswordHasherBusy"""
+    lock_dir = _config('PASSWORD_HASH_LOCK_DIR', None) or \
+        os.path.join(tempfile.gettempdir(), 'library_password_slots')
+    concurrency = _config('PASSWORD_HASH_CONCURRENCY', DEFAULT_CONCURRENCY)
+    deadline = time.monotonic() + _config('PASSWORD_HASH_WAIT', DEFAULT_WAIT)
+
+    handle = _try_acquire_slot(lock_dir, concurrency)
+    while handle is None:
+        if time.monotonic() >= deadline:
+            raise PasswordHasherBusy(_config('PASSWORD_HASH_RETRY_AFTER', DEFAULT_RETRY_AFTER))
+        time.sleep(0.05)
+        handle = _try_acquire_slot(lock_dir, concurrency)
+
+    try:
+        yield
+    finally:
+        _release_slot(handle)
+
+
+def _run(func, *args):
+    with hash_slot():
+        workers = _config('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+        if workers <= 0:
+            return func(*args)
+        return _get_executor(workers).submit(func, *args).result()
+
+
+def hash_password(password, rounds=None):
+    """按配置的 cost（或指定的 rounds）生成 bcrypt 哈希"""
+    return _run(_hashpw, password, rounds or _config('BCRYPT_LOG_ROUNDS', DEFAULT_LOG_ROUNDS))
+
+
+def verify_password(password, password_hash):
+    """校验密码"""
+    return _run(_checkpw, password, password_hash)
+
+
+def batch_log_rounds():
+    """批量创建的初始密码使用的 cost（PASSWORD_BATCH_LOG_ROUNDS，未配置时与 BCRYPT_LOG_ROUNDS 相同）
+
+    用户首次登录时会按 BCRYPT_LOG_ROUNDS 重新哈希。
+    """
+    return _config('PASSWORD_BATCH_LOG_ROUNDS', None) or _config('BCRYPT_LOG_ROUNDS', DEFAULT_LOG_ROUNDS)
+
+
+def hash_passwords(passwords, rounds=None, workers=None):
+    """批量生成哈希，返回与 passwords 顺序一致的列表
+
+    在 workers（默认 PASSWORD_BATCH_WORKERS）个进程中并行哈希，为 0 时在当前进程内执行。
+    不占用登录名额，只应在后台任务中调用；请求中少量创建用户请逐个调用 hash_password()。
+    """
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    rounds = rounds or batch_log_rounds()
+    if workers is None:
+        workers = _config('PASSWORD_BATCH_WORKERS', os.cpu_count() or 1)
+    workers = min(workers, len(passwords))
+    if workers <= 1:
+        return [_hashpw(password, rounds) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_hashpw, passwords, repeat(rounds), chunksize=chunksize))
+
+
+def needs_rehash(password_hash):
+    """哈希的 cost 与当前配置不同时返回 True"""
+    try:
+        rounds = int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return False
+    return rounds != _config('BCRYPT_LOG_ROUNDS', DEFAULT_LOG_ROUNDS)
@@ -0,0 +1,48 @@
+"""SQL 查询计数
+
+用于测试中断言某段代码执行的 SQL 语句数量，防止 N+1 查询回归：
+
+    with assert_max_queries(3):
+        client.get('/api/borrows', headers=headers)
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from ..models import db
+
+
+class QueryCounter:
+    """记录执行过的 SQL 语句"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """统计上下文内执行的 SQL 语句数量"""
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._on_execute)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """断言上下文内执行的 SQL 语句不超过 limit 条"""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(counter.statements)
+        raise AssertionError(
+            f'预期最多执行 {limit} 条 SQL，实际执行 {counter.count} 条：\n{statements}'
+        )
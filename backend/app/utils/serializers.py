@@ -0,0 +1,93 @@
+"""响应序列化
+
+每个 Serializer 声明序列化时会访问的关联关系，并通过 joinedload / selectinload
+在列表查询中一次性预加载，避免逐行访问关联对象时触发懒加载（N+1 查询）。
+
+用法：
+    query = borrow_with_book.prepare(query)
+    page = paginate(query, ...)
+    data = borrow_with_book.dump_many(page.items)
+"""
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
+from ..models import BorrowRecord, Review
+
+
+class Serializer:
+    """序列化函数 + 所需关联关系的声明"""
+
+    def __init__(self, model, func, joined=(), selectin=()):
+        self.model = model
+        self.func = func
+        # 多对一关系用 joinedload（随主查询 JOIN），一对多关系用 selectinload（额外一条 IN 查询）
+        self.joined = tuple(joined)
+        self.selectin = tuple(selectin)
+
+    def load_options(self):
+        """返回预加载选项"""
+        # backref 在映射配置完成后才会挂到类上
+        configure_mappers()
+        options = [joinedload(getattr(self.model, name)) for name in self.joined]
+        options += [selectinload(getattr(self.model, name)) for name in self.selectin]
+        return options
+
+    def prepare(self, query):
+        """为查询加上预加载选项"""
+        return query.options(*self.load_options())
+
+    def dump(self, obj):
+        return self.func(obj)
+
+    def dump_many(self, objs):
+        return [self.func(obj) for obj in objs]
+
+
+def _borrow_with_book(borrow):
+    data = borrow.to_dict()
+    data['book'] = borrow.book.to_dict()
+    return data
+
+
+def _borrow_with_user_and_book(borrow):
+    data = borrow.to_dict()
+    data['user'] = borrow.user.to_dict()
+    data['book'] = borrow.book.to_dict()
+    return data
+
+
+def _review_with_username(review):
+    return {
+        'id': review.id,
+        'book_id': review.book_id,
+        'user_id': review.user_id,
+        'username': review.user.username if review.user else '未知用户',
+        'rating': review.rating,
+        'comment': review.comment,
+        'created_at': review.created_at.isoformat()
+    }
+
+
+def _review_with_book(review):
+    return {
+        'id': review.id,
+        'book_id': review.book_id,
+        'book_title': review.book.title if review.book else '未知图书',
+        'book_author': review.book.author if review.book else '未知作者',
+        'rating': review.rating,
+        'comment': review.comment,
+        'created_at': review.created_at.isoformat()
+    }
+
+
+# 借阅记录 + 图书信息（我的借阅）
+borrow_with_book = Serializer(BorrowRecord, _borrow_with_book, joined=['book'])
+
+# 借阅记录 + 用户和图书信息（管理员借阅列表）
+borrow_with_user_and_book = Serializer(
+    BorrowRecord, _borrow_with_user_and_book, joined=['user', 'book']
+)
+
+# 评论 + 评论者用户名（图书评论列表）
+review_with_username = Serializer(Review, _review_with_username, joined=['user'])
+
+# 评论 + 图书标题/作者（用户评论列表）
+review_with_book = Serializer(Review, _review_with_book, joined=['book'])
@@ -12,10 +12,60 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key')
     JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 86400))
     
+    # 密码哈希：bcrypt cost、哈希进程数、本机同时进行的哈希数、等待名额的秒数
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 2))
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 0.5))
+    PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 1))
+    
+    # 批量创建用户：后台任务中并行哈希的进程数（不占用登录名额）、初始密码的 cost（留空则与 BCRYPT_LOG_ROUNDS 相同，首次登录时升级）、单次上限
+    PASSWORD_BATCH_WORKERS = int(os.environ.get('PASSWORD_BATCH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_BATCH_LOG_ROUNDS = int(os.environ['PASSWORD_BATCH_LOG_ROUNDS']) if os.environ.get('PASSWORD_BATCH_LOG_ROUNDS') else None
+    USER_BATCH_MAX_SIZE = int(os.environ.get('USER_BATCH_MAX_SIZE', 10000))
+    # 超过该数量的批量创建用户提交为后台任务，不在请求中同步哈希
+    USER_BATCH_SYNC_MAX_SIZE = int(os.environ.get('USER_BATCH_SYNC_MAX_SIZE', 50))
+    
+    # 身份缓存：权限检查用的用户角色/状态在进程内缓存的条数和秒数
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 1024))
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+    
+    # 令牌吊销表在进程内缓存的秒数
+    TOKEN_VERSION_CACHE_TTL = int(os.environ.get('TOKEN_VERSION_CACHE_TTL', 30))
+    
+    # 公开目录接口 Cache-Control 的 max-age（秒）
+    CATALOG_CACHE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_MAX_AGE', 10))
+    
+    # 目录响应缓存：后端（local / null）、过期秒数、最多条数和总字节数
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'local')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 30))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    
+    # 图书检索后端：fts5 / like，留空时 SQLite 自动使用 fts5
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND')
+    
     # 文件上传
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = 'uploads'
     
+    # 图书批量导入：每批插入行数、错误报告最多返回的行数
+    BOOK_IMPORT_BATCH_SIZE = int(os.environ.get('BOOK_IMPORT_BATCH_SIZE', 1000))
+    BOOK_IMPORT_MAX_ERRORS = int(os.environ.get('BOOK_IMPORT_MAX_ERRORS', 1000))
+    
+    # 后台任务：worker 无任务时的轮询间隔（秒）
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+    # running 任务超过该秒数没有心跳（进度上报）时视为 worker 已中断，标记为失败
+    JOB_STALE_TIMEOUT = int(os.environ.get('JOB_STALE_TIMEOUT', 600))
+    
+    # 预约：副本保留给预约者的取书期限（天）
+    RESERVATION_HOLD_DAYS = int(os.environ.get('RESERVATION_HOLD_DAYS', 3))
+    # 过期预约清理：每段处理并提交的预约数
+    RESERVATION_EXPIRY_BATCH_SIZE = int(os.environ.get('RESERVATION_EXPIRY_BATCH_SIZE', 1000))
+    
+    # 逾期检查：每段处理并提交的借阅记录数
+    OVERDUE_SWEEP_BATCH_SIZE = int(os.environ.get('OVERDUE_SWEEP_BATCH_SIZE', 1000))
+    
     @staticmethod
     def init_app(app):
         """初始化应用配置"""
@@ -30,6 +80,10 @@ class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite:///:memory:')
+    # 测试中使用最低 cost 并在当前进程内哈希
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
+    PASSWORD_BATCH_WORKERS = 0
 
 class ProductionConfig(Config):
     """生产环境配置"""
@@ -0,0 +1,39 @@
+"""Add books_fts full-text index
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.search import book_fts_backend
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    backend = book_fts_backend
+    backend.create_index(bind)
+    # 为已有图书建立索引
+    backend.rebuild(bind)
+
+
+def downgrade():
+    from app.services.search import book_fts_backend
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    book_fts_backend.drop_index(bind)
@@ -0,0 +1,50 @@
+"""Add user_login_keys for case-insensitive login lookup
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.login_keys import create_login_keys, find_login_key_conflicts, LoginKeyConflictError
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # 已有用户的登录名冲突时中止升级并列出冲突，由管理员修改后重新执行，不丢弃任何用户的登录名
+        conflicts = find_login_key_conflicts(bind)
+        if conflicts:
+            raise LoginKeyConflictError(conflicts)
+
+    op.create_table('user_login_keys',
+    sa.Column('login_key', sa.String(length=120), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('login_key')
+    )
+    op.create_index('idx_user_login_keys_user', 'user_login_keys', ['user_id'])
+
+    if bind.dialect.name == 'sqlite':
+        # 创建触发器并为已有用户生成登录名
+        create_login_keys(bind, backfill=True)
+
+
+def downgrade():
+    from app.services.login_keys import drop_login_keys
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        drop_login_keys(bind)
+
+    op.drop_index('idx_user_login_keys_user', table_name='user_login_keys')
+    op.drop_table('user_login_keys')
@@ -0,0 +1,41 @@
+"""Add users_fts prefix search index and users role/status index
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.search import user_fts_backend
+
+    op.create_index('idx_users_role_active', 'users', ['role', 'is_active', 'id'])
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    backend = user_fts_backend
+    backend.create_index(bind)
+    # 为已有用户建立索引
+    backend.rebuild(bind)
+
+
+def downgrade():
+    from app.services.search import user_fts_backend
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        user_fts_backend.drop_index(bind)
+
+    op.drop_index('idx_users_role_active', table_name='users')
@@ -0,0 +1,41 @@
+"""Add table_versions for catalog ETags
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.table_versions import create_version_triggers
+
+    op.create_table('table_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        create_version_triggers(bind)
+
+
+def downgrade():
+    from app.services.table_versions import drop_version_triggers
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        drop_version_triggers(bind)
+
+    op.drop_table('table_versions')
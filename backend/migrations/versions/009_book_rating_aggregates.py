@@ -0,0 +1,66 @@
+"""Add rating aggregates to books
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+RATING_AVG = 'CAST(rating_sum AS FLOAT) / (rating_count + 0.0)'
+
+
+def upgrade():
+    from app.services.search import book_fts_backend
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # 全文索引触发器改为只在被索引的列变化时触发，下面的回填不再逐行重建索引
+        op.execute('DROP TRIGGER IF EXISTS books_fts_au')
+        book_fts_backend.create_index(bind)
+
+    # ALTER TABLE ADD COLUMN，不重建表，books 上的触发器保持不变
+    op.add_column('books', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('books', sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+
+    # 001 中的 idx_reviews_book 只有 book_id，扩展为覆盖索引供重算子查询使用
+    op.drop_index('idx_reviews_book', table_name='reviews')
+    op.create_index('idx_reviews_book', 'reviews', ['book_id', 'rating'], unique=False)
+    op.create_index('idx_books_rating', 'books', [sa.text(RATING_AVG), 'id'], unique=False)
+
+    # 回填已有评论的汇总
+    op.execute(
+        """UPDATE books SET
+            rating_count = (SELECT COUNT(*) FROM reviews WHERE reviews.book_id = books.id),
+            rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews WHERE reviews.book_id = books.id)
+        WHERE id IN (SELECT book_id FROM reviews)"""
+    )
+
+
+def downgrade():
+    op.drop_index('idx_books_rating', table_name='books')
+    op.drop_index('idx_reviews_book', table_name='reviews')
+    op.create_index('idx_reviews_book', 'reviews', ['book_id'], unique=False)
+
+    op.drop_column('books', 'rating_sum')
+    op.drop_column('books', 'rating_count')
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS books_fts_au')
+        op.execute(
+            """CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE ON books BEGIN
+                INSERT INTO books_fts(books_fts, rowid, title, author, publisher, isbn)
+                VALUES ('delete', old.id, old.title, old.author, old.publisher, old.isbn);
+                INSERT INTO books_fts(rowid, title, author, publisher, isbn)
+                VALUES (new.id, new.title, new.author, new.publisher, new.isbn);
+            END"""
+        )
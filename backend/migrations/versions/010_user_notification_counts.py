@@ -0,0 +1,41 @@
+"""Add user_notification_counts for unread badges
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.notification_counts import create_notification_counts
+
+    op.create_table('user_notification_counts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # 创建触发器并按已有通知生成计数
+        create_notification_counts(bind, backfill=True)
+
+
+def downgrade():
+    from app.services.notification_counts import drop_notification_counts
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        drop_notification_counts(bind)
+
+    op.drop_table('user_notification_counts')
@@ -0,0 +1,57 @@
+"""Add borrow/book references to notifications
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite 的 ADD COLUMN 不能附带外键约束，外键只在模型中声明
+    op.add_column('notifications', sa.Column('borrow_record_id', sa.Integer(), nullable=True))
+    op.add_column('notifications', sa.Column('book_id', sa.Integer(), nullable=True))
+    op.create_index(
+        'idx_notifications_borrow_type', 'notifications',
+        ['borrow_record_id', 'notification_type', 'created_at'], unique=False
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    # 按书名为最近两天的到期提醒补上借阅记录，避免升级后立即重复提醒
+    op.execute(
+        """UPDATE notifications SET
+            borrow_record_id = (
+                SELECT borrow_records.id FROM borrow_records
+                JOIN books ON books.id = borrow_records.book_id
+                WHERE borrow_records.user_id = notifications.user_id
+                AND borrow_records.status = 'borrowed'
+                AND notifications.content LIKE '%《' || books.title || '》%'
+                ORDER BY borrow_records.id DESC LIMIT 1
+            )
+        WHERE notification_type = 'return_reminder'
+        AND created_at > datetime('now', '-2 days')"""
+    )
+    op.execute(
+        """UPDATE notifications SET book_id = (
+            SELECT book_id FROM borrow_records WHERE borrow_records.id = notifications.borrow_record_id
+        )
+        WHERE borrow_record_id IS NOT NULL"""
+    )
+
+
+def downgrade():
+    op.drop_index('idx_notifications_borrow_type', table_name='notifications')
+    op.drop_column('notifications', 'book_id')
+    op.drop_column('notifications', 'borrow_record_id')
@@ -0,0 +1,29 @@
+"""Add reservation hold queue indexes
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'idx_reservations_queue', 'reservations',
+        ['book_id', 'status', 'reservation_date'], unique=False
+    )
+    op.create_index('idx_reservations_user_status', 'reservations', ['user_id', 'status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_reservations_user_status', table_name='reservations')
+    op.drop_index('idx_reservations_queue', table_name='reservations')
@@ -0,0 +1,27 @@
+"""Add reservation expiry index
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'idx_reservations_status_expires', 'reservations',
+        ['status', 'expires_at'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('idx_reservations_status_expires', table_name='reservations')
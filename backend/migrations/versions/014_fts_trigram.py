@@ -0,0 +1,77 @@
+"""Rebuild books_fts and users_fts with the trigram tokenizer
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.search import book_fts_backend, user_fts_backend
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    # 分词器只能在建表时指定，删除后按 trigram 重建并重新索引已有数据
+    for backend in (book_fts_backend, user_fts_backend):
+        backend.drop_index(bind)
+        backend.create_index(bind)
+        backend.rebuild(bind)
+
+
+# 014 之前的 unicode61 前缀索引：(源表, 列, prefix)
+UNICODE61_INDEXES = (
+    ('books', ('title', 'author', 'publisher', 'isbn'), '2 3 4'),
+    ('users', ('username', 'email'), '1 2 3'),
+)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    for source, columns, prefix in UNICODE61_INDEXES:
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {source}_fts_{suffix}')
+        op.execute(f'DROP TABLE IF EXISTS {source}_fts')
+        op.execute(
+            f"""CREATE VIRTUAL TABLE {source}_fts USING fts5(
+                {names},
+                content='{source}',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='{prefix}'
+            )"""
+        )
+        op.execute(
+            f"""CREATE TRIGGER {source}_fts_ai AFTER INSERT ON {source} BEGIN
+                INSERT INTO {source}_fts(rowid, {names}) VALUES (new.id, {new_values});
+            END"""
+        )
+        op.execute(
+            f"""CREATE TRIGGER {source}_fts_ad AFTER DELETE ON {source} BEGIN
+                INSERT INTO {source}_fts({source}_fts, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            END"""
+        )
+        op.execute(
+            f"""CREATE TRIGGER {source}_fts_au AFTER UPDATE OF {names} ON {source} BEGIN
+                INSERT INTO {source}_fts({source}_fts, rowid, {names}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {source}_fts(rowid, {names}) VALUES (new.id, {new_values});
+            END"""
+        )
+        op.execute(f"INSERT INTO {source}_fts({source}_fts) VALUES ('rebuild')")
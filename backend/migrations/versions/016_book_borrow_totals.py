@@ -0,0 +1,37 @@
+"""Add book_borrow_totals
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('book_borrow_totals',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('borrow_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.PrimaryKeyConstraint('book_id')
+    )
+    op.create_index('idx_book_borrow_totals_count', 'book_borrow_totals', ['borrow_count', 'book_id'])
+
+    # 按已汇总的每日数据生成累计次数，与水位线保持一致
+    op.execute(
+        """INSERT INTO book_borrow_totals (book_id, borrow_count)
+        SELECT book_id, SUM(borrow_count) FROM borrow_daily_stats GROUP BY book_id"""
+    )
+
+
+def downgrade():
+    op.drop_index('idx_book_borrow_totals_count', table_name='book_borrow_totals')
+    op.drop_table('book_borrow_totals')
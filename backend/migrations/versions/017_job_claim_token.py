@@ -0,0 +1,24 @@
+"""Add jobs.claim_token
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '017'
+down_revision = '016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('jobs', sa.Column('claim_token', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    op.drop_column('jobs', 'claim_token')
@@ -0,0 +1,42 @@
+"""Add cache_tag_versions for the catalog response cache
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '018'
+down_revision = '017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.catalog_cache import create_tag_triggers
+
+    op.create_table('cache_tag_versions',
+    sa.Column('tag', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('tag')
+    )
+    op.create_index('idx_cache_tag_versions_version', 'cache_tag_versions', ['version'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        create_tag_triggers(bind)
+
+
+def downgrade():
+    from app.services.catalog_cache import drop_tag_triggers
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        drop_tag_triggers(bind)
+
+    op.drop_index('idx_cache_tag_versions_version', table_name='cache_tag_versions')
+    op.drop_table('cache_tag_versions')
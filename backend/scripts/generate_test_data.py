@@ -8,6 +8,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app import create_app
 from app.models import db, User, Book, Category, BorrowRecord
+from app.utils.passwords import hash_passwords
 
 def generate_test_data():
     """生成测试数据"""
@@ -18,13 +19,15 @@ def generate_test_data():
         
         # 创建测试用户
         test_users = []
-        for i in range(1, 21):
+        # 密码在进程池中并行哈希
+        password_hashes = hash_passwords(['password123'] * 20)
+        for i, password_hash in enumerate(password_hashes, start=1):
             user = User(
                 username=f'user{i}',
                 email=f'user{i}@test.com',
-                role='user'
+                role='user',
+                password_hash=password_hash
             )
-            user.set_password('password123')
             test_users.append(user)
         
         db.session.add_all(test_users)
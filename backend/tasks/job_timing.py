@@ -0,0 +1,35 @@
+import time
+
+class JobTimings:
+    """记录每个定时任务的执行次数和耗时"""
+    
+    def __init__(self):
+        self.stats = {}
+    
+    def record(self, name, seconds):
+        stat = self.stats.setdefault(name, {'runs': 0, 'total': 0.0, 'max': 0.0, 'last': None})
+        stat['runs'] += 1
+        stat['total'] += seconds
+        stat['max'] = max(stat['max'], seconds)
+        stat['last'] = seconds
+    
+    def summary(self):
+        lines = []
+        for name, stat in sorted(self.stats.items()):
+            average = stat['total'] / stat['runs']
+            lines.append(
+                f"{name}: 执行 {stat['runs']} 次，平均 {average:.2f}s，最长 {stat['max']:.2f}s，最近 {stat['last']:.2f}s"
+            )
+        return lines
+
+def timed_job(app, timings, name, func):
+    """包装定时任务：使用常驻的应用实例，记录耗时"""
+    def run():
+        start = time.perf_counter()
+        try:
+            func(app)
+        finally:
+            elapsed = time.perf_counter() - start
+            timings.record(name, elapsed)
+            app.logger.info(f'定时任务 {name} 执行结束，耗时 {elapsed:.2f}s')
+    return run
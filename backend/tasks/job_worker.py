@@ -0,0 +1,33 @@
+import time
+from datetime import datetime
+from app import create_app
+from app.models import db
+from app.services.jobs import claim_next_job, run_job
+
+def run_worker():
+    """运行后台任务 worker：轮询 jobs 表，逐个执行排队中的任务"""
+    app = create_app()
+    poll_interval = app.config.get('JOB_POLL_INTERVAL', 2)
+    
+    print("后台任务 worker 启动...")
+    
+    while True:
+        # 每个任务使用独立的应用上下文（及数据库会话）
+        with app.app_context():
+            try:
+                job = claim_next_job()
+                if job:
+                    print(f"{datetime.now()}: 开始执行任务 {job.id} ({job.job_type})")
+                    run_job(job)
+                    print(f"{datetime.now()}: 任务 {job.id} 执行结束，状态 {job.status}")
+                
+            except Exception as e:
+                print(f"执行后台任务时出错: {e}")
+                db.session.rollback()
+                job = None
+        
+        if not job:
+            time.sleep(poll_interval)
+
+if __name__ == '__main__':
+    run_worker()
@@ -0,0 +1,20 @@
+from datetime import datetime
+from app import create_app
+from app.models import db
+from app.services.ratings import recalculate_book_ratings
+
+def repair_book_ratings():
+    """按评论表重算图书评分汇总"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            fixed = recalculate_book_ratings()
+            print(f"{datetime.now()}: 评分汇总重算完成，修正 {fixed} 本图书")
+            
+        except Exception as e:
+            print(f"重算评分汇总时出错: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    repair_book_ratings()
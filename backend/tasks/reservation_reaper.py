@@ -0,0 +1,26 @@
+from datetime import datetime
+from app import create_app
+from app.models import db
+from app.services.reservation_expiry import expire_reservations, DEFAULT_BATCH_SIZE
+
+def reap_expired_reservations(app=None):
+    """清理过期预约"""
+    app = app or create_app()
+    
+    with app.app_context():
+        try:
+            report = expire_reservations(
+                batch_size=app.config.get('RESERVATION_EXPIRY_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+            )
+            print(
+                f"{datetime.now()}: 过期预约清理完成，待处理预约 {report['expired_pending']} 条，"
+                f"保留超时 {report['expired_holds']} 条（顺延 {report['reassigned']} 本，"
+                f"回到库存 {report['released']} 本），耗时 {report['seconds']}s"
+            )
+            
+        except Exception as e:
+            print(f"清理过期预约时出错: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    reap_expired_reservations()
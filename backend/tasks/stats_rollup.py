@@ -0,0 +1,20 @@
+from datetime import datetime
+from app import create_app
+from app.models import db
+from app.services.stats import rollup_borrow_stats
+
+def rollup_daily_stats(app=None):
+    """增量汇总每日借阅统计"""
+    app = app or create_app()
+    
+    with app.app_context():
+        try:
+            processed = rollup_borrow_stats()
+            print(f"{datetime.now()}: 借阅统计汇总完成，新增汇总 {processed} 条借阅记录")
+            
+        except Exception as e:
+            print(f"汇总借阅统计时出错: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    rollup_daily_stats()
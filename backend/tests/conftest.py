@@ -1,13 +1,15 @@
 import pytest
 from app import create_app
 from app.models import db, User, Book, Category, BorrowRecord, Review
+from config.init import TestingConfig
 from datetime import datetime, timedelta
 import json
 
 @pytest.fixture
 def app():
     """创建测试应用"""
-    app = create_app()
+    # 配置需在初始化扩展前传入，否则 SQLAlchemy 会连接默认的 database/library.db
+    app = create_app(TestingConfig)
     app.config.update({
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",  # 使用内存数据库
@@ -75,18 +77,18 @@ def database(app):
 def admin_token(client, database):
     """获取管理员JWT令牌"""
     response = client.post("/api/auth/login", json={
-        "username": "admin",
+        "login": "admin",
         "password": "admin123"
     })
     data = json.loads(response.data)
-    return data["access_token"]
+    return data["token"]
 
 @pytest.fixture
 def user_token(client, database):
     """获取普通用户JWT令牌"""
     response = client.post("/api/auth/login", json={
-        "username": "user",
+        "login": "user",
         "password": "user123"
     })
     data = json.loads(response.data)
-    return data["access_token"]
+    return data["token"]
@@ -1,3 +1,5 @@
+import os
+import time
 import json
 
 def test_user_register(client, database):
@@ -43,3 +45,113 @@ def test_admin_login(client, database):
     assert "user" in data
     assert data["user"]["username"] == "admin"
     assert data["user"]["role"] == "admin"
+
+
+def test_login_rehashes_password_when_cost_changes(app, client, database):
+    """测试 bcrypt cost 变化后登录时重新哈希"""
+    from app.models import User
+    old_hash = User.query.filter_by(username="user").first().password_hash
+    assert old_hash.startswith("$2b$04$")
+
+    app.config["BCRYPT_LOG_ROUNDS"] = 5
+    response = client.post("/api/auth/login", json={"login": "user", "password": "user123"})
+    assert response.status_code == 200
+
+    new_hash = User.query.filter_by(username="user").first().password_hash
+    assert new_hash.startswith("$2b$05$")
+    response = client.post("/api/auth/login", json={"login": "user", "password": "user123"})
+    assert response.status_code == 200
+
+
+def test_login_returns_503_when_hasher_busy(app, client, database, tmp_path):
+    """测试密码哈希名额已满时返回 503 和 Retry-After"""
+    from app.utils.passwords import hash_slot
+    app.config.update({
+        "PASSWORD_HASH_LOCK_DIR": str(tmp_path),
+        "PASSWORD_HASH_CONCURRENCY": 1,
+        "PASSWORD_HASH_WAIT": 0.1,
+        "PASSWORD_HASH_RETRY_AFTER": 3
+    })
+    with app.app_context(), hash_slot():
+        response = client.post("/api/auth/login", json={"login": "user", "password": "user123"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+    response = client.post("/api/auth/login", json={"login": "user", "password": "user123"})
+    assert response.status_code == 200
+
+
+def test_password_hashing_in_process_pool(app):
+    """测试在进程池中哈希和校验密码"""
+    from app.utils.passwords import hash_password, verify_password
+    app.config["PASSWORD_HASH_WORKERS"] = 1
+    with app.app_context():
+        password_hash = hash_password("secret")
+        assert verify_password("secret", password_hash)
+        assert not verify_password("wrong", password_hash)
+
+
+def test_login_keys_are_case_insensitive(client, database, user_token):
+    """测试登录名不区分大小写，并在修改用户名后同步更新"""
+    response = client.post("/api/auth/login", json={"login": "USER@Example.com", "password": "user123"})
+    assert response.status_code == 200
+
+    response = client.post("/api/auth/register", json={
+        "username": "Admin", "email": "someone@example.com", "password": "secret"
+    })
+    assert response.status_code == 400
+    assert json.loads(response.data)["error"] == "用户名已存在"
+    response = client.post("/api/auth/register", json={
+        "username": "someone", "email": "ADMIN@example.com", "password": "secret"
+    })
+    assert json.loads(response.data)["error"] == "邮箱已存在"
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    response = client.put("/api/auth/profile", json={"username": "admin"}, headers=headers)
+    assert response.status_code == 400
+    response = client.put("/api/auth/profile", json={"username": "Reader"}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.post("/api/auth/login", json={"login": "user", "password": "user123"}).status_code == 401
+    assert client.post("/api/auth/login", json={"login": "reader", "password": "user123"}).status_code == 200
+
+
+def test_login_key_conflicts_are_reported():
+    """测试生成登录名前列出被多个用户占用的登录名"""
+    import sqlalchemy as sa
+    from app.services.login_keys import find_login_key_conflicts, LoginKeyConflictError
+
+    engine = sa.create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(sa.text("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, email TEXT)"))
+        connection.execute(sa.text("""INSERT INTO users (id, username, email) VALUES
+            (1, 'Alice', 'a@example.com'),
+            (2, 'alice', 'b@example.com'),
+            (3, 'bob', 'carol@example.com'),
+            (4, 'carol@EXAMPLE.com', 'c@example.com'),
+            (5, 'dave', 'DAVE')"""))
+        conflicts = find_login_key_conflicts(connection)
+
+    # 同一用户的用户名与邮箱相同不算冲突
+    assert conflicts == {"alice": [1, 2], "carol@example.com": [3, 4]}
+    assert "alice: 用户 1, 2" in str(LoginKeyConflictError(conflicts))
+
+
+def _hash_with_pid(password, rounds):
+    time.sleep(0.05)
+    return f"{os.getpid()}:{password}"
+
+
+def test_batch_hashing_uses_own_workers(app, tmp_path, monkeypatch):
+    """测试批量哈希使用 PASSWORD_BATCH_WORKERS 个进程，在登录名额全部被占用时也能并行执行"""
+    from app.utils import passwords
+    monkeypatch.setattr(passwords, "_hashpw", _hash_with_pid)
+    app.config.update(PASSWORD_HASH_LOCK_DIR=str(tmp_path), PASSWORD_HASH_WAIT=0, PASSWORD_BATCH_WORKERS=2)
+    assert app.config["PASSWORD_HASH_CONCURRENCY"] == 2
+    with app.app_context(), passwords.hash_slot(), passwords.hash_slot():
+        hashes = passwords.hash_passwords([f"pass{i}" for i in range(16)])
+
+    assert [h.split(":")[1] for h in hashes] == [f"pass{i}" for i in range(16)]
+    pids = {h.split(":")[0] for h in hashes}
+    assert len(pids) == 2
+    assert str(os.getpid()) not in pids
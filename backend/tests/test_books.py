@@ -1,5 +1,7 @@
 import json
 from datetime import datetime
+from sqlalchemy import text
+from app.models import db
 
 
 def test_get_books(client, database, user_token):
@@ -67,3 +69,279 @@ def test_delete_book(client, database, admin_token):
     # 验证图书已删除
     response = client.get("/api/books/1", headers={"Authorization": f"Bearer {user_token}"})
     assert response.status_code == 404
+
+
+def test_search_books_prefix(client, database):
+    """测试全文检索的前缀匹配"""
+    response = client.get("/api/books", query_string={"search": "pyth"})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [book["title"] for book in data["books"]] == ["Python编程：从入门到实践"]
+
+    # 出版社字段同样参与检索
+    response = client.get("/api/books", query_string={"search": "南海出版公司"})
+    data = json.loads(response.data)
+    assert [book["title"] for book in data["books"]] == ["百年孤独"]
+
+
+def test_search_books_infix(client, database):
+    """测试中文词语和 ISBN 片段在字段中间也能检索到"""
+    def titles(search):
+        response = client.get("/api/books", query_string={"search": search})
+        assert response.status_code == 200
+        return [book["title"] for book in json.loads(response.data)["books"]]
+
+    assert titles("孤独") == ["百年孤独"]
+    assert titles("编程") == ["Python编程：从入门到实践"]
+    assert titles("入门") == ["Python编程：从入门到实践"]
+    assert titles("从入门到") == ["Python编程：从入门到实践"]
+    assert titles("5442708") == ["百年孤独"]
+    # 少于3个字符与3个以上字符的词组合（AND）
+    assert titles("马尔克斯 孤独") == ["百年孤独"]
+    assert titles("编程 孤独") == []
+
+
+def test_search_index_follows_book_changes(client, database, admin_token):
+    """测试图书增删改后检索索引同步更新"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = client.post("/api/books", json={
+        "isbn": "9787536692930",
+        "title": "活着",
+        "author": "余华",
+        "category_id": 1,
+        "total_copies": 1
+    }, headers=headers)
+    book_id = json.loads(response.data)["book"]["id"]
+
+    response = client.get("/api/books", query_string={"search": "余华"})
+    assert json.loads(response.data)["total"] == 1
+
+    client.put(f"/api/books/{book_id}", json={"author": "Yu Hua"}, headers=headers)
+    response = client.get("/api/books", query_string={"search": "余华"})
+    assert json.loads(response.data)["total"] == 0
+    response = client.get("/api/books", query_string={"search": "yu hua"})
+    assert json.loads(response.data)["total"] == 1
+
+    client.delete(f"/api/books/{book_id}", headers=headers)
+    response = client.get("/api/books", query_string={"search": "yu"})
+    assert json.loads(response.data)["total"] == 0
+
+
+def test_get_books_cursor_pagination(client, database):
+    """测试游标分页"""
+    response = client.get("/api/books", query_string={"cursor": "", "per_page": 1})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [book["id"] for book in data["books"]] == [1]
+    assert data["total"] == 2
+    assert data["next_cursor"]
+
+    response = client.get("/api/books", query_string={
+        "cursor": data["next_cursor"],
+        "per_page": 1,
+        "with_total": "false"
+    })
+    data = json.loads(response.data)
+    assert [book["id"] for book in data["books"]] == [2]
+    assert "total" not in data
+    assert data["next_cursor"] is None
+
+    response = client.get("/api/books", query_string={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_batch_import_books_csv(client, database, admin_token):
+    """测试CSV批量导入及逐行错误报告"""
+    import io
+    csv_content = "\n".join([
+        "isbn,title,author,publisher,publish_date,category_id,total_copies",
+        "9787020002207,红楼梦,曹雪芹,人民文学出版社,1996-12-01,1,4",
+        "9787544270878,百年孤独,加西亚·马尔克斯,南海出版公司,,1,2",
+        "9787020002208,,佚名,,,1,1",
+        "9787020002209,三国演义,罗贯中,,1998-13-01,1,1",
+        "9787020002207,红楼梦,曹雪芹,,,1,1",
+        "9787020002210,水浒传,施耐庵,,,99,1",
+        "9787020002211,西游记,吴承恩,,,2,3",
+    ])
+    data = {"file": (io.BytesIO(csv_content.encode("utf-8")), "books.csv")}
+    response = client.post("/api/books/batch/import", data=data,
+                           content_type="multipart/form-data",
+                           headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    report = json.loads(response.data)
+    assert report["imported"] == 2
+    assert report["failed"] == 5
+    # 错误按行号排列，提交时才发现的 "ISBN已存在" 也不例外
+    assert [(error["row"], error["error"]) for error in report["errors"]] == [
+        (3, "ISBN已存在"),
+        (4, "title是必填项"),
+        (5, "publish_date格式应为YYYY-MM-DD"),
+        (6, "文件中ISBN重复"),
+        (7, "分类 99 不存在"),
+    ]
+
+    # 导入的图书可以被检索到
+    response = client.get("/api/books", query_string={"search": "吴承恩"})
+    assert json.loads(response.data)["books"][0]["available_copies"] == 3
+
+
+def test_import_report_keeps_earliest_errors():
+    """测试错误报告超出上限时按行号保留最前面的错误"""
+    from app.services.book_import import ImportReport
+    report = ImportReport(max_errors=2)
+    report.add_error(4, "b", "title是必填项")
+    report.add_error(5, "c", "title是必填项")
+    report.add_error(3, "a", "ISBN已存在")
+    data = report.to_dict()
+    assert [error["row"] for error in data["errors"]] == [3, 4]
+    assert data["failed"] == 3
+    assert data["errors_truncated"] is True
+
+
+def test_catalog_conditional_get(client, database, admin_token):
+    """测试目录接口的 ETag / 304 及写入后失效"""
+    from app.utils.query_counter import count_queries
+    response = client.get("/api/books")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "public" in response.headers["Cache-Control"]
+    assert "max-age=10" in response.headers["Cache-Control"]
+
+    # 匹配的 If-None-Match 只查询一次版本表
+    with count_queries() as counter:
+        response = client.get("/api/books", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert counter.count == 1
+
+    # 不同的查询参数对应不同的 ETag
+    response = client.get("/api/books", query_string={"category_id": 1})
+    assert response.headers["ETag"] != etag
+
+    # 借书更新库存后 ETag 变化
+    user_response = client.post("/api/auth/login", json={"login": "user", "password": "user123"})
+    user_headers = {"Authorization": f"Bearer {json.loads(user_response.data)['token']}"}
+    assert client.post("/api/borrow", json={"book_id": 1}, headers=user_headers).status_code in (200, 201)
+    response = client.get("/api/books", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # 分类列表只依赖 categories 表
+    etag = client.get("/api/categories").headers["ETag"]
+    assert client.get("/api/categories", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/api/categories", json={"name": "历史"}, headers={"Authorization": f"Bearer {admin_token}"})
+    assert client.get("/api/categories", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_conditional_get_requires_table_versions(client, database, monkeypatch):
+    """测试表版本号不可用（非 SQLite）时不做条件 GET"""
+    from app.utils import http_cache
+    monkeypatch.setattr(http_cache, "has_table_versions", lambda: False)
+    response = client.get("/api/categories", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert "public" not in response.headers.get("Cache-Control", "")
+
+
+def test_catalog_response_cache(client, database, admin_token):
+    """测试目录响应缓存的命中和按图书、分类失效"""
+    from app.utils.query_counter import count_queries
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+    def get_books(**args):
+        with count_queries() as counter:
+            response = client.get("/api/books", query_string=args)
+        assert response.status_code == 200
+        return json.loads(response.data), counter.count
+
+    get_books()
+    get_books(category_id=1)
+    data, _ = get_books(category_id=2)
+    assert data["books"][0]["available_copies"] == 3
+
+    # 命中时只查询表版本号（ETag）和标签版本号，参数顺序不影响缓存键
+    _, queries = get_books()
+    assert queries == 2
+    get_books(category_id=1, per_page=5)
+    with count_queries() as counter:
+        client.get("/api/books?per_page=5&category_id=1")
+    assert counter.count == 2
+
+    # 借书后该书所在的页面重新查询
+    user_response = client.post("/api/auth/login", json={"login": "user", "password": "user123"})
+    user_headers = {"Authorization": f"Bearer {json.loads(user_response.data)['token']}"}
+    assert client.post("/api/borrow", json={"book_id": 2}, headers=user_headers).status_code in (200, 201)
+    data, queries = get_books(category_id=2)
+    assert queries > 1
+    assert data["books"][0]["available_copies"] == 2
+    _, queries = get_books(category_id=2)
+    assert queries == 2
+
+    # 其他 worker 的写入不会失效本进程的缓存，但触发器更新了该书的标签版本号，旧条目不再命中
+    db.session.execute(text("UPDATE books SET available_copies = 1 WHERE id = 2"))
+    db.session.commit()
+    data, queries = get_books(category_id=2)
+    assert queries > 1
+    assert data["books"][0]["available_copies"] == 1
+
+    # 修改分类后新旧分类的列表页都失效
+    response = client.put("/api/books/1", json={"category_id": 2}, headers=admin_headers)
+    assert response.status_code == 200
+    data, _ = get_books(category_id=1)
+    assert data["books"] == []
+    data, _ = get_books(category_id=2)
+    assert {book["id"] for book in data["books"]} == {1, 2}
+
+    stats = json.loads(client.get("/api/books/cache/stats", headers=admin_headers).data)
+    assert stats["backend"] == "local"
+    assert stats["hits"] == 3
+    assert stats["invalidations"] >= 3
+
+
+def test_borrow_keeps_unrelated_cached_pages(client, database, user_token):
+    """测试借还书（包括其他 worker 中的）不影响不含该书的缓存页面"""
+    from app.utils.query_counter import count_queries
+
+    def get(path, **args):
+        with count_queries() as counter:
+            response = client.get(path, query_string=args)
+        assert response.status_code == 200
+        return json.loads(response.data), counter.count
+
+    for path, args in [("/api/books", {"category_id": 1}), ("/api/books/1", {}), ("/api/books", {"category_id": 2})]:
+        get(path, **args)
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    assert client.post("/api/borrow", json={"book_id": 2}, headers=headers).status_code == 201
+    db.session.execute(text("UPDATE books SET available_copies = available_copies - 1 WHERE id = 2"))
+    db.session.commit()
+
+    # 图书 1 的列表页和详情页仍然命中
+    data, queries = get("/api/books", category_id=1)
+    assert queries == 2
+    assert [book["id"] for book in data["books"]] == [1]
+    _, queries = get("/api/books/1")
+    assert queries == 2
+    # 图书 2 所在的页面重新查询
+    data, queries = get("/api/books", category_id=2)
+    assert queries > 2
+    assert data["books"][0]["available_copies"] == 1
+
+
+def test_response_cache_limits():
+    """测试响应缓存的容量上限和失效期间的写入"""
+    from app.services.catalog_cache import LocalCacheBackend
+    cache = LocalCacheBackend(ttl=60, max_entries=10, max_bytes=10)
+    cache.set("a", b"12345", {"book:1"})
+    cache.set("b", b"12345", {"book:2"})
+    assert cache.get("a").body == b"12345"
+    # 超过字节上限时淘汰最久未使用的条目
+    cache.set("c", b"123", {"book:3"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    generation = cache.generation
+    assert cache.invalidate_tags({"book:1"}) == 1
+    # 查询期间发生过失效，放弃写入
+    cache.set("a", b"old", {"book:1"}, generation=generation)
+    assert cache.get("a") is None
@@ -0,0 +1,281 @@
+import json
+from datetime import datetime, timedelta
+from app.models import db, User, Book, BorrowRecord, BorrowDailyStat, BookBorrowTotal
+from app.services.stats import rollup_borrow_stats, get_watermark, get_top_books
+from app.utils.query_counter import assert_max_queries
+
+
+def create_borrows(count):
+    """为每个新用户创建一条借阅记录"""
+    book_ids = [book.id for book in Book.query.all()]
+    for i in range(count):
+        user = User(username=f"reader{i}", email=f"reader{i}@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(BorrowRecord(
+            user_id=user.id,
+            book_id=book_ids[i % len(book_ids)],
+            borrow_date=datetime.utcnow() - timedelta(minutes=i),
+            due_date=datetime.utcnow() + timedelta(days=30),
+            status="borrowed"
+        ))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_get_all_borrows_query_count(client, database, admin_token):
+    """测试管理员借阅列表不随行数产生 N+1 查询"""
+    create_borrows(12)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    # 权限校验 1 条 + COUNT 1 条 + 列表 1 条
+    with assert_max_queries(3):
+        response = client.get("/api/borrows", query_string={"per_page": 10}, headers=headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data["borrows"]) == 10
+    assert data["borrows"][0]["user"]["username"] == "reader0"
+    assert data["borrows"][0]["book"]["title"] == "百年孤独"
+
+
+def test_get_borrow_stats(client, database, admin_token):
+    """测试借阅统计使用固定数量的聚合查询"""
+    create_borrows(12)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    # 权限校验 + 概览 + 状态分布 + 水位线 + 趋势 + 热门图书 + 活跃用户
+    with assert_max_queries(7):
+        response = client.get("/api/borrows/stats", query_string={"range": "90d"}, headers=headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["overview"] == {
+        "totalBooks": 2,
+        "totalUsers": 14,
+        "currentBorrows": 12,
+        "overdueCount": 0
+    }
+    assert len(data["borrowTrend"]) == 12
+    assert sum(item["count"] for item in data["borrowTrend"]) == 12
+    assert data["statusDistribution"][0] == {"name": "已借阅", "value": 12}
+    assert [book["borrow_count"] for book in data["topBooks"]] == [6, 6]
+    assert len(data["topUsers"]) == 10
+
+
+def test_rollup_borrow_stats(client, database, admin_token):
+    """测试借阅统计增量汇总"""
+    create_borrows(12)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    before = json.loads(client.get("/api/borrows/stats", headers=headers).data)
+
+    assert rollup_borrow_stats(batch_size=5) == 12
+    assert get_watermark() == 12
+    assert sum(stat.borrow_count for stat in BorrowDailyStat.query.all()) == 12
+    assert {total.book_id: total.borrow_count for total in BookBorrowTotal.query.all()} == {1: 6, 2: 6}
+    # 没有新记录时不重复汇总
+    assert rollup_borrow_stats() == 0
+
+    # 汇总后的统计结果与汇总前一致
+    after = json.loads(client.get("/api/borrows/stats", headers=headers).data)
+    assert after == before
+
+    # 水位线之后的新记录实时计入统计
+    db.session.add(BorrowRecord(
+        user_id=2,
+        book_id=2,
+        borrow_date=datetime.utcnow(),
+        due_date=datetime.utcnow() + timedelta(days=30),
+        status="borrowed"
+    ))
+    db.session.commit()
+    data = json.loads(client.get("/api/borrows/stats", headers=headers).data)
+    assert sum(item["count"] for item in data["borrowTrend"]) == 13
+    assert data["topBooks"][0] == {"id": 2, "title": "Python编程：从入门到实践", "author": "埃里克·马瑟斯", "borrow_count": 7}
+
+    # 累计次数不在前 N 本的图书，加上新记录后也能排进前 N 本
+    for _ in range(2):
+        db.session.add(BorrowRecord(user_id=2, book_id=1, borrow_date=datetime.utcnow(),
+                                    due_date=datetime.utcnow() + timedelta(days=30), status="borrowed"))
+    db.session.commit()
+    assert get_top_books(get_watermark(), limit=1) == [
+        {"id": 1, "title": "百年孤独", "author": "加西亚·马尔克斯", "borrow_count": 8}
+    ]
+
+
+def test_concurrent_borrows_never_oversell(tmp_path):
+    """测试并发借阅同一本书时库存不会超借或变为负数"""
+    import threading
+    from app import create_app
+    from config.init import TestingConfig
+    from flask_jwt_extended import create_access_token
+
+    class FileDatabaseConfig(TestingConfig):
+        # 多线程并发需要真实的数据库文件，内存数据库只有一个共享连接
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'concurrency.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 30}}
+        JWT_SECRET_KEY = "test-secret-key"
+
+    app = create_app(FileDatabaseConfig)
+    copies = 3
+    workers = 16
+
+    with app.app_context():
+        db.create_all()
+        book = Book(isbn="9780000000001", title="并发测试", author="测试", total_copies=copies, available_copies=copies)
+        db.session.add(book)
+        tokens = []
+        for i in range(workers):
+            user = User(username=f"racer{i}", email=f"racer{i}@example.com", password_hash="x")
+            db.session.add(user)
+            db.session.flush()
+            tokens.append(create_access_token(identity=str(user.id)))
+        db.session.commit()
+        book_id = book.id
+
+    barrier = threading.Barrier(workers)
+    statuses = []
+
+    def borrow(token):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post("/api/borrow", json={"book_id": book_id},
+                               headers={"Authorization": f"Bearer {token}"})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=borrow, args=(token,)) for token in tokens]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        available = db.session.get(Book, book_id).available_copies
+        borrowed = BorrowRecord.query.filter_by(book_id=book_id).count()
+        db.drop_all()
+
+    assert statuses.count(201) == copies
+    assert borrowed == copies
+    assert available == 0
+
+
+def test_borrow_book_query_count(client, database, user_token):
+    """测试借阅热路径：资格检查一次读取 + 库存扣减 + 插入记录"""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    # 预先加载令牌版本缓存（每 TOKEN_VERSION_CACHE_TTL 秒一次，不计入热路径）
+    client.get("/api/notifications", headers=headers)
+
+    # 资格检查 1 条 + 扣减库存 1 条 + 插入借阅记录 1 条
+    with assert_max_queries(3):
+        response = client.post("/api/borrow", json={"book_id": 1}, headers=headers)
+    assert response.status_code == 201
+
+    response = client.post("/api/borrow", json={"book_id": 999}, headers=headers)
+    assert response.status_code == 404
+
+
+def test_borrow_book_eligibility(client, database, user_token):
+    """测试借阅资格检查"""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    record = BorrowRecord(
+        user_id=2,
+        book_id=1,
+        borrow_date=datetime.utcnow() - timedelta(days=40),
+        due_date=datetime.utcnow() - timedelta(days=10),
+        status="overdue"
+    )
+    db.session.add(record)
+    db.session.commit()
+
+    response = client.post("/api/borrow", json={"book_id": 2}, headers=headers)
+    assert response.status_code == 400
+    assert json.loads(response.data)["error"] == "您有逾期未还的图书，请先归还"
+
+    User.query.filter_by(id=2).update({"is_active": False})
+    db.session.commit()
+    response = client.post("/api/borrow", json={"book_id": 2}, headers=headers)
+    assert response.status_code == 403
+    assert db.session.get(Book, 2).available_copies == 3
+
+
+def test_batch_return_books(client, database, admin_token):
+    """测试批量归还：批量载入记录、统一计算罚金、按图书汇总更新库存"""
+    now = datetime.utcnow()
+    records = []
+    for i in range(20):
+        records.append(BorrowRecord(
+            user_id=2,
+            book_id=1 + i % 2,
+            borrow_date=now - timedelta(days=40),
+            due_date=now - timedelta(days=10) if i < 4 else now + timedelta(days=5),
+            status="overdue" if i < 4 else "borrowed"
+        ))
+    db.session.add_all(records)
+    Book.query.update({"available_copies": Book.available_copies - 10})
+    db.session.commit()
+    record_ids = [record.id for record in records]
+    db.session.expunge_all()
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    # 权限校验 + 载入记录 + 检查预约队列 + 更新记录（按列组合最多两批） + 更新库存
+    with assert_max_queries(6):
+        response = client.post("/api/borrows/batch/return", json={
+            "record_ids": record_ids + [record_ids[0], 9999]
+        }, headers=headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["returned_count"] == 20
+    assert data["errors"] == [f"借阅记录 {record_ids[0]} 已归还", "借阅记录 9999 不存在"]
+
+    assert [book.available_copies for book in Book.query.order_by(Book.id)] == [5, 3]
+    fines = {record.fine_amount for record in BorrowRecord.query.filter(BorrowRecord.id.in_(record_ids[:4]))}
+    assert fines == {5.0}
+    assert BorrowRecord.query.filter_by(status="returned").count() == 20
+
+
+def test_sweep_overdue_books_in_chunks(app, database):
+    """测试分段逾期检查：批量更新状态和罚金、批量生成通知、中断后可继续"""
+    from app.models import Notification
+    from app.services.overdue import sweep_overdue_books
+    from app.services.notification_counts import get_unread_count
+
+    now = datetime.utcnow()
+    for i in range(7):
+        db.session.add(BorrowRecord(
+            user_id=2,
+            book_id=1 + i % 2,
+            borrow_date=now - timedelta(days=40),
+            due_date=now - timedelta(days=i + 1),
+            status="borrowed"
+        ))
+    # 未到期和已归还的记录不处理
+    db.session.add(BorrowRecord(user_id=2, book_id=1, due_date=now + timedelta(days=3), status="borrowed"))
+    db.session.add(BorrowRecord(user_id=2, book_id=1, due_date=now - timedelta(days=3), status="returned"))
+    db.session.commit()
+
+    class Interrupted(Exception):
+        pass
+
+    def interrupt(processed):
+        raise Interrupted()
+
+    # 第一段提交后中断
+    try:
+        sweep_overdue_books(now, batch_size=3, progress=interrupt)
+    except Interrupted:
+        db.session.rollback()
+    assert BorrowRecord.query.filter_by(status="overdue").count() == 3
+
+    # 每段：查询 + 条件更新 + 插入通知 + 提交
+    with assert_max_queries(4 * 3 + 1):
+        assert sweep_overdue_books(now, batch_size=3) == 4
+
+    overdue = BorrowRecord.query.filter_by(status="overdue").order_by(BorrowRecord.due_date).all()
+    assert [record.fine_amount for record in overdue] == [3.5, 3.0, 2.5, 2.0, 1.5, 1.0, 0.5]
+    assert Notification.query.filter_by(notification_type="overdue_reminder").count() == 7
+    assert "《百年孤独》已逾期 7 天，逾期费用为 3.5 元" in Notification.query.filter(
+        Notification.content.contains("7 天")
+    ).first().content
+    assert get_unread_count(2) == 7
+    assert sweep_overdue_books(now) == 0
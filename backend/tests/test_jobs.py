@@ -0,0 +1,189 @@
+import io
+import json
+import os
+import time
+from app.models import db, Book, BorrowRecord
+from app.services.jobs import claim_next_job, run_job, enqueue_job, JOB_HANDLERS
+from datetime import datetime, timedelta
+
+
+def run_pending_jobs(app):
+    """模拟 worker：执行所有排队中的任务"""
+    with app.app_context():
+        while True:
+            job = claim_next_job()
+            if not job:
+                break
+            run_job(job)
+
+
+def test_book_import_job(app, client, database, admin_token, tmp_path):
+    """测试提交图书导入任务并由 worker 执行"""
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    csv_content = "\n".join([
+        "isbn,title,author,publisher,publish_date,category_id,total_copies",
+        "9787020002207,红楼梦,曹雪芹,人民文学出版社,1996-12-01,1,4",
+        "9787544270878,百年孤独,加西亚·马尔克斯,南海出版公司,,1,2",
+    ])
+    data = {"file": (io.BytesIO(csv_content.encode("utf-8")), "books.csv")}
+    response = client.post("/api/jobs/book-import", data=data,
+                           content_type="multipart/form-data", headers=headers)
+    assert response.status_code == 202
+    job_id = json.loads(response.data)["job"]["id"]
+
+    response = client.get(f"/api/jobs/{job_id}", headers=headers)
+    assert json.loads(response.data)["status"] == "queued"
+
+    run_pending_jobs(app)
+
+    response = client.get(f"/api/jobs/{job_id}", headers=headers)
+    job = json.loads(response.data)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 100
+    assert job["result"]["imported"] == 1
+    assert job["result"]["errors"][0]["error"] == "ISBN已存在"
+    # 上传的文件在导入后删除
+    assert os.listdir(tmp_path / "imports") == []
+
+
+def test_batch_return_job(app, client, database, admin_token):
+    """测试批量归还任务"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    with app.app_context():
+        record = BorrowRecord(user_id=2, book_id=1, borrow_date=datetime.utcnow(),
+                              due_date=datetime.utcnow() + timedelta(days=30), status="borrowed")
+        db.session.add(record)
+        db.session.get(Book, 1).available_copies = 4
+        db.session.commit()
+        record_id = record.id
+
+    response = client.post("/api/jobs", json={"type": "batch_return", "payload": {"record_ids": [record_id, 999]}},
+                           headers=headers)
+    assert response.status_code == 202
+    job_id = json.loads(response.data)["job"]["id"]
+
+    run_pending_jobs(app)
+
+    job = json.loads(client.get(f"/api/jobs/{job_id}", headers=headers).data)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"returned_count": 1, "errors": ["借阅记录 999 不存在"]}
+    with app.app_context():
+        assert db.session.get(Book, 1).available_copies == 5
+
+
+def test_job_failure_and_validation(app, client, database, admin_token, user_token, monkeypatch):
+    """测试任务失败记录、未知类型和权限"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = client.post("/api/jobs", json={"type": "unknown"}, headers=headers)
+    assert response.status_code == 400
+    response = client.post("/api/jobs", json={"type": "stats_rollup"},
+                           headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 403
+
+    def failing_job(ctx, payload):
+        ctx.report_progress(50, "处理中", force=True)
+        raise RuntimeError("boom")
+
+    # monkeypatch 在测试结束后移除注册的处理函数
+    monkeypatch.setitem(JOB_HANDLERS, "test_failing", failing_job)
+    with app.app_context():
+        job_id = enqueue_job("test_failing").id
+
+    run_pending_jobs(app)
+
+    job = json.loads(client.get(f"/api/jobs/{job_id}", headers=headers).data)
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+    assert job["progress"] == 50
+    assert job["progress_message"] == "处理中"
+    assert client.get("/api/jobs/999", headers=headers).status_code == 404
+
+
+def test_stale_running_jobs_are_failed(app, database):
+    """测试 worker 中断后停在 running 的任务在领取时被标记为失败"""
+    from app.models import Job
+    with app.app_context():
+        now = datetime.utcnow()
+        stale = Job(job_type="stats_rollup", status="running", progress=40, payload={},
+                    started_at=now - timedelta(hours=2), heartbeat_at=now - timedelta(hours=1))
+        alive = Job(job_type="stats_rollup", status="running", progress=40, payload={},
+                    started_at=now - timedelta(hours=2), heartbeat_at=now - timedelta(seconds=30))
+        db.session.add_all([stale, alive])
+        db.session.commit()
+
+        assert claim_next_job() is None
+        db.session.refresh(stale)
+        db.session.refresh(alive)
+        assert stale.status == "failed"
+        assert "worker 已中断" in stale.error
+        assert stale.finished_at is not None
+        assert alive.status == "running"
+
+
+def test_slow_job_outlives_stale_timeout(app, database, monkeypatch):
+    """测试执行时间超过 JOB_STALE_TIMEOUT 的任务：有心跳时不被标记失败，失去心跳后结果不覆盖失败状态"""
+    from app.services.jobs import fail_stale_jobs
+    app.config["JOB_STALE_TIMEOUT"] = 0.2
+
+    def heartbeating_job(ctx, payload):
+        for i in range(3):
+            time.sleep(0.15)
+            ctx.report_progress(i * 30, force=True)
+            # 模拟其他 worker 领取任务前的检查
+            assert fail_stale_jobs() == 0
+        return {"done": True}
+
+    def silent_job(ctx, payload):
+        time.sleep(0.3)
+        assert fail_stale_jobs() == 1
+        return {"done": True}
+
+    def reaped_job(ctx, payload):
+        time.sleep(0.3)
+        fail_stale_jobs()
+        ctx.report_progress(50, force=True)
+        raise AssertionError("上报进度时应停止执行")
+
+    monkeypatch.setitem(JOB_HANDLERS, "test_heartbeating", heartbeating_job)
+    monkeypatch.setitem(JOB_HANDLERS, "test_silent", silent_job)
+    monkeypatch.setitem(JOB_HANDLERS, "test_reaped", reaped_job)
+    results = {}
+    with app.app_context():
+        for job_type in ("test_heartbeating", "test_silent", "test_reaped"):
+            enqueue_job(job_type)
+            job = run_job(claim_next_job())
+            db.session.refresh(job)
+            results[job_type] = job
+
+        heartbeating = results["test_heartbeating"]
+        assert heartbeating.status == "succeeded"
+        assert heartbeating.result == {"done": True}
+        for job_type in ("test_silent", "test_reaped"):
+            job = results[job_type]
+            assert job.status == "failed"
+            assert "worker 已中断" in job.error
+            assert job.result is None
+
+
+def test_scheduler_reuses_app(app):
+    """测试定时任务复用同一个应用实例并记录耗时"""
+    from app import create_app
+    from config.init import TestingConfig
+
+    # 重复创建应用不会重复添加日志处理器
+    handlers = len(app.logger.handlers)
+    create_app(TestingConfig)
+    assert len(app.logger.handlers) == handlers
+
+    from tasks.job_timing import JobTimings, timed_job
+
+    seen = []
+    timings = JobTimings()
+    run = timed_job(app, timings, "noop", lambda job_app: seen.append(job_app))
+    run()
+    run()
+
+    assert seen == [app, app]
+    assert timings.stats["noop"]["runs"] == 2
+    assert timings.summary()[0].startswith("noop: 执行 2 次")
@@ -0,0 +1,88 @@
+import json
+from app.models import db, User, Notification
+from app.utils.query_counter import count_queries
+from app.services.notification_counts import get_unread_count
+
+
+def _add_notifications(user_id, count):
+    notifications = [
+        Notification(user_id=user_id, title="提醒", content=f"通知{i}", notification_type="return_reminder")
+        for i in range(count)
+    ]
+    db.session.add_all(notifications)
+    db.session.commit()
+    return [notification.id for notification in notifications]
+
+
+def test_unread_count(client, database, user_token):
+    """测试未读通知计数随标记已读、删除同步"""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user = User.query.filter_by(username="user").first()
+    admin = User.query.filter_by(username="admin").first()
+
+    def unread_count():
+        response = client.get("/api/notifications/unread-count", headers=headers)
+        assert response.status_code == 200
+        return json.loads(response.data)["unread_count"]
+
+    assert unread_count() == 0
+
+    ids = _add_notifications(user.id, 4)
+    _add_notifications(admin.id, 2)
+    assert unread_count() == 4
+
+    # 只读取计数表，不执行 COUNT
+    with count_queries() as counter:
+        unread_count()
+    assert not any("count(" in statement.lower() for statement in counter.statements)
+
+    client.put(f"/api/notifications/{ids[0]}/read", headers=headers)
+    assert unread_count() == 3
+    # 重复标记不会重复扣减
+    client.put(f"/api/notifications/{ids[0]}/read", headers=headers)
+    client.delete(f"/api/notifications/{ids[0]}", headers=headers)
+    assert unread_count() == 3
+    client.delete(f"/api/notifications/{ids[1]}", headers=headers)
+    assert unread_count() == 2
+
+    data = json.loads(client.get("/api/notifications", headers=headers).data)
+    assert data["unread_count"] == 2
+
+    response = client.put("/api/notifications/read-all", headers=headers)
+    assert "2" in json.loads(response.data)["message"]
+    assert unread_count() == 0
+
+    # 其他用户的计数不受影响
+    assert get_unread_count(admin.id) == 2
+
+
+def test_return_reminders_deduplicated(app, database):
+    """测试到期提醒按借阅记录去重"""
+    from datetime import datetime, timedelta
+    from app.models import BorrowRecord
+    from app.services.reminders import remind_due_books
+    from app.utils.query_counter import assert_max_queries
+
+    now = datetime.utcnow()
+    # 同一本书借了两次，按书名去重时第二条会被漏掉
+    records = [
+        BorrowRecord(user_id=2, book_id=1, due_date=now + timedelta(days=2), status="borrowed"),
+        BorrowRecord(user_id=2, book_id=1, due_date=now + timedelta(days=1), status="borrowed"),
+        BorrowRecord(user_id=2, book_id=2, due_date=now + timedelta(days=10), status="borrowed"),
+        BorrowRecord(user_id=2, book_id=2, due_date=now + timedelta(days=1), status="returned"),
+    ]
+    db.session.add_all(records)
+    db.session.commit()
+
+    # 查询 + 插入
+    with assert_max_queries(2):
+        assert remind_due_books(now) == 2
+
+    reminders = Notification.query.filter_by(notification_type="return_reminder").all()
+    assert {n.borrow_record_id for n in reminders} == {records[0].id, records[1].id}
+    assert {n.book_id for n in reminders} == {1}
+    assert "《百年孤独》将在 3 天后到期" in {n.borrow_record_id: n for n in reminders}[records[0].id].content
+
+    # 24小时内不重复提醒，之后再次提醒
+    assert remind_due_books(now + timedelta(hours=12)) == 0
+    assert remind_due_books(now + timedelta(hours=25)) == 1
@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from app.models import db, User, Book, BorrowRecord, Reservation, Notification
+from app.utils.query_counter import assert_max_queries
+
+
+def create_readers(count):
+    """创建读者，返回 [(用户, 请求头)]"""
+    readers = []
+    for i in range(count):
+        user = User(username=f"holder{i}", email=f"holder{i}@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        readers.append((user, {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}))
+    db.session.commit()
+    return readers
+
+
+def test_return_assigns_oldest_reservation(client, database, admin_token, user_token):
+    """测试归还的副本按先后顺序保留给预约者"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    (first, first_headers), (second, second_headers) = create_readers(2)
+
+    # 借空第2本书（3本）
+    Book.query.filter_by(id=2).update({"available_copies": 0})
+    records = [
+        BorrowRecord(user_id=1, book_id=2, due_date=datetime.utcnow() + timedelta(days=30), status="borrowed")
+        for _ in range(3)
+    ]
+    db.session.add_all(records)
+    db.session.commit()
+    record_ids = [record.id for record in records]
+
+    assert client.post("/api/reservations", json={"book_id": 2}, headers=first_headers).status_code == 201
+    assert client.post("/api/reservations", json={"book_id": 2}, headers=second_headers).status_code == 201
+
+    # 载入记录 + 检查预约队列 + 保留给队首 + 生成通知 + 更新记录
+    with assert_max_queries(8):
+        response = client.post(f"/api/return/{record_ids[0]}", headers=admin_headers)
+    assert response.status_code == 200
+
+    reservations = {r.user_id: r for r in Reservation.query.all()}
+    assert reservations[first.id].status == "active"
+    assert reservations[second.id].status == "pending"
+    assert db.session.get(Book, 2).available_copies == 0
+    notification = Notification.query.filter_by(notification_type="reservation_available").one()
+    assert notification.user_id == first.id
+    assert notification.book_id == 2
+    assert "《Python编程：从入门到实践》已为您保留" in notification.content
+
+    # 其他读者无法借走保留的副本，保留者可以
+    assert client.post("/api/borrow", json={"book_id": 2}, headers={"Authorization": f"Bearer {user_token}"}).status_code == 400
+    assert client.post("/api/borrow", json={"book_id": 2}, headers=first_headers).status_code == 201
+    assert db.session.get(Reservation, reservations[first.id].id).status == "fulfilled"
+    assert db.session.get(Book, 2).available_copies == 0
+
+    # 批量归还两本：一本保留给下一位，一本回到库存
+    response = client.post("/api/borrows/batch/return", json={"record_ids": record_ids[1:]}, headers=admin_headers)
+    assert response.status_code == 200
+    assert db.session.get(Reservation, reservations[second.id].id).status == "active"
+    assert db.session.get(Book, 2).available_copies == 1
+
+    # 取消保留后副本回到库存
+    response = client.delete(f"/api/reservations/{reservations[second.id].id}", headers=second_headers)
+    assert response.status_code == 200
+    assert db.session.get(Book, 2).available_copies == 2
+
+
+def test_fulfill_reservation_lends_held_copy(client, database, admin_token):
+    """测试管理员完成预约：只能完成已保留副本的预约，并为预约者生成借阅记录"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    (first, _), (second, _) = create_readers(2)
+    now = datetime.utcnow()
+    Book.query.filter_by(id=2).update({"available_copies": 0})
+    held = Reservation(user_id=first.id, book_id=2, status="active",
+                       reservation_date=now - timedelta(days=2), expires_at=now + timedelta(days=1))
+    queued = Reservation(user_id=second.id, book_id=2, status="pending",
+                         reservation_date=now - timedelta(days=1), expires_at=now + timedelta(days=6))
+    db.session.add_all([held, queued])
+    db.session.commit()
+
+    # 排队中的预约还没有副本，不能跳过队列直接完成
+    response = client.post(f"/api/reservations/{queued.id}/fulfill", headers=admin_headers)
+    assert response.status_code == 400
+    assert db.session.get(Reservation, queued.id).status == "pending"
+
+    response = client.post(f"/api/reservations/{held.id}/fulfill", headers=admin_headers)
+    assert response.status_code == 200
+    record = BorrowRecord.query.filter_by(user_id=first.id, book_id=2).one()
+    assert response.get_json()["borrow_record"]["id"] == record.id
+    assert db.session.get(Reservation, held.id).status == "fulfilled"
+    # 保留的副本借出，不影响可借库存
+    assert db.session.get(Book, 2).available_copies == 0
+
+    response = client.post(f"/api/reservations/{held.id}/fulfill", headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_borrow_ignores_expired_hold(client, database):
+    """测试超过取书期限、尚未被清理任务处理的保留不能再用于借阅"""
+    ((reader, headers),) = create_readers(1)
+    now = datetime.utcnow()
+    Book.query.filter_by(id=2).update({"available_copies": 0})
+    hold = Reservation(user_id=reader.id, book_id=2, status="active",
+                       reservation_date=now - timedelta(days=10), expires_at=now - timedelta(hours=1))
+    db.session.add(hold)
+    db.session.commit()
+
+    response = client.post("/api/borrow", json={"book_id": 2}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "该图书暂无库存"
+    # 保留留给清理任务顺延给下一位预约者
+    assert db.session.get(Reservation, hold.id).status == "active"
+    assert BorrowRecord.query.filter_by(user_id=reader.id).count() == 0
+
+    # 有可借库存时照常借阅，不使用过期的保留
+    Book.query.filter_by(id=2).update({"available_copies": 1})
+    db.session.commit()
+    assert client.post("/api/borrow", json={"book_id": 2}, headers=headers).status_code == 201
+    assert db.session.get(Reservation, hold.id).status == "active"
+    assert db.session.get(Book, 2).available_copies == 0
+
+
+def test_expire_reservations_reassigns_held_copies(app, database):
+    """测试过期预约清理：过期的保留顺延给下一位预约者，队列为空时回到库存"""
+    from app.services.reservation_expiry import expire_reservations, count_expired_reservations
+
+    (first, _), (second, _), (third, _) = create_readers(3)
+    now = datetime.utcnow()
+    Book.query.filter_by(id=2).update({"available_copies": 0})
+    Book.query.filter_by(id=1).update({"available_copies": 0})
+    db.session.add_all([
+        # 第2本书：保留已超时，下一位仍在等待
+        Reservation(user_id=first.id, book_id=2, status="active",
+                    reservation_date=now - timedelta(days=10), expires_at=now - timedelta(hours=1)),
+        Reservation(user_id=second.id, book_id=2, status="pending",
+                    reservation_date=now - timedelta(days=5), expires_at=now + timedelta(days=2)),
+        # 第1本书：保留已超时，其余预约也已过期
+        Reservation(user_id=second.id, book_id=1, status="active",
+                    reservation_date=now - timedelta(days=10), expires_at=now - timedelta(hours=1)),
+        Reservation(user_id=third.id, book_id=1, status="pending",
+                    reservation_date=now - timedelta(days=9), expires_at=now - timedelta(days=1)),
+    ])
+    db.session.commit()
+
+    assert count_expired_reservations(now) == 3
+    calls = []
+    report = expire_reservations(now=now, batch_size=1, progress=calls.append)
+
+    assert report["expired_pending"] == 1
+    assert report["expired_holds"] == 2
+    assert report["reassigned"] == 1
+    assert report["released"] == 1
+    assert calls == [1, 2, 3]
+
+    statuses = {(r.user_id, r.book_id): r.status for r in Reservation.query.all()}
+    assert statuses == {
+        (first.id, 2): "expired",
+        (second.id, 2): "active",
+        (second.id, 1): "expired",
+        (third.id, 1): "expired",
+    }
+    assert db.session.get(Book, 2).available_copies == 0
+    assert db.session.get(Book, 1).available_copies == 1
+
+    # 再次执行没有需要清理的预约
+    assert count_expired_reservations(now) == 0
+    assert expire_reservations(now=now)["expired_holds"] == 0
@@ -0,0 +1,63 @@
+import json
+from app.models import db, User, Review
+from app.utils.query_counter import assert_max_queries
+
+
+def test_get_book_reviews_query_count(client, database):
+    """测试图书评论列表批量加载评论者信息"""
+    for i in range(8):
+        user = User(username=f"reviewer{i}", email=f"reviewer{i}@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Review(user_id=user.id, book_id=1, rating=5, comment="好书"))
+    db.session.commit()
+    db.session.expunge_all()
+
+    # 表版本号（ETag）1 条 + 图书存在性检查 1 条 + COUNT 1 条 + 列表 1 条
+    with assert_max_queries(4):
+        response = client.get("/api/books/1/reviews")
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["total"] == 8
+    assert {review["username"] for review in data["reviews"]} == {f"reviewer{i}" for i in range(8)}
+
+
+def test_book_rating_aggregates(client, database, admin_token, user_token):
+    """测试评论增删改时维护图书评分汇总，以及按评分排序和重算"""
+    from app.models import Book
+    from app.services.ratings import recalculate_book_ratings
+    user_headers = {"Authorization": f"Bearer {user_token}"}
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+    def book(book_id):
+        return json.loads(client.get(f"/api/books/{book_id}").data)["book"]
+
+    assert book(1)["rating_avg"] is None
+
+    response = client.post("/api/books/1/reviews", json={"rating": 4}, headers=user_headers)
+    review_id = json.loads(response.data)["review"]["id"]
+    client.post("/api/books/1/reviews", json={"rating": 5}, headers=admin_headers)
+    client.post("/api/books/2/reviews", json={"rating": 3}, headers=user_headers)
+    assert book(1)["rating_count"] == 2
+    assert book(1)["rating_avg"] == 4.5
+
+    client.put(f"/api/reviews/{review_id}", json={"rating": 2}, headers=user_headers)
+    assert book(1)["rating_avg"] == 3.5
+
+    # 按平均评分排序，可按最低评分过滤
+    data = json.loads(client.get("/api/books", query_string={"sort": "rating"}).data)
+    assert [b["id"] for b in data["books"]] == [1, 2]
+    data = json.loads(client.get("/api/books", query_string={"min_rating": 3.5}).data)
+    assert [b["id"] for b in data["books"]] == [1]
+    assert client.get("/api/books", query_string={"sort": "rating", "cursor": ""}).status_code == 400
+
+    client.delete(f"/api/reviews/{review_id}", headers=user_headers)
+    assert book(1)["rating_count"] == 1
+    assert book(1)["rating_avg"] == 5
+
+    # 重算只修正与评论表不一致的图书
+    db.session.execute(db.update(Book).where(Book.id == 2).values(rating_count=0, rating_sum=0))
+    db.session.commit()
+    assert recalculate_book_ratings(batch_size=1) == 1
+    assert book(2)["rating_avg"] == 3
@@ -0,0 +1,169 @@
+import json
+import os
+from app.models import db, User
+from app.utils.query_counter import count_queries
+
+
+def test_admin_check_uses_token_claims(client, database, admin_token):
+    """测试管理员权限检查使用令牌声明，不查询用户表"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    assert client.get("/api/users", headers=headers).status_code == 200
+
+    with count_queries() as counter:
+        response = client.get("/api/users", headers=headers)
+    assert response.status_code == 200
+    assert not [sql for sql in counter.statements if sql.startswith("SELECT users.role AS users_role, users.is_active")]
+
+
+def login(client, login, password):
+    response = client.post("/api/auth/login", json={"login": login, "password": password})
+    return {"Authorization": f"Bearer {json.loads(response.data)['token']}"}
+
+
+def test_role_change_revokes_tokens(client, database, admin_token, user_token):
+    """测试修改角色后该用户的旧令牌失效，重新登录后获得新角色"""
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    user_headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = User.query.filter_by(username="user").first().id
+
+    assert client.get("/api/users", headers=user_headers).status_code == 403
+
+    response = client.put(f"/api/users/{user_id}", json={"role": "admin"}, headers=admin_headers)
+    assert response.status_code == 200
+    response = client.get("/api/users", headers=user_headers)
+    assert response.status_code == 401
+    assert json.loads(response.data)["error"] == "登录状态已失效，请重新登录"
+    assert client.get("/api/notifications", headers=user_headers).status_code == 401
+
+    user_headers = login(client, "user", "user123")
+    assert client.get("/api/users", headers=user_headers).status_code == 200
+
+    response = client.put(f"/api/users/{user_id}", json={"role": "user"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/api/users", headers=user_headers).status_code == 401
+    user_headers = login(client, "user", "user123")
+    assert client.get("/api/users", headers=user_headers).status_code == 403
+
+    # 其他用户的令牌不受影响，未改变角色的更新不吊销令牌
+    assert client.get("/api/users", headers=admin_headers).status_code == 200
+    response = client.put(f"/api/users/{user_id}", json={"role": "user"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/api/users", headers=user_headers).status_code == 403
+
+
+def test_login_uses_current_token_version(app, client, database):
+    """测试其他 worker 吊销令牌后，本进程缓存未同步时登录签发的令牌仍然有效"""
+    from app.models import UserTokenVersion
+    user_id = User.query.filter_by(username="user").first().id
+    user_headers = login(client, "user", "user123")
+    assert client.get("/api/notifications", headers=user_headers).status_code == 200
+
+    # 模拟其他 worker 吊销令牌：只写数据库，本进程的缓存仍是旧版本号
+    db.session.add(UserTokenVersion(user_id=user_id, version=1))
+    db.session.commit()
+
+    user_headers = login(client, "user", "user123")
+    assert client.get("/api/notifications", headers=user_headers).status_code == 200
+    # 缓存重新加载后令牌依然有效
+    app.extensions["token_version_cache"]._loaded_at = None
+    assert client.get("/api/notifications", headers=user_headers).status_code == 200
+
+
+def test_batch_create_users(client, database, admin_token):
+    """测试批量创建用户及逐行结果"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    users = [
+        {"username": "student1", "email": "student1@example.com", "password": "pass1"},
+        {"username": "user", "email": "new@example.com", "password": "pass2"},
+        {"username": "student2", "email": "admin@example.com", "password": "pass3"},
+        {"username": "student1", "email": "other@example.com", "password": "pass4"},
+        {"username": "student3", "email": "student3@example.com"},
+        {"username": "student4", "email": "student4@example.com", "password": "pass5", "role": "admin"},
+    ]
+    response = client.post("/api/users/batch", json={"users": users}, headers=headers)
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["created"] == 2
+    assert data["failed"] == 4
+    assert [result.get("error") for result in data["results"]] == [
+        None, "用户名已存在", "邮箱已存在", "用户名重复", "password是必填项", None
+    ]
+
+    student = User.query.filter_by(username="student4").first()
+    assert data["results"][5]["id"] == student.id
+    assert student.role == "admin"
+    response = client.post("/api/auth/login", json={"login": "student1", "password": "pass1"})
+    assert response.status_code == 200
+
+    response = client.post("/api/users/batch", json={"users": []}, headers=headers)
+    assert response.status_code == 400
+
+    # 角色和状态需要校验
+    response = client.post("/api/users/batch", json={"users": [
+        {"username": "s5", "email": "s5@example.com", "password": "x", "role": "superuser"},
+        {"username": "s6", "email": "s6@example.com", "password": "x", "is_active": "no"},
+    ]}, headers=headers)
+    assert [result["error"] for result in json.loads(response.data)["results"]] == [
+        "role只能是user或admin", "is_active必须是布尔值"
+    ]
+
+
+def test_batch_create_users_job(app, client, database, admin_token, tmp_path):
+    """测试大批量创建用户提交为后台任务"""
+    from app.services.jobs import claim_next_job, run_job
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    app.config["USER_BATCH_SYNC_MAX_SIZE"] = 1
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    users = [
+        {"username": "student1", "email": "student1@example.com", "password": "pass1"},
+        {"username": "student2", "email": "student2@example.com", "password": "pass2", "is_active": False},
+    ]
+    response = client.post("/api/users/batch", json={"users": users}, headers=headers)
+    assert response.status_code == 202
+    job = json.loads(response.data)["job"]
+    # 初始密码不保存在任务记录中
+    assert "pass1" not in json.dumps(job)
+
+    run_job(claim_next_job())
+
+    job = json.loads(client.get(f"/api/jobs/{job['id']}", headers=headers).data)
+    assert job["status"] == "succeeded"
+    assert job["result"]["created"] == 2
+    assert User.query.filter_by(username="student2").first().is_active is False
+    assert client.post("/api/auth/login", json={"login": "student1", "password": "pass1"}).status_code == 200
+    assert os.listdir(tmp_path / "imports") == []
+
+
+def test_search_users_by_prefix(client, database, admin_token):
+    """测试用户前缀检索与角色过滤、游标分页组合"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    for i in range(5):
+        db.session.add(User(username=f"zhang{i}", email=f"zhang{i}@school.edu", password_hash="x",
+                            role="admin" if i == 4 else "user"))
+    db.session.add(User(username="li", email="li@school.edu", password_hash="x", is_active=False))
+    db.session.commit()
+
+    response = client.get("/api/users", query_string={"search": "zha"}, headers=headers)
+    assert json.loads(response.data)["total"] == 5
+
+    response = client.get("/api/users", query_string={"search": "zhang1@sch"}, headers=headers)
+    assert [user["username"] for user in json.loads(response.data)["users"]] == ["zhang1"]
+
+    response = client.get("/api/users", query_string={"search": "school", "status": "inactive"}, headers=headers)
+    assert [user["username"] for user in json.loads(response.data)["users"]] == ["li"]
+
+    # 检索结果可与角色过滤和游标分页组合
+    params = {"search": "zha", "role": "user", "cursor": "", "per_page": 3}
+    data = json.loads(client.get("/api/users", query_string=params, headers=headers).data)
+    assert [user["username"] for user in data["users"]] == ["zhang0", "zhang1", "zhang2"]
+    params["cursor"] = data["next_cursor"]
+    data = json.loads(client.get("/api/users", query_string=params, headers=headers).data)
+    assert [user["username"] for user in data["users"]] == ["zhang3"]
+    assert data["next_cursor"] is None
+
+    # 修改用户名后索引同步更新
+    user = User.query.filter_by(username="zhang0").first()
+    user.username = "wang"
+    db.session.commit()
+    response = client.get("/api/users", query_string={"search": "wan"}, headers=headers)
+    assert [user["username"] for user in json.loads(response.data)["users"]] == ["wang"]